@@ -0,0 +1,181 @@
+'''
+    websocket 深度消息解码基准测试: 单核每秒可处理的消息数
+
+    合成 Binance depth20 (partial_book_depth) 与 OKX books5 推送 比较:
+        legacy: 标准库 json.loads + sorted(key=lambda) 排序 + 按 nd_symbol 查找合约面值 (旧版 on_depth_callback)
+        decoder: nodelta.gateway.decoder 的 json_loads + 已排序直接转换 + depth_symbol_map 一次查找
+            每个已安装的 json backend (orjson ujson json) 各测一次
+        array_*: ArrayDepthData.from_raw 排序 与 presorted=True
+            创建 numpy 数组有固定开销 档位少时(OKX books5)慢于 legacy 的 tuple 转换; 收益在于创建后的向量化指标计算
+    OKX 消息为 bytes (autobahn onMessage 的 payload) legacy 先 decode('utf8')
+
+    运行: python example/bench_decode.py [--n 200000] [--symbols 100]
+'''
+import sys
+import pathlib
+ndSys_PATH = str(pathlib.Path(__file__).parent.parent)
+if ndSys_PATH not in sys.path:
+    sys.path.append(ndSys_PATH)
+
+import argparse
+import json
+import random
+import time
+
+from nodelta.trader.constant import Exchange, Product
+from nodelta.trader.object import ContractData
+from nodelta.trader.array_depth import ArrayDepthData
+from nodelta.gateway.decoder import JSON_BACKENDS, get_json_loads, build_depth_symbol_map, decode_binance_depth, decode_okx_books5
+
+START_TS = 1700000000000
+
+
+def make_contracts(exchange: Exchange, n: int) -> dict:
+    contracts = []
+    for i in range(n):
+        gw_symbol, size = (f"C{i}-USDT-SWAP", 0.01) if exchange == Exchange.OKX else (f"C{i}USDT", 1)
+        contracts.append(ContractData(
+            gw_symbol=gw_symbol, exchange=exchange, gateway_name=exchange.value, product=Product.SWAP,
+            base=f"C{i}", quote='USDT', size=size, tick_size=0.1,
+        ))
+    return {contract.symbol: contract for contract in contracts}
+
+
+def make_levels(mid: float, count: int, ascending: bool) -> list:
+    step = 0.1 if ascending else -0.1
+    start = mid + 0.05 if ascending else mid - 0.05
+    return [[f"{start + step * i:.1f}", f"{random.uniform(0.001, 50):.3f}"] for i in range(count)]
+
+
+def make_binance_frames(contracts: dict, n: int) -> list:
+    gw_symbols = [c.gw_symbol for c in contracts.values()]
+    frames = []
+    for i in range(n):
+        mid = 30000 + random.uniform(-100, 100)
+        frames.append(json.dumps({
+            'e': 'depthUpdate', 'E': START_TS + i, 'T': START_TS + i, 's': gw_symbols[i % len(gw_symbols)],
+            'U': i, 'u': i + 1, 'pu': i - 1, 'b': make_levels(mid, 20, False), 'a': make_levels(mid, 20, True),
+        }, separators=(',', ':')))
+    return frames
+
+
+def make_okx_frames(contracts: dict, n: int) -> list:
+    gw_symbols = [c.gw_symbol for c in contracts.values()]
+    frames = []
+    for i in range(n):
+        mid = 30000 + random.uniform(-100, 100)
+        asks = [level + ['0', str(random.randint(1, 20))] for level in make_levels(mid, 5, True)]
+        bids = [level + ['0', str(random.randint(1, 20))] for level in make_levels(mid, 5, False)]
+        gw_symbol = gw_symbols[i % len(gw_symbols)]
+        frames.append(json.dumps({
+            'arg': {'channel': 'books5', 'instId': gw_symbol},
+            'data': [{'asks': asks, 'bids': bids, 'instId': gw_symbol, 'ts': str(START_TS + i), 'seqId': i}],
+        }, separators=(',', ':')).encode())
+    return frames
+
+
+def binance_legacy(frames: list, contracts: dict):
+    gw2nd_symbol_map = {c.gw_symbol: c.symbol for c in contracts.values()}
+    for message in frames:
+        data = json.loads(message)
+        tuple((float(price), float(amount)) for price, amount in sorted(data['b'], key=lambda x: float(x[0]), reverse=True))
+        tuple((float(price), float(amount)) for price, amount in sorted(data['a'], key=lambda x: float(x[0])))
+        gw2nd_symbol_map.get(data['s'])
+
+
+def binance_decoder(loads):
+    def run(frames: list, contracts: dict):
+        depth_symbol_map = build_depth_symbol_map(contracts)
+        for message in frames:
+            data = loads(message)
+            depth_symbol_map[data['s']]
+            decode_binance_depth(data)
+    return run
+
+
+def binance_array(presorted: bool):
+    def run(frames: list, contracts: dict):
+        depth_symbol_map = build_depth_symbol_map(contracts)
+        for message in frames:
+            data = json.loads(message)
+            symbol, _, tick_size = depth_symbol_map[data['s']]
+            ArrayDepthData.from_raw(symbol, Exchange.BINANCE, data['E'], data['a'], data['b'], tick_size=tick_size, presorted=presorted)
+    return run
+
+
+def okx_legacy(frames: list, contracts: dict):
+    gw2nd_symbol_map = {c.gw_symbol: c.symbol for c in contracts.values()}
+    for payload in frames:
+        message = json.loads(payload.decode('utf8'))
+        symbol = gw2nd_symbol_map.get(message.get('arg', {}).get('instId', '').upper())
+        size = contracts[symbol].size
+        book = message.get('data', [])[0]
+        tuple([(float(x[0]), float(x[1]) * size) for x in sorted(book['asks'], key=lambda x: float(x[0]))])
+        tuple([(float(x[0]), float(x[1]) * size) for x in sorted(book['bids'], key=lambda x: float(x[0]), reverse=True)])
+
+
+def okx_decoder(loads):
+    def run(frames: list, contracts: dict):
+        depth_symbol_map = build_depth_symbol_map(contracts)
+        for payload in frames:
+            message = loads(payload)
+            _, size, _ = depth_symbol_map[message['arg']['instId']]
+            decode_okx_books5(message['data'][0], size)
+    return run
+
+
+def okx_array(presorted: bool):
+    def run(frames: list, contracts: dict):
+        depth_symbol_map = build_depth_symbol_map(contracts)
+        for payload in frames:
+            message = json.loads(payload)
+            symbol, size, tick_size = depth_symbol_map[message['arg']['instId']]
+            book = message['data'][0]
+            ArrayDepthData.from_raw(symbol, Exchange.OKX, START_TS, book['asks'], book['bids'], size=size, tick_size=tick_size, presorted=presorted)
+    return run
+
+
+def measure(func, frames: list, contracts: dict) -> float:
+    '''
+        Return: 每秒消息数 取 3 次中最快的一次
+    '''
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        func(frames, contracts)
+        best = min(best, time.perf_counter() - start)
+    return len(frames) / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=200000, help='每个 case 的消息数')
+    parser.add_argument('--symbols', type=int, default=100, help='合约数量')
+    args = parser.parse_args()
+
+    random.seed(0)
+    backends = []
+    for name in JSON_BACKENDS:
+        backend, loads = get_json_loads(name)
+        if backend == name:
+            backends.append((name, loads))
+
+    print(f"消息数: {args.n:,}  合约数: {args.symbols}  python {sys.version.split()[0]}  json backend: {', '.join(name for name, _ in backends)}")
+    print(f"{'exchange':<10}{'case':<16}{'msgs/s':>12}{'us/msg':>10}{'x legacy':>10}")
+    for exchange, make_frames, legacy, decoder, array in (
+        (Exchange.BINANCE, make_binance_frames, binance_legacy, binance_decoder, binance_array),
+        (Exchange.OKX, make_okx_frames, okx_legacy, okx_decoder, okx_array),
+    ):
+        contracts = make_contracts(exchange, args.symbols)
+        frames = make_frames(contracts, args.n)
+        cases = [('legacy', legacy)] + [(f"decoder_{name}", decoder(loads)) for name, loads in backends]
+        cases += [('array_sort', array(False)), ('array_presorted', array(True))]
+        base = None
+        for name, func in cases:
+            rate = measure(func, frames, contracts)
+            base = base or rate
+            print(f"{exchange.value:<10}{name:<16}{rate:>12,.0f}{1e6 / rate:>10.2f}{rate / base:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
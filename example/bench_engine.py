@@ -0,0 +1,225 @@
+'''
+    引擎压力测试: SyntheticGateway 按目标速率写入 DEPTH/BAR/ORDER/TRADE 策略回调执行可配置的耗时 逐级提高速率
+
+    每个速率档位统计:
+        offered/s: 生产线程实际写入速率  processed/s: 策略回调处理速率
+        p50/p99/p999/max: 端到端耗时 put_event -> 处理结束 所有事件类型合计
+        backlog: 档位结束时事件队列积压
+        cpu%: 进程 CPU 占比  evt_cpu%: 事件处理线程 CPU 占比  gw_cpu%: 生产线程 CPU 占比
+    p99 超过 --p99_limit_ms 或处理速率低于写入速率的 95% 时视为饱和 停止提高速率
+
+    运行: python example/bench_engine.py [--rates 5000,10000,20000,50000] [--symbols 10] [--cost_us 0] [--queue ring]
+    比较引擎改动: 在改动前后以相同参数运行 对比各档位的 processed/s 与 p99
+'''
+import sys
+import pathlib
+ndSys_PATH = str(pathlib.Path(__file__).parent.parent)
+if ndSys_PATH not in sys.path:
+    sys.path.append(ndSys_PATH)
+
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from nodelta.trader.constant import EventType
+from nodelta.trader.engine import MainEngine
+from nodelta.trader.latency import LatencyHistogram
+from nodelta.trader.strategy_template import StrategyTemplate
+from nodelta.gateway.synthetic_gateway import SyntheticGateway
+
+BASES = ['BTC', 'ETH', 'SOL', 'XRP', 'DOGE', 'ADA', 'AVAX', 'LINK', 'DOT', 'LTC']
+
+
+class BenchStrategy(StrategyTemplate):
+    '''
+        每个回调空转 cost_us 微秒 模拟策略计算耗时
+    '''
+
+    def __init__(self, name: str, subscribe_symbols: dict, cost_us: float = 0):
+        super().__init__(name, subscribe_symbols)
+        self.cost_s = cost_us / 1e6
+        self.processed_count: int = 0
+
+    def work(self):
+        self.processed_count += 1
+        if self.cost_s:
+            end = time.perf_counter() + self.cost_s
+            while time.perf_counter() < end:
+                pass
+
+    def on_start(self):
+        pass
+
+    def on_depth(self, exchange, gateway_name, symbol, depth):
+        self.work()
+
+    def on_bar(self, exchange, gateway_name, symbol, bar):
+        self.work()
+
+    def on_order(self, exchange, gateway_name, symbol, order):
+        self.work()
+
+    def on_trade(self, exchange, gateway_name, symbol, trade):
+        self.work()
+
+    def on_finish(self):
+        pass
+
+
+def make_symbols(n: int) -> list:
+    return [f"{BASES[i % len(BASES)]}{i // len(BASES) or ''}-USDT-SWAP" for i in range(n)]
+
+
+def parse_mix(text: str) -> dict:
+    '''
+        'depth=0.7,bar=0.1,order=0.1,trade=0.1' --> {EventType.DEPTH: 0.7, ...}
+    '''
+    mix = {}
+    for item in text.split(','):
+        name, weight = item.split('=')
+        mix[EventType(name.strip().lower())] = float(weight)
+    return mix
+
+
+def get_event_thread_cpu(main_engine: MainEngine, timeout: float = 5) -> float or None:
+    '''
+        通过 TASK 事件在事件处理线程中读取该线程的 CPU 时间 队列积压严重时可能超时
+    '''
+    future = Future()
+    main_engine.put_event(event_type=EventType.TASK, exchange=None, gateway_name='', symbol='', data=lambda: future.set_result(time.thread_time()))
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        return None
+
+
+def get_total_histogram(main_engine: MainEngine) -> LatencyHistogram:
+    recorder = main_engine.latency_recorder
+    histogram = LatencyHistogram(recorder.sub_bucket_bits)
+    for event_histogram in list(recorder.total.values()):
+        histogram.merge(event_histogram)
+    return histogram
+
+
+def wait_drained(main_engine: MainEngine, timeout: float) -> bool:
+    end = time.time() + timeout
+    while time.time() < end:
+        if not main_engine.get_queue_event().qsize():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run_step(main_engine: MainEngine, gateway: SyntheticGateway, strategy: BenchStrategy, rate: float, warmup: float, duration: float) -> dict:
+    gateway.set_rate(rate)
+    time.sleep(warmup)
+    main_engine.reset_latency_stats()
+
+    emitted_start = gateway.get_emitted_total()
+    processed_start = strategy.processed_count
+    gw_cpu_start = sum(gateway.producer_cpu_s)
+    evt_cpu_start = get_event_thread_cpu(main_engine)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    time.sleep(duration)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    emitted = gateway.get_emitted_total() - emitted_start
+    processed = strategy.processed_count - processed_start
+    backlog = main_engine.get_queue_event().qsize()
+    gw_cpu = sum(gateway.producer_cpu_s) - gw_cpu_start
+
+    histogram = get_total_histogram(main_engine)
+    gateway.set_rate(0)
+    evt_cpu_end = get_event_thread_cpu(main_engine, timeout=duration * 4) # 排在积压事件之前处理 TASK 优先级最高
+    evt_cpu = evt_cpu_end - evt_cpu_start if evt_cpu_start is not None and evt_cpu_end is not None else None
+    return {
+        'rate': rate,
+        'offered_per_s': emitted / elapsed,
+        'processed_per_s': processed / elapsed,
+        'p50_us': histogram.percentile(0.5) / 1e3,
+        'p99_us': histogram.percentile(0.99) / 1e3,
+        'p999_us': histogram.percentile(0.999) / 1e3,
+        'max_us': histogram.max / 1e3,
+        'backlog': backlog,
+        'cpu_pct': cpu / elapsed * 100,
+        'evt_cpu_pct': evt_cpu / elapsed * 100 if evt_cpu is not None else None, # 包含 set_rate(0) 后处理积压的时间 饱和时偏高
+        'gw_cpu_pct': gw_cpu / elapsed * 100,
+    }
+
+
+def format_row(result: dict) -> str:
+    evt_cpu = f"{result['evt_cpu_pct']:>9.0f}" if result['evt_cpu_pct'] is not None else f"{'n/a':>9}"
+    return (
+        f"{result['rate']:>10,.0f}{result['offered_per_s']:>12,.0f}{result['processed_per_s']:>13,.0f}"
+        f"{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}{result['p999_us']:>10.1f}{result['max_us']:>11.1f}"
+        f"{result['backlog']:>10}{result['cpu_pct']:>7.0f}{evt_cpu}{result['gw_cpu_pct']:>8.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rates', type=str, default='5000,10000,20000,50000,100000', help='目标速率档位 事件/秒 逗号分隔')
+    parser.add_argument('--symbols', type=int, default=10, help='合约数量')
+    parser.add_argument('--mix', type=str, default='depth=0.7,bar=0.1,order=0.1,trade=0.1', help='事件类型权重')
+    parser.add_argument('--cost_us', type=float, default=0, help='每个策略回调的耗时 微秒')
+    parser.add_argument('--strategies', type=int, default=1, help='订阅相同合约的策略数量')
+    parser.add_argument('--threads', type=int, default=1, help='生产线程数量')
+    parser.add_argument('--fresh', action='store_true', help='DEPTH/BAR 每次新建对象')
+    parser.add_argument('--queue', type=str, default='priority', help='事件队列类型 priority / ring')
+    parser.add_argument('--wait_strategy', type=str, default='spin_block', help="queue='ring' 时的等待策略")
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=5, help='每档统计时长 秒')
+    parser.add_argument('--warmup', type=float, default=1, help='每档预热时长 秒')
+    parser.add_argument('--p99_limit_ms', type=float, default=50, help='p99 超过该值视为饱和')
+    parser.add_argument('--log', action='store_true', help='保留引擎 INFO 日志 (每笔成交写一条日志)')
+    args = parser.parse_args()
+
+    main_engine = MainEngine(queue_type=args.queue, wait_strategy=args.wait_strategy, batch_size=args.batch_size)
+    main_engine.order_reconcile_interval = 0
+    main_engine.account_reconcile_interval = 0
+    if not args.log:
+        main_engine.logger.setLevel(logging.WARNING)
+
+    gateway = SyntheticGateway(rate=0, mix=parse_mix(args.mix), threads=args.threads, fresh_data=args.fresh)
+    symbols = make_symbols(args.symbols)
+    strategies = [BenchStrategy(f"bench_{i}", {gateway.gateway_name: symbols}, cost_us=args.cost_us) for i in range(args.strategies)]
+    main_engine.add_gateways([gateway])
+    for strategy in strategies:
+        main_engine.add_strategy(strategy)
+
+    rates = [float(rate) for rate in args.rates.split(',')]
+    results = []
+
+    def run_sweep():
+        try:
+            while not main_engine.is_event_processing:
+                time.sleep(0.01)
+            for rate in rates:
+                result = run_step(main_engine, gateway, strategies[0], rate, args.warmup, args.duration)
+                results.append(result)
+                print(format_row(result), flush=True)
+                drained = wait_drained(main_engine, timeout=30)
+                if result['p99_us'] > args.p99_limit_ms * 1e3 or result['processed_per_s'] < result['offered_per_s'] * 0.95 or not drained:
+                    print(f"饱和: 速率 {rate:,.0f} 事件/秒", flush=True)
+                    break
+        finally:
+            gateway.stop()
+            main_engine.stop()
+
+    print(f"队列: {args.queue} 合约: {args.symbols} 策略: {args.strategies} 回调耗时: {args.cost_us}us 事件权重: {args.mix} 生产线程: {args.threads}")
+    print(f"{'rate':>10}{'offered/s':>12}{'processed/s':>13}{'p50_us':>10}{'p99_us':>10}{'p999_us':>10}{'max_us':>11}{'backlog':>10}{'cpu%':>7}{'evt_cpu%':>9}{'gw_cpu%':>8}")
+    threading.Thread(target=run_sweep, daemon=True).start()
+    main_engine.start() # 阻塞 run_sweep 结束后 stop
+
+    sustained = [result for result in results if result['p99_us'] <= args.p99_limit_ms * 1e3 and result['processed_per_s'] >= result['offered_per_s'] * 0.95]
+    if sustained:
+        best = max(sustained, key=lambda result: result['processed_per_s'])
+        print(f"最高可持续处理速率: {best['processed_per_s']:,.0f} 事件/秒 p99: {best['p99_us']:.1f}us")
+    main_engine.log_listener.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+'''
+    事件队列基准测试: queue.Queue / PriorityEventQueue / RingEventQueue(block, spin_block, busy_poll)
+
+    1. 吞吐: 多个生产线程(模拟gateway)各写入 N 个事件 消费线程全部取出 统计 事件/秒 与 CPU 时间
+    2. 唤醒延迟: 生产线程间隔写入 消费线程处于等待状态 统计 put -> get 的延迟分位数
+
+    运行: python example/bench_event_queue.py [--events 200000] [--producers 2]
+'''
+import sys
+import pathlib
+ndSys_PATH = str(pathlib.Path(__file__).parent.parent)
+if ndSys_PATH not in sys.path:
+    sys.path.append(ndSys_PATH)
+
+import argparse
+import threading
+import time
+from queue import Queue
+
+from nodelta.trader.constant import EventType, Exchange
+from nodelta.trader.object import Event
+from nodelta.trader.event_queue import PriorityEventQueue, RingEventQueue
+
+
+def make_queues():
+    return {
+        'queue.Queue': Queue,
+        'PriorityEventQueue': PriorityEventQueue,
+        'Ring(block)': lambda: RingEventQueue(wait_strategy='block'),
+        'Ring(spin_block)': lambda: RingEventQueue(wait_strategy='spin_block'),
+        'Ring(busy_poll)': lambda: RingEventQueue(wait_strategy='busy_poll'),
+    }
+
+
+def consume(queue, total: int, on_event=None):
+    '''
+        消费 total 个事件 支持 get_batch 的队列批量取出
+    '''
+    if isinstance(queue, RingEventQueue):
+        queue.bind_consumer()
+    received = 0
+    get_batch = getattr(queue, 'get_batch', None)
+    while received < total:
+        events = get_batch(max_size=256) if get_batch else [queue.get()]
+        if on_event is not None:
+            for event in events:
+                on_event(event)
+        received += len(events)
+
+
+def bench_throughput(factory, n_events: int, n_producers: int) -> dict:
+    queue = factory()
+    total = n_events * n_producers
+    consumer = threading.Thread(target=consume, args=(queue, total))
+
+    # 事件预先创建 只统计队列开销
+    events = [[Event(EventType.DEPTH, Exchange.OKX, 'BENCH', f"SYMBOL-{i}", None) for _ in range(n_events)] for i in range(n_producers)]
+
+    def produce(index: int):
+        put = queue.put
+        for event in events[index]:
+            put(event)
+
+    producers = [threading.Thread(target=produce, args=(i,)) for i in range(n_producers)]
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    consumer.start()
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    consumer.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'events_per_s': total / elapsed,
+        'cpu_s': time.process_time() - cpu_start,
+    }
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def bench_wakeup(factory, n_events: int, interval_us: float) -> dict:
+    queue = factory()
+    latencies = []
+    consumer = threading.Thread(
+        target=consume, args=(queue, n_events, lambda event: latencies.append(time.perf_counter_ns() - event.put_ns))
+    )
+
+    def produce():
+        for _ in range(n_events):
+            time.sleep(interval_us / 1e6)
+            queue.put(Event(EventType.ORDER, Exchange.OKX, 'BENCH', 'SYMBOL', None, put_ns=time.perf_counter_ns()))
+
+    producer = threading.Thread(target=produce)
+    cpu_start = time.process_time()
+    consumer.start()
+    producer.start()
+    producer.join()
+    consumer.join()
+    return {
+        'p50_us': percentile(latencies, 0.5) / 1e3,
+        'p99_us': percentile(latencies, 0.99) / 1e3,
+        'max_us': max(latencies) / 1e3,
+        'cpu_s': time.process_time() - cpu_start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=200000, help='吞吐测试每个生产线程写入的事件数量')
+    parser.add_argument('--producers', type=int, default=2, help='生产线程数量')
+    parser.add_argument('--wakeups', type=int, default=2000, help='唤醒延迟测试的事件数量')
+    parser.add_argument('--interval_us', type=float, default=200, help='唤醒延迟测试的写入间隔 微秒')
+    args = parser.parse_args()
+
+    print(f"吞吐: {args.producers} 个生产线程 x {args.events} 事件")
+    print(f"{'queue':<20}{'events/s':>14}{'cpu_s':>10}")
+    for name, factory in make_queues().items():
+        result = bench_throughput(factory, args.events, args.producers)
+        print(f"{name:<20}{result['events_per_s']:>14,.0f}{result['cpu_s']:>10.2f}")
+
+    print(f"\n唤醒延迟: {args.wakeups} 事件 写入间隔 {args.interval_us}us")
+    print(f"{'queue':<20}{'p50_us':>10}{'p99_us':>10}{'max_us':>10}{'cpu_s':>10}")
+    for name, factory in make_queues().items():
+        result = bench_wakeup(factory, args.wakeups, args.interval_us)
+        print(f"{name:<20}{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}{result['max_us']:>10.1f}{result['cpu_s']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
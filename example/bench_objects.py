@@ -0,0 +1,119 @@
+'''
+    行情对象内存与创建耗时基准测试: 创建 N 个 BarData / DepthData / OrderData / TradeData / Event 并保留引用
+
+    统计 tracemalloc 的内存占用(保留全部对象后的当前值) 与创建耗时
+    BarData 两种创建方式:
+        eager: 与旧版 gateway 相同 每根K线新建 timezone 并立即 datetime.fromtimestamp
+        lazy: 只传 open_ts datetime 在首次访问时由 open_ts 计算
+
+    运行: python example/bench_objects.py [--n 1000000]
+'''
+import sys
+import pathlib
+ndSys_PATH = str(pathlib.Path(__file__).parent.parent)
+if ndSys_PATH not in sys.path:
+    sys.path.append(ndSys_PATH)
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from nodelta.trader.constant import Direction, EventType, Exchange, Interval, Offset, Status
+from nodelta.trader.object import BarData, DepthData, Event, OrderData, TradeData
+
+START_TS = 1700000000000
+
+
+def make_bars_eager(n: int) -> list:
+    return [BarData(
+        symbol='BTC-USDT-SWAP', exchange=Exchange.OKX, gateway_name='OkxV5Gateway',
+        datetime=datetime.fromtimestamp((START_TS + i * 60000) / 1000, tz=timezone(timedelta(hours=8))),
+        open_ts=START_TS + i * 60000, interval=Interval.MINUTE,
+        volume=1.0, turnover=100.0, open_price=100.0, high_price=101.0, low_price=99.0, close_price=100.5,
+    ) for i in range(n)]
+
+
+def make_bars_lazy(n: int) -> list:
+    return [BarData(
+        symbol='BTC-USDT-SWAP', exchange=Exchange.OKX, gateway_name='OkxV5Gateway',
+        open_ts=START_TS + i * 60000, interval=Interval.MINUTE,
+        volume=1.0, turnover=100.0, open_price=100.0, high_price=101.0, low_price=99.0, close_price=100.5,
+    ) for i in range(n)]
+
+
+def make_depths(n: int) -> list:
+    asks = ((100.1, 1.0), (100.2, 2.0), (100.3, 3.0), (100.4, 4.0), (100.5, 5.0))
+    bids = ((99.9, 1.0), (99.8, 2.0), (99.7, 3.0), (99.6, 4.0), (99.5, 5.0))
+    return [DepthData(symbol='BTC-USDT-SWAP', exchange=Exchange.OKX, ts=START_TS + i, asks=asks, bids=bids) for i in range(n)]
+
+
+def make_orders(n: int) -> list:
+    return [OrderData(
+        symbol='BTC-USDT-SWAP', exchange=Exchange.OKX, orderid=str(i), direction=Direction.LONG, offset=Offset.OPEN,
+        price=100.0, volume=1.0, traded=0.0, status=Status.NOTTRADED, ts=START_TS + i,
+    ) for i in range(n)]
+
+
+def make_trades(n: int) -> list:
+    return [TradeData(
+        symbol='BTC-USDT-SWAP', exchange=Exchange.OKX, orderid=str(i), tradeid=str(i), direction=Direction.LONG, offset=Offset.OPEN,
+        price=100.0, volume=1.0, ts=START_TS + i,
+    ) for i in range(n)]
+
+
+def make_events(n: int) -> list:
+    return [Event(EventType.DEPTH, Exchange.OKX, 'OkxV5Gateway', 'BTC-USDT-SWAP', None, put_ns=i) for i in range(n)]
+
+
+def measure(factory, n: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    objects = factory(n)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 不计入 tracemalloc 开销的创建耗时
+    del objects
+    gc.collect()
+    start = time.perf_counter()
+    objects = factory(n)
+    elapsed_untraced = time.perf_counter() - start
+    del objects
+    return {
+        'mb': current / 1024 / 1024,
+        'bytes_per_obj': current / n,
+        'create_s': elapsed_untraced,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=1000000, help='对象数量')
+    parser.add_argument('--only', type=str, default='', help='只测试指定项 逗号分隔 例如 bar_eager,depth')
+    args = parser.parse_args()
+
+    cases = {
+        'bar_eager': make_bars_eager,
+        'bar_lazy': make_bars_lazy,
+        'depth': make_depths,
+        'order': make_orders,
+        'trade': make_trades,
+        'event': make_events,
+    }
+    only = [name for name in args.only.split(',') if name]
+    print(f"对象数量: {args.n:,}  python {sys.version.split()[0]}")
+    print(f"{'case':<12}{'MB':>10}{'bytes/obj':>12}{'create_s':>10}")
+    for name, factory in cases.items():
+        if only and name not in only:
+            continue
+        try:
+            result = measure(factory, args.n)
+        except TypeError as e: # 旧版 BarData 不支持省略 datetime
+            print(f"{name:<12}  不支持: {e}")
+            continue
+        print(f"{name:<12}{result['mb']:>10.1f}{result['bytes_per_obj']:>12.1f}{result['create_s']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
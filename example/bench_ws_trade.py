@@ -0,0 +1,359 @@
+'''
+    下单通道延迟测试: websocket (ws_trade) 与 REST 在本地替身服务上的往返耗时
+
+    替身服务 StandInServer 监听本机 不连接交易所:
+        websocket: OKX 登录 + op: order / cancel-order / amend-order; Binance method: order.place / order.cancel / order.modify
+            校验 OKX 登录签名与 Binance 请求签名 心跳 'ping' 返回 'pong'
+        REST: OKX /api/v5/trade/order 等 Binance /fapi/v1/order 返回与交易所相同格式的成功响应
+    每个通道依次执行 下单 -> 改单 -> 撤单 统计每次请求的 p50/p99/max 与每秒请求数
+    本机没有网络延迟 结果反映的是 HTTP 请求头 签名 连接复用 与 json 编解码的差异; --delay_ms 模拟交易所处理耗时
+
+    运行: python example/bench_ws_trade.py [--rounds 2000] [--threads 1] [--delay_ms 0]
+    只启动替身服务: python example/bench_ws_trade.py --serve [--ws_port 18765] [--http_port 18766]
+        gateway.ws_trade_url (Binance) / gateway.ws_private_url (OKX) 指向 ws://127.0.0.1:18765 后设置 use_ws_trade 即可联调
+    REST 测试需要 httpx (OKX) requests (Binance) 未安装时跳过
+'''
+import sys
+import pathlib
+ndSys_PATH = str(pathlib.Path(__file__).parent.parent)
+if ndSys_PATH not in sys.path:
+    sys.path.append(ndSys_PATH)
+
+import argparse
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from nodelta.trader.latency import LatencyHistogram
+from nodelta.gateway.ws_trade import OkxWsTradeClient, BinanceWsTradeClient
+
+KEY, SECRET, PASSPHRASE = 'bench-key', 'bench-secret', 'bench-passphrase'
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+# === 替身服务 ===
+class StandInServer:
+    '''
+        本地替身服务 websocket 与 REST 各一个端口 每个连接一个线程
+    '''
+
+    def __init__(self, host: str = '127.0.0.1', ws_port: int = 0, http_port: int = 0, delay_ms: float = 0):
+        self.delay_s = delay_ms / 1000
+        self.order_ids = itertools.count(1000)
+        self.ws_server = socketserver.ThreadingTCPServer((host, ws_port), self.make_ws_handler())
+        self.ws_server.daemon_threads = True
+        self.http_server = ThreadingHTTPServer((host, http_port), self.make_http_handler())
+        self.http_server.daemon_threads = True
+        self.ws_url = f"ws://{host}:{self.ws_server.server_address[1]}"
+        self.http_url = f"http://{host}:{self.http_server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.ws_server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.ws_server.shutdown()
+        self.http_server.shutdown()
+
+    def process(self):
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        return next(self.order_ids)
+
+    # === 响应 ===
+    def okx_response(self, op: str, args: list) -> dict:
+        order_id = self.process()
+        data = [{'ordId': arg.get('ordId') or str(order_id), 'clOrdId': arg.get('clOrdId', ''), 'tag': '', 'reqId': '', 'sCode': '0', 'sMsg': ''} for arg in args]
+        return {'code': '0', 'msg': '', 'data': data}
+
+    def binance_response(self, method: str, params: dict) -> dict:
+        order_id = self.process()
+        order_id = int(params['orderId']) if 'orderId' in params else order_id
+        status = 'CANCELED' if method in ('order.cancel', 'DELETE') else 'NEW'
+        return {
+            'orderId': order_id, 'symbol': params.get('symbol', ''), 'status': status, 'clientOrderId': params.get('newClientOrderId', ''),
+            'price': params.get('price', '0'), 'origQty': params.get('quantity', '0'), 'executedQty': '0', 'side': params.get('side', ''),
+            'positionSide': params.get('positionSide', 'BOTH'), 'type': params.get('type', 'LIMIT'), 'updateTime': int(time.time() * 1000),
+        }
+
+    def on_ws_message(self, text: str, session: dict) -> str or None:
+        if text == 'ping':
+            return 'pong'
+        request = json.loads(text)
+        if request.get('op') == 'login':
+            arg = request['args'][0]
+            message = arg['timestamp'] + 'GET' + '/users/self/verify'
+            sign = base64.b64encode(hmac.new(SECRET.encode(), message.encode(), hashlib.sha256).digest()).decode()
+            session['login'] = sign == arg['sign'] and arg['apiKey'] == KEY and arg['passphrase'] == PASSPHRASE
+            return json.dumps({'event': 'login', 'code': '0' if session['login'] else '60009', 'msg': '' if session['login'] else 'Login failed.', 'connId': 'stand-in'})
+        if 'op' in request:
+            if not session.get('login'):
+                return json.dumps({'id': request.get('id'), 'op': request['op'], 'code': '60011', 'msg': 'Please log in', 'data': []})
+            return json.dumps({'id': request['id'], 'op': request['op'], **self.okx_response(request['op'], request['args'])})
+        params = dict(request['params'])
+        signature = params.pop('signature', '')
+        payload = '&'.join(f"{k}={params[k]}" for k in sorted(params))
+        if params.get('apiKey') != KEY or hmac.new(SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest() != signature:
+            return json.dumps({'id': request['id'], 'status': 401, 'error': {'code': -1022, 'msg': 'Signature for this request is not valid.'}})
+        return json.dumps({'id': request['id'], 'status': 200, 'result': self.binance_response(request['method'], params), 'rateLimits': []})
+
+    def make_ws_handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                headers = {}
+                self.rfile.readline()
+                while True:
+                    line = self.rfile.readline().decode().strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest()).decode()
+                self.wfile.write(f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                session = {}
+                lock = threading.Lock()
+                while True:
+                    frame = self.read_frame()
+                    if frame is None:
+                        return
+                    opcode, payload = frame
+                    if opcode == 0x8: # close
+                        self.send_frame(0x8, payload[:2], lock)
+                        return
+                    if opcode == 0x9: # ping
+                        self.send_frame(0xA, payload, lock)
+                    elif opcode == 0x1:
+                        response = server.on_ws_message(payload.decode(), session)
+                        if response is not None:
+                            self.send_frame(0x1, response.encode(), lock)
+
+            def read_exact(self, n: int) -> bytes or None:
+                data = self.rfile.read(n)
+                return data if len(data) == n else None
+
+            def read_frame(self):
+                header = self.read_exact(2)
+                if header is None:
+                    return None
+                opcode, length = header[0] & 0x0F, header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack('!H', self.read_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack('!Q', self.read_exact(8))[0]
+                mask = self.read_exact(4) if header[1] & 0x80 else b'\x00' * 4
+                payload = self.read_exact(length) if length else b''
+                if mask is None or payload is None:
+                    return None
+                return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+            def send_frame(self, opcode: int, payload: bytes, lock: threading.Lock):
+                length = len(payload)
+                if length < 126:
+                    header = struct.pack('!BB', 0x80 | opcode, length)
+                elif length < 65536:
+                    header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+                else:
+                    header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+                with lock:
+                    self.wfile.write(header + payload)
+
+        return Handler
+
+    def make_http_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive
+
+            def setup(self):
+                super().setup()
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # 响应头与响应体分两次写入 避免 Nagle 等待
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle_request(self):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if url.path.startswith('/api/v5/trade/'):
+                    params = json.loads(body) if body else {}
+                    response = server.okx_response(url.path.rsplit('/', 1)[-1], [params])
+                else:
+                    params = dict(parse_qsl(url.query or body.decode()))
+                    response = server.binance_response(self.command, params)
+                data = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+        return Handler
+
+
+# === 各通道的 下单 改单 撤单 ===
+def okx_ws_calls(server: StandInServer):
+    client = OkxWsTradeClient(KEY, SECRET, PASSPHRASE, url=server.ws_url, on_log=lambda msg, level: None)
+    if not client.start(wait=5):
+        raise ConnectionError("OKX websocket 未连接")
+
+    def place():
+        res = client.request('order', [{'instId': 'BTC-USDT-SWAP', 'tdMode': 'cross', 'side': 'buy', 'posSide': '', 'ordType': 'limit', 'px': 30000.1, 'sz': 1, 'tgtCcy': ''}])
+        assert res['code'] == '0', res
+        return res['data'][0]['ordId']
+
+    def amend(orderid):
+        assert client.request('amend-order', [{'instId': 'BTC-USDT-SWAP', 'ordId': orderid, 'newPx': 30000.2, 'newSz': '', 'cxlOnFail': ''}])['code'] == '0'
+
+    def cancel(orderid):
+        assert client.request('cancel-order', [{'instId': 'BTC-USDT-SWAP', 'ordId': orderid}])['data'][0]['sCode'] == '0'
+
+    return place, amend, cancel, client.close
+
+
+def okx_rest_calls(server: StandInServer):
+    from nodelta.gateway.SDK.okx_sdk.okx import Trade
+    client = Trade.TradeAPI(api_key=KEY, api_secret_key=SECRET, passphrase=PASSPHRASE, use_server_time=False, flag='0', domain=server.http_url, debug=False)
+
+    def place():
+        res = client.place_order(instId='BTC-USDT-SWAP', tdMode='cross', side='buy', posSide='', ordType='limit', px=30000.1, sz=1, tgtCcy='')
+        assert res['code'] == '0', res
+        return res['data'][0]['ordId']
+
+    def amend(orderid):
+        assert client.amend_order(instId='BTC-USDT-SWAP', ordId=orderid, newPx=30000.2)['code'] == '0'
+
+    def cancel(orderid):
+        assert client.cancel_order(instId='BTC-USDT-SWAP', ordId=orderid)['data'][0]['sCode'] == '0'
+
+    return place, amend, cancel, client.client.close
+
+
+def binance_ws_calls(server: StandInServer):
+    client = BinanceWsTradeClient(KEY, SECRET, url=server.ws_url, on_log=lambda msg, level: None)
+    if not client.start(wait=5):
+        raise ConnectionError("Binance websocket 未连接")
+
+    def place():
+        res = client.request('order.place', dict(symbol='BTCUSDT', side='BUY', positionSide='BOTH', timeInForce='GTC', type='LIMIT', quantity=0.001, price=30000.1))
+        assert res['status'] == 200, res
+        return res['result']['orderId']
+
+    def amend(orderid):
+        assert client.request('order.modify', dict(symbol='BTCUSDT', side='BUY', orderId=orderid, quantity=0.001, price=30000.2))['status'] == 200
+
+    def cancel(orderid):
+        assert client.request('order.cancel', dict(symbol='BTCUSDT', orderId=orderid))['result']['status'] == 'CANCELED'
+
+    return place, amend, cancel, client.close
+
+
+def binance_rest_calls(server: StandInServer):
+    from nodelta.gateway.SDK.binance_sdk.binance.um_futures import UMFutures
+    client = UMFutures(key=KEY, secret=SECRET, base_url=server.http_url)
+
+    def place():
+        return client.new_order(symbol='BTCUSDT', side='BUY', positionSide='BOTH', timeInForce='GTC', type='LIMIT', quantity=0.001, price=30000.1)['orderId']
+
+    def amend(orderid):
+        assert client.modify_order(symbol='BTCUSDT', side='BUY', orderId=orderid, quantity=0.001, price=30000.2)['orderId'] == orderid
+
+    def cancel(orderid):
+        assert client.cancel_order(symbol='BTCUSDT', orderId=orderid)['status'] == 'CANCELED'
+
+    return place, amend, cancel, client.session.close
+
+
+def run_transport(calls, rounds: int, threads: int) -> dict:
+    place, amend, cancel, close = calls
+    histograms = {name: LatencyHistogram() for name in ('place', 'amend', 'cancel')}
+    lock = threading.Lock()
+
+    def timed(name, func, *args):
+        start = time.perf_counter_ns()
+        result = func(*args)
+        elapsed = time.perf_counter_ns() - start
+        with lock:
+            histograms[name].record(elapsed)
+        return result
+
+    def worker(n: int):
+        for _ in range(n):
+            orderid = timed('place', place)
+            timed('amend', amend, orderid)
+            timed('cancel', cancel, orderid)
+
+    for _ in range(min(rounds, 50)): # 预热 建立连接
+        orderid = place()
+        cancel(orderid)
+    for histogram in histograms.values():
+        histogram.reset()
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(rounds // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    close()
+    total = sum(histogram.count for histogram in histograms.values())
+    return {'req_per_s': total / elapsed, **{name: histogram.get_summary() for name, histogram in histograms.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=2000, help='下单 改单 撤单 轮数')
+    parser.add_argument('--threads', type=int, default=1, help='并发线程数 websocket 共用一条连接')
+    parser.add_argument('--delay_ms', type=float, default=0, help='替身服务处理每个请求的耗时 毫秒')
+    parser.add_argument('--serve', action='store_true', help='只启动替身服务')
+    parser.add_argument('--ws_port', type=int, default=0)
+    parser.add_argument('--http_port', type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandInServer(ws_port=args.ws_port, http_port=args.http_port, delay_ms=args.delay_ms)
+    server.start()
+    if args.serve:
+        print(f"websocket: {server.ws_url}  REST: {server.http_url}  key: {KEY} secret: {SECRET} passphrase: {PASSPHRASE}")
+        while True:
+            time.sleep(3600)
+
+    transports = [
+        ('okx ws', okx_ws_calls), ('okx rest', okx_rest_calls),
+        ('binance ws', binance_ws_calls), ('binance rest', binance_rest_calls),
+    ]
+    print(f"rounds={args.rounds} threads={args.threads} delay_ms={args.delay_ms}")
+    print(f"{'transport':<14}{'req/s':>9}{'place p50':>11}{'p99':>9}{'amend p50':>11}{'p99':>9}{'cancel p50':>12}{'p99':>9}{'max':>10}   (us)")
+    for name, make_calls in transports:
+        try:
+            calls = make_calls(server)
+        except ImportError as e:
+            print(f"{name:<14}跳过: {e}")
+            continue
+        result = run_transport(calls, args.rounds, args.threads)
+        max_us = max(result[op]['max_us'] for op in ('place', 'amend', 'cancel'))
+        print(
+            f"{name:<14}{result['req_per_s']:>9,.0f}"
+            f"{result['place']['p50_us']:>11.0f}{result['place']['p99_us']:>9.0f}"
+            f"{result['amend']['p50_us']:>11.0f}{result['amend']['p99_us']:>9.0f}"
+            f"{result['cancel']['p50_us']:>12.0f}{result['cancel']['p99_us']:>9.0f}{max_us:>10.0f}"
+        )
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
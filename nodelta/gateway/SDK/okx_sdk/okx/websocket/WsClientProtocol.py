@@ -5,6 +5,8 @@ from autobahn.twisted.websocket import WebSocketClientProtocol
 
 
 class WsClientProtocol(WebSocketClientProtocol):
+    loads = staticmethod(json.loads) # 消息解析函数 接受 bytes 可由使用方替换
+
     def __init__(self, factory, payload=None):
         super().__init__()
         self.autoPingInterval = 5
@@ -26,7 +28,7 @@ class WsClientProtocol(WebSocketClientProtocol):
         # self.logger.info("WsClientProtocol execute onMessage begin")
         if not isBinary:
             try:
-                payload_obj = json.loads(payload.decode("utf8"))
+                payload_obj = self.loads(payload) # bytes 直接解析
             except Exception as e:
                 self.logger.error("WsClientProtocol onMessage error;e:{}".format(e))
             else:
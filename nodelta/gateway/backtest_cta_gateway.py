@@ -2,7 +2,7 @@ import time
 import json
 from typing import Any, Dict, List, Tuple
 import threading
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 
@@ -13,7 +13,7 @@ from ..trader.engine import MainEngine
 from ..trader.constant import (
     LogLevel, Direction, Offset, Status, Exchange, Product, GatewayName, EventType, Interval
 )
-from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event
+from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event, UTC8
 from ..utils.utility import BarGenerator, ArrayManager
 import traceback
 import copy
@@ -42,6 +42,7 @@ class BacktestCtaGateway(BaseGateway):
         
         self.sent_order_count: int = 0 # 已发送订单数量
         self.sent_orders: List[OrderData] = [] # 已发送的订单
+        self.sent_order_map: Dict[str, OrderData] = {} # orderid: OrderData 与 sent_orders 中为同一对象
         self.trades_count: int = 0 # 成交数量
         self.trades: List[TradeData] = [] # 成交记录
 
@@ -94,7 +95,7 @@ class BacktestCtaGateway(BaseGateway):
         self.slippage = slippage
 
         # 设置回测系统时间为北京时间的  start 08:00:00
-        self.__bt_ts = int(datetime.strptime(start, '%Y-%m-%d').replace(hour=8, minute=0, second=0, microsecond=0, tzinfo=timezone(timedelta(hours=8))).timestamp() * 1000)
+        self.__bt_ts = int(datetime.strptime(start, '%Y-%m-%d').replace(hour=8, minute=0, second=0, microsecond=0, tzinfo=UTC8).timestamp() * 1000)
 
     def load_bar_data(self, start: str, end: str, gateway_name: str, symbols: List[str]) -> Dict[int, Dict[str, List[BarData]]]:
         '''
@@ -135,8 +136,7 @@ class BacktestCtaGateway(BaseGateway):
                     symbol=symbol,
                     exchange=self.exchange,
                     gateway_name=self.data_gateway_name,
-                    # open_time13位时间戳转东八区时间
-                    datetime=datetime.fromtimestamp(int(bar['open_time']) / 1000, tz=timezone(timedelta(hours=8))),
+                    # datetime 在首次访问时由 open_ts 转为东八区时间
                     open_ts=int(bar['open_time']),
                     interval=Interval.MINUTE,
                     volume=bar['volume'],
@@ -209,6 +209,7 @@ class BacktestCtaGateway(BaseGateway):
         )
         # 3. 保存 order_data
         self.sent_orders.append(order_data)
+        self.sent_order_map[orderid] = order_data
         # 4. 返回 orderid
         return orderid
     
@@ -223,22 +224,56 @@ class BacktestCtaGateway(BaseGateway):
             如果订单active_status 则修改为 CANCELLED
             否则不处理
         '''
-        for order in self.sent_orders:
-            if order.orderid == orderid and order.symbol == symbol:
-                if order.status in active_status:
-                    order.status = Status.CANCELLED
-                return True
-        return False
+        order = self.sent_order_map.get(orderid)
+        if order is None or order.symbol != symbol:
+            return False
+        if order.status in active_status:
+            order.status = Status.CANCELLED
+            order.ts = self.get_bt_ts()
+            # --- 推送撤单回报
+            self.main_engine.put_event(
+                event_type=EventType.ORDER,
+                exchange=self.exchange,
+                gateway_name=self.gateway_name,
+                symbol=symbol,
+                data=order
+            )
+        return True
     
+    def amend_order(self, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, **kwargs) -> bool:
+        '''
+            活跃订单修改价格与数量 订单时间更新为当前时间 与新订单相同规则撮合
+            new_amount 不大于已成交量时改单失败
+        '''
+        order = self.sent_order_map.get(orderid)
+        if order is None or order.symbol != symbol or order.status not in active_status:
+            return False
+        if new_amount is not None and new_amount <= order.traded:
+            return False
+        if new_price is not None:
+            order.price = round(new_price, self.price_precision_map[symbol])
+        if new_amount is not None:
+            order.volume = round(new_amount, self.volume_precision_map[symbol])
+        order.ts = self.get_bt_ts()
+        # --- 推送改单回报
+        self.main_engine.put_event(
+            event_type=EventType.ORDER,
+            exchange=self.exchange,
+            gateway_name=self.gateway_name,
+            symbol=symbol,
+            data=order
+        )
+        return True
+
     def query_order(self, symbol: str, orderid: str) -> OrderData:
         '''
             查询订单
             查询成功返回 OrderData
             查询失败返回 None
         '''
-        for order in self.sent_orders:
-            if order.orderid == orderid and order.symbol == symbol:
-                return order
+        order = self.sent_order_map.get(orderid)
+        if order is not None and order.symbol == symbol:
+            return order
         return None
     
     def query_active_orders(self, symbol: str) -> List[OrderData]:
@@ -296,50 +331,28 @@ class BacktestCtaGateway(BaseGateway):
             开始回测
         '''
         # A. 回测时间
-        # --- .strategy.get_ts --> self.get_bt_ts
-        self.main_engine.strategy.get_ts = self.get_bt_ts
+        # --- strategy.get_ts --> self.get_bt_ts
+        for strategy in self.main_engine.strategies.values():
+            strategy.get_ts = self.get_bt_ts
+        # --- 关闭深度合并 限频依赖真实时间 回测结果不可复现
+        self.main_engine.depth_conflation = False
         # B. 回测数据
-        symbols = self.main_engine.strategy.subscribe_symbols.get(self.gateway_name, []) # 订阅的合约
+        self.main_engine.build_route_table()
+        symbols = self.main_engine.subscribe_symbols.get(self.gateway_name, []) # 订阅的合约
         self._init_bars(symbols)
 
         msg = f"开始回测"
         self.main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.gateway_name)
 
         # 0. 策略：注册on_finish 运行on_start 事件
-        try:
-            self.main_engine.register_finish_func()
-            self.main_engine.strategy.on_start()
-        except Exception as e:
-            msg = f"{self.main_engine.strategy.strategy_name} register_finish_func or on_start 异常: {e}"
-            self.main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.main_engine.engine_name)
-            raise Exception(msg)
+        self.main_engine.start_strategies()
         
         # 1. 连接所有交易所 订阅行情与成交数据
-        for gateway_name, gateway in self.main_engine.gateways.copy().items():
-            try:
-                symbols = self.main_engine.strategy.subscribe_symbols.get(gateway_name, []) # 订阅的合约
-                print(f"{gateway_name} 正在订阅 {self.main_engine.strategy.subscribe_symbols}")
-                print(f"strategy.subscribe_symbols.keys: {self.main_engine.strategy.subscribe_symbols.keys()}")
-                if symbols:
-                    # 1. check symbol 命名规范
-                    for symbol in symbols:
-                        if not self.main_engine._check_symbol_name(symbol):
-                            msg = f"symbol 命名规范错误: {symbol}, 请检查合约命名规则"
-                            self.main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.main_engine.engine_name)
-                            raise Exception(msg)
-                    # 2. 链接交易所
-                    gateway.connect(symbols) # 连接交易所
-                else:
-                    del self.main_engine.gateways[gateway_name]
-                    msg = f"Gateway: {gateway_name} 订阅的合约为空, 删除该Gateway"
-                    self.main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.main_engine.engine_name)
-            except Exception as e:
-                msg = f"Gateway: {gateway_name} 订阅数据失败: {e}"
-                self.main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.main_engine.engine_name)
+        self.main_engine.connect_gateways()
 
-            # 2. 加载数据启动事件处理循环
-            self.main_engine.write_log(msg=f"事件处理循环启动", level=LogLevel.INFO.value, source=self.main_engine.engine_name)
-            self.is_event_processing = True
+        # 2. 加载数据启动事件处理循环
+        self.main_engine.write_log(msg=f"事件处理循环启动", level=LogLevel.INFO.value, source=self.main_engine.engine_name)
+        self.is_event_processing = True
 
         last_push_bar_open_ts = 0
         while True:
@@ -347,7 +360,7 @@ class BacktestCtaGateway(BaseGateway):
             # === 模拟推送 bar 数据 与撮合 ===
             try:
                
-                if EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+                if EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
 
                     open_ts, newest_bars = self._backtest_bars_1m.popitem() if self._backtest_bars_1m else (None, None)
 
@@ -355,6 +368,9 @@ class BacktestCtaGateway(BaseGateway):
 
                         self.__bt_ts = int(open_ts + 60 * 1000)
 
+                        # --- 按回测时间推进定时器
+                        self.main_engine.process_timers(self.__bt_ts)
+
                         self.__backtesting = True
 
                         # --- 撮合订单 更新持仓
@@ -411,27 +427,17 @@ class BacktestCtaGateway(BaseGateway):
             while self.main_engine.get_queue_event().qsize():
                 try:
                     event : Event = self.main_engine.get_queue_event().get()
-                    handler = self.main_engine.event_handlers.get(event.event_type)
-                    if handler is not None:
-                        handler(event.exchange, event.gateway_name, event.symbol, event.data)
-                        # --- 如果是 trade 事件则自动打印 log
-                        if event.event_type in [EventType.TRADE]:
-                            msg = f"{event.event_type} Event Done; Data: {event.data}"
-                            self.main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.main_engine.engine_name)
-                        # --- 如果是 bar 事件更新 self.newest_processed_bar_opening_ts
-                        if event.event_type == EventType.BAR:
-                            self.main_engine.newest_processed_bar_opening_ts = event.data.open_ts
-                            # --- 储存回测数据
-                            self.sync_bt_data(newest_bars)
-                    elif event.event_type == EventType.BACKTESTEND:
-                        self.main_engine.strategy.on_finish()
+                    if event.event_type == EventType.BACKTESTEND:
+                        for strategy in self.main_engine.strategies.values():
+                            strategy.on_finish()
                         msg = f"回测结束"
                         self.main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.main_engine.engine_name)
                         bt_resopnse = event.data
                         return bt_resopnse
-                    else:
-                        msg = f"事件处理函数不存在: {event.event_type}"
-                        self.main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.main_engine.engine_name)
+                    self.main_engine.process_event(event)
+                    # --- 如果是 bar 事件 储存回测数据
+                    if event.event_type == EventType.BAR:
+                        self.sync_bt_data(newest_bars)
                 except Exception as e:
                     msg = f"{self.main_engine.engine_name} 事件处理异常: {e}"
                     self.main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.main_engine.engine_name)
@@ -464,7 +470,7 @@ class BacktestCtaGateway(BaseGateway):
         # 2. 计算 sharpe_ratio
         # --- 取出每日 08:00 的 account_value
         account_value_df = pd.DataFrame(self.bt_data, columns=['ts', 'account_value'])
-        account_value_df['date'] = account_value_df['ts'].apply(lambda x: datetime.fromtimestamp(x / 1000, tz=timezone(timedelta(hours=8))).strftime('%Y-%m-%d'))
+        account_value_df['date'] = account_value_df['ts'].apply(lambda x: datetime.fromtimestamp(x / 1000, tz=UTC8).strftime('%Y-%m-%d'))
         account_value_df = account_value_df.groupby('date').apply(lambda x: x.iloc[0]).reset_index(drop=True)
         # --- 计算日收益率
         account_value_df['daily_return'] = account_value_df['account_value'].pct_change()
@@ -665,9 +671,12 @@ class BacktestCtaGateway(BaseGateway):
         # 2.币对最新价
         for symbol, newest_bar in newest_bars.items():
             bt_data[f"{symbol}_price"] = newest_bar.close_price
-        # 3. 策略variables_name中的所有变量
-        for variable_name in self.main_engine.strategy.variables_name:
-            bt_data[variable_name] = getattr(self.main_engine.strategy, variable_name)
+        # 3. 策略variables_name中的所有变量 多策略时变量名前加策略名称
+        strategies = self.main_engine.strategies
+        for strategy in strategies.values():
+            for variable_name in strategy.variables_name:
+                key = variable_name if len(strategies) == 1 else f"{strategy.strategy_name}.{variable_name}"
+                bt_data[key] = getattr(strategy, variable_name)
         # 保存回测数据
         self.bt_data.append(bt_data)
 
@@ -2,7 +2,7 @@ import time
 import json
 from typing import Any, Dict, List, Tuple
 import threading
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 
@@ -121,8 +121,7 @@ class BacktestCtaGateway(BaseGateway):
                     symbol=symbol,
                     exchange=self.exchange,
                     gateway_name=self.data_gateway_name,
-                    # open_time13位时间戳转东八区时间
-                    datetime=datetime.fromtimestamp(int(bar['open_time']) / 1000, tz=timezone(timedelta(hours=8))),
+                    # datetime 在首次访问时由 open_ts 转为东八区时间
                     open_ts=int(bar['open_time']),
                     interval=Interval.MINUTE,
                     volume=bar['volume'],
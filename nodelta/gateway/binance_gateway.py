@@ -2,19 +2,24 @@
     Binance Gateway
 '''
 import time
-import json
 from typing import Any, Dict, List, Tuple
 import threading
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 
 from .gateway import BaseGateway
+from .feed_process import FeedProcess
+from ..trader.snapshot import diff_contracts
 from .SDK.binance_sdk.binance.um_futures import UMFutures
 from .SDK.binance_sdk.binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
+from .ws_trade import BinanceWsTradeClient, WsTradeTimeout, binance_param_str
 from ..trader.engine import MainEngine
 from ..trader.constant import (
     LogLevel, Direction, Offset, Status, Exchange, Product, GatewayName, EventType, Interval
 )
-from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event
+from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event, OrderRequest, CancelRequest
+from ..trader.array_depth import ArrayDepthData
+from ..trader.order_book import LocalOrderBook
+from .decoder import json_loads, decode_binance_depth
 
 # 订单状态映射
 STATUS_BINANCES2VT: Dict[str, Status] = {
@@ -33,19 +38,30 @@ DIRECTION_VT2BINANCES: Dict[Direction, str] = {
 }
 DIRECTION_BINANCES2VT: Dict[str, Direction] = {v: k for k, v in DIRECTION_VT2BINANCES.items()}
 
+# 批量接口单次上限
+BATCH_ORDER_LIMIT = 5
+BATCH_CANCEL_LIMIT = 10
+
 
 class BinanceUmGateway(BaseGateway):
     '''
         BinanceUmGateway 币安U本位合约网关
     '''
 
-    def __init__(self, api: dict): # key='', secret='',
+    def __init__(self, api: dict, warm_state: dict = None, contract_cache: str = ''): # key='', secret='',
+        '''
+            Params:
+                warm_state: 快照中的 gateway 状态 get_gateway_state(load_snapshot(path), gateway_name)
+                    传入时跳过 REST 初始化 connect 后在后台重新查询并替换
+                contract_cache: 合约信息缓存文件路径 有缓存时跳过 exchange_info 查询 connect 后后台刷新 见 contract_cache
+        '''
         # === Gateway 基础信息 ===
         self.gateway_name: str = GatewayName.BINANCE_UM.value # Gateway名称不需要改
         self.exchange = Exchange.BINANCE # 交易所名称不需要改
         super().__init__(api['key'], api['secret'], self.exchange)
 
         self.key, self.secret = api['key'], api['secret'] # 交易所key secret
+        self.ws_trade_url = "wss://ws-fapi.binance.com/ws-fapi/v1" # websocket 下单 API
         
         # 计时
         self.ts_last_depth: int = 0 # 上一次获取深度时的时间戳
@@ -56,7 +72,14 @@ class BinanceUmGateway(BaseGateway):
         self.init_client()
 
         # === 初始化工作 此前必须 init clint ===
-        self.on_init() # 获取价格精度等信息
+        self.warm_state = warm_state
+        self.contract_cache = contract_cache
+        if warm_state:
+            self.load_state(warm_state) # 从快照恢复 connect 后后台校验
+        elif self.load_contract_cache(): # 合约信息来自缓存 connect 后后台刷新
+            self.is_dualSidePosition = self.http_client.get_position_mode()['dualSidePosition']
+        else:
+            self.on_init() # 获取价格精度等信息
 
         # === 启动 Websocket 监控线程 ===
         self.thread_ws_monitor = threading.Thread(target=self.ws_monitor)
@@ -86,8 +109,10 @@ class BinanceUmGateway(BaseGateway):
         '''
         # 1. 获取合约信息
         exchange_infos = self.http_client.exchange_info()
+        if not exchange_infos.get('symbols'):
+            raise Exception(f"exchange_info 未返回合约信息: {str(exchange_infos)[:200]}")
         # 2. 解析合约信息
-        self.symbol_contract_map: Dict[str, ContractData] = {} # nd_symbol: ContractData
+        symbol_contract_map: Dict[str, ContractData] = {} # nd_symbol: ContractData
 
         for symbol_info in exchange_infos['symbols']:
             # 2.1 解析合约信息
@@ -131,15 +156,36 @@ class BinanceUmGateway(BaseGateway):
                 delivery_date = delivery_date # 交割日期
             )
             # 保存合约信息
-            self.symbol_contract_map[contract.symbol] = contract
+            symbol_contract_map[contract.symbol] = contract
 
+        # 3. 全部解析完成后检查并整体替换 后台刷新时不会读到不完整的合约信息
+        self.update_contract_map(symbol_contract_map)
 
-        # 3. gw_symbol -> nd_symbol 映射字典
-        self.gw2nd_symbol_map = {v.gw_symbol: k for k, v in self.symbol_contract_map.items()}
-        self.gw_total_symbols = tuple(self.gw2nd_symbol_map.keys()) # gw_symbol tuple
+    def dump_state(self) -> dict:
+        return {
+            'symbol_contract_map': dict(self.symbol_contract_map),
+            'is_dualSidePosition': self.is_dualSidePosition,
+        }
 
-        # 4. nd_symbol -> gw_symbol 映射字典
-        self.nd2gw_symbol_map = {k: v.gw_symbol for k, v in self.symbol_contract_map.items()}
+    def load_state(self, state: dict):
+        self.set_contract_map(state['symbol_contract_map'])
+        self.is_dualSidePosition = state['is_dualSidePosition']
+
+    def validate_state(self):
+        '''
+            从快照恢复后 在后台重新查询合约信息与持仓模式 替换快照中的数据
+        '''
+        try:
+            old_map, old_dual = self.symbol_contract_map, self.is_dualSidePosition
+            self.on_init()
+            changes = diff_contracts(old_map, self.symbol_contract_map)
+            if old_dual != self.is_dualSidePosition:
+                changes.append(f"持仓模式 dualSidePosition: {old_dual} -> {self.is_dualSidePosition}")
+            msg = f"快照校验完成 合约数量: {len(self.symbol_contract_map)} 变化: {len(changes)}" + ''.join(f"\n    {c}" for c in changes[:20])
+            self.main_engine.write_log(msg, level=LogLevel.WARNING.value if changes else LogLevel.INFO.value, source=self.gateway_name)
+        except Exception as e:
+            msg = f"validate_state error: {e}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
 
     def extract_number_from_string(self, s: str) -> int:
         '''
@@ -180,6 +226,42 @@ class BinanceUmGateway(BaseGateway):
         '''
         return self.gw2nd_symbol_map.get(symbol, symbol)
     
+    def _price_qty(self, symbol: str, price: float, amount: float) -> Tuple[float, float]:
+        '''
+            按合约精度处理价格与数量
+        '''
+        contract = self.symbol_contract_map[symbol]
+        return self._float_precision(price, contract.price_precision), self._float_precision(amount, contract.qty_precision)
+
+    def _order_params(self, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, **kwargs) -> dict or None:
+        '''
+            new_order 参数 合约不存在返回 None
+        '''
+        # 转化为交易所symbol
+        gw_symbol = self.switch_gw_symbol(symbol)
+
+        # 检查币对是否存在
+        if gw_symbol not in self.gw_total_symbols:
+            msg = f"send_order error: {symbol} not find in exchange_symbols"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return None
+        side_ = DIRECTION_VT2BINANCES[direction]
+        if self.is_dualSidePosition == False: # 单向持仓
+            positionSide_ = 'BOTH'
+        else:   # 双向持仓
+            if (direction == Direction.LONG and offset == Offset.OPEN) or\
+            (direction == Direction.SHORT and offset == Offset.CLOSE):
+                positionSide_ = 'LONG'
+            elif (direction == Direction.LONG and offset == Offset.CLOSE) or\
+            (direction == Direction.SHORT and offset == Offset.OPEN):
+                positionSide_ = 'SHORT'
+        type_ = 'LIMIT'
+        timeInForce_ = kwargs.get('timeInForce', 'GTC')
+        price_, quantity_ = self._price_qty(symbol, price, amount)
+        kwargs_ = {k: v for k, v in kwargs.items() if k not in ['symbol', 'side', 'positionSide', 'timeInForce', 'type', 'quantity', 'price']}
+        return dict(symbol=gw_symbol, side=side_, positionSide=positionSide_, timeInForce=timeInForce_,
+                    type=type_, quantity=quantity_, price=price_, **kwargs_)
+
     def send_order(self, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, **kwargs) -> str:
         '''
             发送订单
@@ -191,58 +273,63 @@ class BinanceUmGateway(BaseGateway):
                 amount: 数量
             Return: 
                 报单成功返回 orderId 否则返回空字符串
+            Note:
+                use_ws_trade 开启时通过 websocket order.place 下单 未连接时使用 REST
         '''
         try:
-            # 转化为交易所symbol
-            gw_symbol = self.switch_gw_symbol(symbol)
-
-            # 检查币对是否存在
-            if gw_symbol not in self.gw_total_symbols:
-                msg = f"send_order error: {symbol} not find in exchange_symbols"
-                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            params = self._order_params(symbol, direction, offset, price, amount, **kwargs)
+            if params is None:
                 return ""
             # 下单
-            side_ = DIRECTION_VT2BINANCES[direction]
-            if self.is_dualSidePosition == False: # 单向持仓
-                positionSide_ = 'BOTH'
-            else:   # 双向持仓
-                if (direction == Direction.LONG and offset == Offset.OPEN) or\
-                (direction == Direction.SHORT and offset == Offset.CLOSE):
-                    positionSide_ = 'LONG'
-                elif (direction == Direction.LONG and offset == Offset.CLOSE) or\
-                (direction == Direction.SHORT and offset == Offset.OPEN):
-                    positionSide_ = 'SHORT'
-            type_ = 'LIMIT'
-            timeInForce_ = kwargs.get('timeInForce', 'GTC')
-            quantity_precision = self.symbol_contract_map[symbol].qty_precision
-            quantity_ = self._float_precision(amount, quantity_precision)
-            price_precision = self.symbol_contract_map[symbol].price_precision
-            price_ = self._float_precision(price, price_precision)
-            kwargs_ = {k: v for k, v in kwargs.items() if k not in ['symbol', 'side', 'positionSide', 'timeInForce', 'type', 'quantity', 'price']}
-
-            res = self.http_client.new_order(symbol=gw_symbol, side=side_, positionSide=positionSide_, timeInForce=timeInForce_,\
-                                        type=type_, quantity=quantity_, price=price_, **kwargs_)
-            if res['orderId']:  # 只有成功下单才会返回orderId 回调 on_order
-                # order_data = OrderData(
-                #     symbol=symbol,
-                #     exchange=self.exchange,
-                #     orderid=str(res['orderId']),
-                #     direction=direction,
-                #     offset=offset,
-                #     price=price,
-                #     volume=amount,
-                #     traded=0,
-                #     status=Status.SUBMITTING,
-                #     ts= res['updateTime']
-                # )
-                # self.main_engine.put_event(event_type=EventType.ORDER, exchange=self.exchange, gateway_name=self.gateway_name, symbol=symbol, data=order_data)
+            ws_res = self.ws_trade_request('order.place', params, rest_on_timeout=False)
+            if ws_res is not None:
+                res = self._ws_trade_result(ws_res, 'send_order')
+            else:
+                res = self.http_client.new_order(**params)
+            if res and res['orderId']:  # 只有成功下单才会返回orderId 回调 on_order
                 return str(res['orderId'])
             else:
                 return ''
+        except WsTradeTimeout as e:
+            msg = f"send_order error: websocket {e} 订单状态未知 以订单推送为准; 合约: {symbol} 价格: {price} 数量: {amount}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return ''
         except Exception as e:
             msg = f"send_order error: {e}"
             self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
             return ''
+
+    def send_orders(self, requests: List[OrderRequest]) -> List[str]:
+        '''
+            批量下单 POST /fapi/v1/batchOrders 每次最多 BATCH_ORDER_LIMIT 个 可包含不同合约
+            Return:
+                与 requests 顺序一致的 orderId 列表 失败为空字符串
+        '''
+        results = [''] * len(requests)
+        batch = [] # (index, params)
+        for index, req in enumerate(requests):
+            try:
+                params = self._order_params(req.symbol, req.direction, req.offset, req.price, req.amount, **req.kwargs)
+            except Exception as e:
+                msg = f"send_orders error: {e}; 合约: {req.symbol}"
+                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+                continue
+            if params is not None:
+                batch.append((index, binance_param_str(params))) # batchOrders 以 json 字符串发送
+        for start in range(0, len(batch), BATCH_ORDER_LIMIT):
+            chunk = batch[start:start + BATCH_ORDER_LIMIT]
+            try:
+                res = self.http_client.new_batch_order(batchOrders=[params for _, params in chunk])
+                for (index, params), item in zip(chunk, res):
+                    if item.get('orderId'):
+                        results[index] = str(item['orderId'])
+                    else:
+                        msg = f"send_orders error: {item}; 合约: {params['symbol']} 价格: {params.get('price')} 数量: {params.get('quantity')}"
+                        self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            except Exception as e:
+                msg = f"send_orders error: {e}; 订单数量: {len(chunk)}"
+                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        return results
     
     def cancel_order(self, symbol: str, orderid: str) -> bool:
         '''
@@ -256,7 +343,11 @@ class BinanceUmGateway(BaseGateway):
         '''
         gw_symbol = self.switch_gw_symbol(symbol)
         try:
-            res = self.http_client.cancel_order(symbol=gw_symbol, orderId=int(orderid))
+            ws_res = self.ws_trade_request('order.cancel', {'symbol': gw_symbol, 'orderId': int(orderid)})
+            if ws_res is not None:
+                res = self._ws_trade_result(ws_res, 'cancel_order')
+            else:
+                res = self.http_client.cancel_order(symbol=gw_symbol, orderId=int(orderid))
             if res and res['status'] == 'CANCELED':
                 return True
             else:
@@ -266,6 +357,76 @@ class BinanceUmGateway(BaseGateway):
             self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
             return False
 
+    def cancel_orders(self, requests: List[CancelRequest]) -> List[bool]:
+        '''
+            批量撤单 DELETE /fapi/v1/batchOrders 按合约分组 每次最多 BATCH_CANCEL_LIMIT 个
+            Return:
+                与 requests 顺序一致的撤单结果
+        '''
+        results = [False] * len(requests)
+        symbol_indexes: Dict[str, List[int]] = {}
+        for index, req in enumerate(requests):
+            symbol_indexes.setdefault(req.symbol, []).append(index)
+        for symbol, indexes in symbol_indexes.items():
+            gw_symbol = self.switch_gw_symbol(symbol)
+            for start in range(0, len(indexes), BATCH_CANCEL_LIMIT):
+                chunk = indexes[start:start + BATCH_CANCEL_LIMIT]
+                try:
+                    res = self.http_client.cancel_batch_order(symbol=gw_symbol, orderIdList=[int(requests[index].orderid) for index in chunk], origClientOrderIdList=None)
+                    for index, item in zip(chunk, res):
+                        results[index] = item.get('status') == 'CANCELED'
+                except Exception as e:
+                    msg = f"cancel_orders error: {e}; 合约: {symbol} 订单数量: {len(chunk)}"
+                    self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        return results
+
+    def amend_order(self, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, **kwargs) -> bool:
+        '''
+            改单 PUT /fapi/v1/order 仅支持限价单 改单后订单重新排队
+            Parameters:
+                symbol: nd_symbol 币对
+                orderid: 订单号
+                new_price: 新价格 为空不修改
+                new_amount: 新订单总量 包含已成交 为空不修改
+                kwargs: direction 订单方向 与空值一起缺失时查询订单获取
+            Return:
+                True: 改单成功
+                False: 改单失败
+        '''
+        try:
+            direction = kwargs.get('direction')
+            if direction is None or new_price is None or new_amount is None: # 接口需传入方向 价格 数量
+                order = self.query_order(symbol, orderid)
+                if order is None:
+                    msg = f"amend_order error: 查询订单失败 合约: {symbol} 订单号: {orderid}"
+                    self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+                    return False
+                direction = direction or order.direction
+                new_price = order.price if new_price is None else new_price
+                new_amount = order.volume if new_amount is None else new_amount
+            price_, quantity_ = self._price_qty(symbol, new_price, new_amount)
+            params = dict(symbol=self.switch_gw_symbol(symbol), side=DIRECTION_VT2BINANCES[direction], orderId=int(orderid), quantity=quantity_, price=price_)
+            ws_res = self.ws_trade_request('order.modify', params)
+            if ws_res is not None:
+                res = self._ws_trade_result(ws_res, 'amend_order')
+            else:
+                res = self.http_client.modify_order(**params)
+            return bool(res and res.get('orderId'))
+        except Exception as e:
+            msg = f"amend_order error: {e}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return False
+
+    def _ws_trade_result(self, ws_res: dict, func_name: str) -> dict or None:
+        '''
+            websocket API 响应 {'id', 'status', 'result'} 取出与 REST 相同的 result 失败时记录日志返回 None
+        '''
+        if ws_res.get('status') == 200:
+            return ws_res['result']
+        msg = f"{func_name} error: {ws_res.get('error', ws_res)}"
+        self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        return None
+
     def query_order(self, symbol: str, orderid: str) -> OrderData or None:
         '''
             查询订单
@@ -444,21 +605,25 @@ class BinanceUmGateway(BaseGateway):
     # === websocket 推送回调函数 ===
     def on_message(self, _, message):
         try:
-            data =json.loads(message)
+            data = json_loads(message)
+            event = data.get('e')
 
-            if not data.get('e'):  # 首次链接某个频道，会返回 {"id":1689143922513,"result":null}
+            if event == 'depthUpdate': # 深度推送最频繁 最先判断
+                self.ts_last_depth = self.get_ts() # 更新最新的depth时间戳
+                if self.use_local_book:
+                    self.on_diff_depth_callback(data)
+                else:
+                    self.on_depth_callback(data)
+            elif not event:  # 首次链接某个频道，会返回 {"id":1689143922513,"result":null}
                 msg = f"WebSocket message: {data}"
                 self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
-            elif data['e'] == 'depthUpdate':
-                self.ts_last_depth = self.get_ts() # 更新最新的depth时间戳
-                self.on_depth_callback(data)
-            elif data['e'] =='kline':
+            elif event =='kline':
                 self.ts_last_bar = self.get_ts()
                 self.on_bar_callback(data)
-            elif data['e'] == 'ORDER_TRADE_UPDATE':
+            elif event == 'ORDER_TRADE_UPDATE':
                 # 当有新订单创建、订单有新成交或者新的状态变化时会推送此类事件 事件类型统一为 ORDER_TRADE_UPDATE
                 self.on_order_trade_callback(data)
-            elif data['e'] == 'listenKeyExpired':
+            elif event == 'listenKeyExpired':
                 # listenKey 有效期为 60 分钟，当出现 listenKeyExpired 时需要重新创建 listenKey
                 self.on_listenKeyExpired_callback()
         except Exception as e:
@@ -467,16 +632,15 @@ class BinanceUmGateway(BaseGateway):
 
     def on_depth_callback(self, data):
         '''
-            data 需要是字典
+            data 需要是字典 partial_book_depth 推送已排序 不再排序
         '''
-        bids = data['b']
-        sorted_bids = sorted(bids, key=lambda x: float(x[0]), reverse=True)
-        bids_tuple = tuple((float(price), float(amount)) for price, amount in sorted_bids)
-        asks = data['a']
-        sorted_asks = sorted(asks, key=lambda x: float(x[0]))
-        asks_tuple = tuple((float(price), float(amount)) for price, amount in sorted_asks)
+        symbol, _, tick_size = self.depth_symbol_map.get(data['s']) or (data['s'], 1, 0)
+        if self.use_array_depth:
+            depth_data = ArrayDepthData.from_raw(symbol, self.exchange, data['E'], data['a'], data['b'], tick_size=tick_size, presorted=True)
+            self.main_engine.put_event(event_type=EventType.DEPTH, exchange=self.exchange, gateway_name=self.gateway_name, symbol=symbol, data=depth_data)
+            return
 
-        symbol = self.switch_nd_symbol(data['s'])
+        asks_tuple, bids_tuple = decode_binance_depth(data)
 
         depth_data = DepthData(
             symbol=symbol,
@@ -487,6 +651,48 @@ class BinanceUmGateway(BaseGateway):
         )
         self.main_engine.put_event(event_type=EventType.DEPTH, exchange=self.exchange, gateway_name=self.gateway_name, symbol=symbol, data=depth_data)
     
+    def on_diff_depth_callback(self, data):
+        '''
+            增量深度 更新本地订单簿 丢包或未同步时后台获取 REST 快照
+        '''
+        symbol = self.switch_nd_symbol(data['s'])
+        book = self.order_books.get(symbol)
+        if book is None:
+            return
+        if book.on_binance_diff(data):
+            self.publish_order_book(book)
+        elif not book.ready and not book.resyncing:
+            if book.gap_reason:
+                msg = f"{symbol} 本地订单簿丢包: {book.gap_reason} 重新获取快照 (累计: {book.gap_count})"
+                self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+                book.gap_reason = ''
+            self.resync_order_book(data['s'], book)
+
+    def resync_order_book(self, gw_symbol: str, book: LocalOrderBook):
+        '''
+            后台线程获取 REST 深度快照 同步本地订单簿 等待快照期间的增量缓存在 book 中
+        '''
+        book.resyncing = True
+        threading.Thread(target=self._resync_order_book, args=(gw_symbol, book), daemon=True).start()
+
+    def _resync_order_book(self, gw_symbol: str, book: LocalOrderBook, retry: int = 5):
+        try:
+            for attempt in range(1, retry + 1):
+                try:
+                    snapshot = self.http_client.depth(symbol=gw_symbol, limit=1000)
+                    if book.on_binance_snapshot(snapshot):
+                        msg = f"{book.symbol} 本地订单簿已同步 lastUpdateId: {book.last_update_id} 档位: {len(book.bids)}/{len(book.asks)}"
+                        self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
+                        return
+                    msg = f"{book.symbol} 本地订单簿同步失败: {book.gap_reason} 第{attempt}次"
+                    book.gap_reason = ''
+                except Exception as e:
+                    msg = f"{book.symbol} 获取深度快照失败: {e} 第{attempt}次"
+                self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+                time.sleep(1)
+        finally:
+            book.resyncing = False
+
     def on_bar_callback(self, data):
         '''
             data 需要是字典; EventType.BAR 永远仅推送已经走完的K线
@@ -523,7 +729,6 @@ class BinanceUmGateway(BaseGateway):
             symbol=symbol,
             exchange=self.exchange,
             gateway_name=self.gateway_name,
-            datetime=datetime.fromtimestamp(int(data['k']['t'])/1000, tz=timezone(timedelta(hours=8))),
             open_ts=int(data['k']['t']),
             interval=Interval.MINUTE,
             volume=float(data['k']['v']),
@@ -595,26 +800,44 @@ class BinanceUmGateway(BaseGateway):
         self.ws_client.user_data(listen_key=self.listenKey)
         self.main_engine.write_log(f"subscribe trade", level=LogLevel.INFO.value, source=self.gateway_name)
 
+        # 2/3. 深度与K线在子进程中订阅与解析
+        if self.use_feed_process:
+            if self.use_local_book:
+                msg = f"行情子进程不支持本地订单簿 使用快照深度"
+                self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+            self.start_feed_process(gw_symbols)
+            self.ts_last_subcribe = self.get_ts()
+            return
+
         # 2. 订阅深度
-        if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys():
-            depth_params = self.main_engine.strategy.topic[self.gateway_name][EventType.DEPTH.value]
+        if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys():
+            depth_params = self.main_engine.topic[self.gateway_name][EventType.DEPTH.value]
             level = depth_params.get('level', 20)
             speed = depth_params.get('speed', 100)
+            if self.use_local_book: # 收到第一条增量后获取快照
+                self.order_books = {}
+                for symbol in gw_symbols:
+                    nd_symbol = self.switch_nd_symbol(symbol)
+                    contract = self.symbol_contract_map.get(nd_symbol)
+                    self.order_books[nd_symbol] = LocalOrderBook(nd_symbol, self.exchange, tick_size=contract.tick_size if contract else 0)
             _count = 0
             for symbol in gw_symbols:
-                self.ws_client.partial_book_depth(
-                    symbol=symbol.lower(),
-                    level=level,
-                    speed=speed,
-                )
+                if self.use_local_book:
+                    self.ws_client.diff_book_depth(symbol=symbol.lower(), speed=speed)
+                else:
+                    self.ws_client.partial_book_depth(
+                        symbol=symbol.lower(),
+                        level=level,
+                        speed=speed,
+                    )
                 _count += 1
                 if _count % 5 == 0 and _count != 0: # 每订阅5个币对休眠1s
                     time.sleep(1)
                 self.main_engine.write_log(f"subscribe {symbol} depth", level=LogLevel.INFO.value, source=self.gateway_name)
 
         # 3. 订阅K线
-        if EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
-            bar_params = self.main_engine.strategy.topic[self.gateway_name][EventType.BAR.value]
+        if EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
+            bar_params = self.main_engine.topic[self.gateway_name][EventType.BAR.value]
             interval = '1m'
             _count = 0
             for symbol in gw_symbols:
@@ -628,6 +851,24 @@ class BinanceUmGateway(BaseGateway):
                     
         self.ts_last_subcribe = self.get_ts() # 记录最后一次订阅时间
 
+    def start_feed_process(self, gw_symbols: list):
+        '''
+            启动行情子进程 已启动时重启
+            Parameters:
+                gw_symbols: 交易所币对
+        '''
+        topic = self.main_engine.topic[self.gateway_name]
+        params = {
+            'gw_symbols': list(gw_symbols),
+            'symbol_map': {gw_symbol: (self.switch_nd_symbol(gw_symbol), 1) for gw_symbol in gw_symbols},
+            'depth': {k: v for k, v in topic[EventType.DEPTH.value].items() if k in ('level', 'speed')} if EventType.DEPTH.value in topic else None,
+            'bar': {} if EventType.BAR.value in topic else None,
+        }
+        if self.feed_process is not None:
+            self.feed_process.stop()
+        self.feed_process = FeedProcess(self, params)
+        self.feed_process.start()
+
     def connect(self, symbols: list):
         '''
             用于 main_engine 中的 connect 理论上是只会调用一次 是gateway的入口函数
@@ -637,6 +878,9 @@ class BinanceUmGateway(BaseGateway):
         '''
         self.subscribed_nd_symbols = symbols.copy()  # 被订阅的nd币对
         self.subscribed_gw_symbols = [self.switch_gw_symbol(symbol) for symbol in symbols] # 被订阅的gw币对
+        self.init_depth_options()
+        if self.use_ws_trade:
+            self.start_ws_trade(BinanceWsTradeClient(self.key, self.secret, url=self.ws_trade_url))
 
         try:
             self.subscribe_data(self.subscribed_gw_symbols)
@@ -644,6 +888,11 @@ class BinanceUmGateway(BaseGateway):
             self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
             
             self.thread_ws_monitor.start() # 启动 ws 监控线程
+            self.start_contract_refresh() # 后台刷新合约信息
+
+            if self.warm_state: # 从快照恢复 后台校验
+                self.warm_state = None
+                threading.Thread(target=self.validate_state, daemon=True).start()
 
         except Exception as e:
             msg = f"subscribe_data error: {e}"
@@ -692,7 +941,7 @@ class BinanceUmGateway(BaseGateway):
                 time.sleep(5)
 
                 # ==== 如果订阅深度 重连条件判断 1. 深度数据超过3秒未更新
-                if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+                if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys():
                     now_ts = self.get_ts()
                     is_reconnect_1 = True if self.ts_last_depth and now_ts - self.ts_last_depth > self.reconnect_seconds_after_lost_depth * 1000 else False # 深度数据超过3秒未更新
                     
@@ -706,7 +955,7 @@ class BinanceUmGateway(BaseGateway):
                         self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
                 
                 # ==== 如果订阅K线 重连条件判断 1. K线数据超过63秒未更新
-                if EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+                if EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
                     now_ts = self.get_ts()
                     is_reconnect_2 = True if self.ts_last_bar !=0 and now_ts - self.ts_last_bar > 63 * 1000 else False
 
@@ -0,0 +1,83 @@
+'''
+    websocket 行情解码
+
+    1. json 解析 json_loads: 依次尝试 orjson ujson 标准库 json 三者均可直接解析 bytes 不需要先 decode
+        环境变量 ND_JSON_BACKEND=orjson / ujson / json 指定 未安装时使用标准库 json
+    2. 深度解析: OKX books5 与 Binance 有限档深度 (depth5/10/20) 推送时已排序 卖单价格从低到高 买单价格从高到低
+        直接逐档转换为 (price, volume) 不再排序
+    3. 合约面值: gateway set_contract_map 时生成 depth_symbol_map gw_symbol -> (nd_symbol, size, tick_size)
+        解析时一次查找得到 nd_symbol 与面值 面值为 1 时不做乘法
+
+    比较: python example/bench_decode.py
+'''
+import json
+import os
+from typing import Callable, Dict, Sequence, Tuple
+
+from ..trader.object import ContractData
+
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def get_json_loads(backend: str = 'auto') -> Tuple[str, Callable]:
+    '''
+        backend: 'auto' 依次尝试 JSON_BACKENDS 或指定其中之一 未安装时使用标准库 json
+        Return: (backend, loads)
+    '''
+    names = JSON_BACKENDS if backend == 'auto' else (backend, 'json')
+    for name in names:
+        if name == 'orjson':
+            try:
+                import orjson
+                return name, orjson.loads
+            except ImportError:
+                continue
+        elif name == 'ujson':
+            try:
+                import ujson
+                return name, ujson.loads
+            except ImportError:
+                continue
+        elif name == 'json':
+            return name, json.loads
+    raise ValueError(f"不支持的 json backend: {backend}")
+
+
+JSON_BACKEND, json_loads = get_json_loads(os.environ.get('ND_JSON_BACKEND', 'auto'))
+
+
+def build_depth_symbol_map(symbol_contract_map: Dict[str, ContractData]) -> Dict[str, Tuple[str, float, float]]:
+    '''
+        gw_symbol -> (nd_symbol, size, tick_size)
+    '''
+    return {contract.gw_symbol: (symbol, contract.size, contract.tick_size) for symbol, contract in symbol_contract_map.items()}
+
+
+def binance_levels(raw: Sequence) -> tuple:
+    '''
+        Binance [[price, qty], ...] 已排序
+    '''
+    return tuple([(float(price), float(qty)) for price, qty in raw])
+
+
+def okx_levels(raw: Sequence, size: float = 1) -> tuple:
+    '''
+        OKX [[price, sz, 废弃字段, 订单数], ...] 已排序 数量乘以合约面值 size
+    '''
+    if size == 1:
+        return tuple([(float(level[0]), float(level[1])) for level in raw])
+    return tuple([(float(level[0]), float(level[1]) * size) for level in raw])
+
+
+def decode_binance_depth(data: dict) -> Tuple[tuple, tuple]:
+    '''
+        partial_book_depth 推送 {'e': 'depthUpdate', 's', 'E', 'a', 'b'} --> (asks, bids)
+    '''
+    return binance_levels(data['a']), binance_levels(data['b'])
+
+
+def decode_okx_books5(book: dict, size: float = 1) -> Tuple[tuple, tuple]:
+    '''
+        books5 推送 message['data'][0] {'asks', 'bids', 'ts'} --> (asks, bids)
+    '''
+    return okx_levels(book['asks'], size), okx_levels(book['bids'], size)
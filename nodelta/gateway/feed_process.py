@@ -0,0 +1,465 @@
+'''
+    行情子进程
+
+    公有行情(深度 K线)的 websocket 读取 json 解析 排序与数值转换在子进程中完成 不占用主进程的 GIL
+    子进程将解析后的行情写入共享内存环形缓冲 主进程读取线程构造 DepthData / BarData 后 put_event
+    每个 gateway 一个子进程 多个 gateway 的行情解析分布在多个 CPU 核上
+
+        ShmRing: 基于 multiprocessing.shared_memory 的单生产者单消费者字节环形缓冲 记录为 4字节长度 + marshal 数据
+        FeedProcess: 主进程侧 管理子进程 共享内存与读取线程
+        run_feed: 子进程入口
+
+    订单成交推送频率低 且依赖 REST listenKey / 登录 仍在主进程中处理
+    子进程使用 spawn 方式启动 策略入口脚本需在 if __name__ == '__main__': 中运行
+
+    note: 读写位置通过共享内存中的 8 字节整数同步 依赖 x86 的写入顺序; 读取线程休眠时由子进程通过 multiprocessing.Event 唤醒
+'''
+import marshal
+import multiprocessing
+import os
+import struct
+import threading
+import time
+import traceback
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..trader.constant import LogLevel, Exchange, EventType, Interval
+from ..trader.object import DepthData, BarData
+from ..trader.array_depth import ArrayDepthData
+from .decoder import json_loads, decode_binance_depth, decode_okx_books5
+
+HEADER_SIZE = 192
+WRITE_POS = 0 # 写入位置 生产者写 与读取位置分属不同缓存行
+READ_POS = 64 # 读取位置 消费者写
+READER_SLEEPING = 128 # 消费者是否休眠
+DROPPED = 136 # 缓冲区满丢弃的记录数量
+WRAP_MARK = 0xFFFFFFFF # 尾部空间不足 跳转至缓冲区开头
+
+RECORD_DEPTH = 'd' # ('d', symbol, ts, asks, bids)
+RECORD_BAR = 'b' # ('b', symbol, open_ts, volume, turnover, open, high, low, close)
+RECORD_LOG = 'l' # ('l', level, msg)
+
+_U64 = struct.Struct('<Q')
+_U32 = struct.Struct('<I')
+
+
+class ShmRing:
+    '''
+        共享内存单生产者单消费者环形缓冲 读写位置单调递增 取模得到偏移
+    '''
+
+    def __init__(self, name: str = None, capacity: int = 1 << 22, create: bool = False):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError(f"capacity 必须为2的幂: {capacity}")
+        self.capacity = capacity
+        self.mask = capacity - 1
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + capacity)
+            self.shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+
+    def _load(self, offset: int) -> int:
+        return _U64.unpack_from(self.buf, offset)[0]
+
+    def _store(self, offset: int, value: int):
+        _U64.pack_into(self.buf, offset, value)
+
+    def push(self, payload: bytes) -> bool:
+        '''
+            写入一条记录 缓冲区满返回 False 仅生产者调用
+        '''
+        size = len(payload)
+        need = 4 + size
+        if need > self.capacity >> 1:
+            raise ValueError(f"记录过大: {size}")
+        write = self._load(WRITE_POS)
+        read = self._load(READ_POS)
+        offset = write & self.mask
+        tail = self.capacity - offset
+        if tail < need:
+            if write + tail + need - read > self.capacity:
+                return False
+            if tail >= 4:
+                _U32.pack_into(self.buf, HEADER_SIZE + offset, WRAP_MARK)
+            write += tail
+            offset = 0
+        elif write + need - read > self.capacity:
+            return False
+        start = HEADER_SIZE + offset
+        _U32.pack_into(self.buf, start, size)
+        self.buf[start + 4:start + need] = payload
+        self._store(WRITE_POS, write + need) # 数据写完后再发布写入位置
+        return True
+
+    def drain(self, decode: Callable = bytes, max_count: int = 0) -> List[Any]:
+        '''
+            取出所有可读记录 decode 作用于记录的 memoryview 在读取位置前移之前完成 仅消费者调用
+        '''
+        write = self._load(WRITE_POS)
+        read = self._load(READ_POS)
+        records = []
+        buf = self.buf
+        while read < write:
+            offset = read & self.mask
+            tail = self.capacity - offset
+            if tail < 4:
+                read += tail
+                continue
+            start = HEADER_SIZE + offset
+            size = _U32.unpack_from(buf, start)[0]
+            if size == WRAP_MARK:
+                read += tail
+                continue
+            records.append(decode(buf[start + 4:start + 4 + size]))
+            read += 4 + size
+            if max_count and len(records) >= max_count:
+                break
+        self._store(READ_POS, read)
+        return records
+
+    def readable(self) -> bool:
+        return self._load(WRITE_POS) != self._load(READ_POS)
+
+    def used(self) -> int:
+        return self._load(WRITE_POS) - self._load(READ_POS)
+
+    def set_reader_sleeping(self, sleeping: bool):
+        self._store(READER_SLEEPING, 1 if sleeping else 0)
+
+    def is_reader_sleeping(self) -> bool:
+        return bool(self._load(READER_SLEEPING))
+
+    def add_dropped(self, count: int = 1):
+        self._store(DROPPED, self._load(DROPPED) + count)
+
+    def get_dropped(self) -> int:
+        return self._load(DROPPED)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# === 子进程 ===
+class FeedWriter:
+    '''
+        子进程侧 写入解析后的行情 深度在缓冲区满时丢弃 K线与日志等待读取线程腾出空间
+    '''
+
+    def __init__(self, ring: ShmRing, wakeup, block_timeout: float = 1):
+        self.ring = ring
+        self.wakeup = wakeup
+        self.block_timeout = block_timeout
+        self.lock = threading.Lock() # 子进程中可能有多个 websocket 线程
+
+    def put(self, record: tuple, block: bool = False):
+        payload = marshal.dumps(record)
+        with self.lock:
+            pushed = self.ring.push(payload)
+            if not pushed and block:
+                deadline = time.monotonic() + self.block_timeout
+                while not pushed and time.monotonic() < deadline:
+                    time.sleep(0.0005)
+                    pushed = self.ring.push(payload)
+            if not pushed:
+                self.ring.add_dropped()
+                return
+            if self.ring.is_reader_sleeping():
+                self.wakeup.set()
+
+    def log(self, level: int, msg: str):
+        self.put((RECORD_LOG, level, msg), block=True)
+
+
+def parse_binance_depth(data: dict, symbol_map: Dict[str, Tuple[str, float]]) -> tuple:
+    '''
+        与 BinanceUmGateway.on_depth_callback 相同的转换 推送已排序
+    '''
+    asks, bids = decode_binance_depth(data)
+    symbol = symbol_map.get(data['s'], (data['s'], 1))[0]
+    return (RECORD_DEPTH, symbol, data['E'], asks, bids)
+
+
+def parse_binance_kline(data: dict, symbol_map: Dict[str, Tuple[str, float]]) -> tuple or None:
+    '''
+        与 BinanceUmGateway.on_bar_callback 相同的转换 未走完的K线返回 None
+    '''
+    kline = data['k']
+    if not kline['x']:
+        return None
+    symbol = symbol_map.get(data['s'], (data['s'], 1))[0]
+    return (RECORD_BAR, symbol, int(kline['t']), float(kline['v']), float(kline['q']),
+            float(kline['o']), float(kline['h']), float(kline['l']), float(kline['c']))
+
+
+def parse_okx_books(message: dict, symbol_map: Dict[str, Tuple[str, float]]) -> tuple or None:
+    '''
+        与 OkxGateway.on_depth_callback 相同的转换 推送已排序 数量乘以合约面值
+    '''
+    symbol_info = symbol_map.get(message['arg']['instId'])
+    if symbol_info is None:
+        return None
+    symbol, size = symbol_info
+    asks, bids = decode_okx_books5(message['data'][0], size)
+    return (RECORD_DEPTH, symbol, int(time.time() * 1000), asks, bids)
+
+
+def parse_okx_candle(message: dict, symbol_map: Dict[str, Tuple[str, float]]) -> tuple or None:
+    '''
+        与 OkxGateway.on_bar_callback 相同的转换 未走完的K线返回 None
+    '''
+    candle = message['data'][0]
+    if candle[8] != '1':
+        return None
+    gw_symbol = message['arg']['instId'].upper()
+    symbol = symbol_map.get(gw_symbol, (gw_symbol, 1))[0]
+    return (RECORD_BAR, symbol, int(candle[0]), float(candle[6]), float(candle[7]),
+            float(candle[1]), float(candle[2]), float(candle[3]), float(candle[4]))
+
+
+def _run_binance(writer: FeedWriter, params: dict):
+    from .SDK.binance_sdk.binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
+
+    symbol_map = params['symbol_map']
+
+    def on_message(_, message):
+        try:
+            data = json_loads(message)
+            event = data.get('e')
+            if event == 'depthUpdate':
+                writer.put(parse_binance_depth(data, symbol_map))
+            elif event == 'kline':
+                record = parse_binance_kline(data, symbol_map)
+                if record:
+                    writer.put(record, block=True)
+            elif not event:
+                writer.log(LogLevel.INFO.value, f"WebSocket message: {data}")
+        except Exception as e:
+            writer.log(LogLevel.ERROR.value, f"feed on_message error: {e}; message: {message}")
+
+    ws_client = UMFuturesWebsocketClient(on_message=on_message)
+    _count = 0
+    depth_params = params.get('depth')
+    if depth_params is not None:
+        for symbol in params['gw_symbols']:
+            ws_client.partial_book_depth(symbol=symbol.lower(), level=depth_params.get('level', 20), speed=depth_params.get('speed', 100))
+            _count += 1
+            if _count % 5 == 0: # 每订阅5个币对休眠1s
+                time.sleep(1)
+    if params.get('bar') is not None:
+        for symbol in params['gw_symbols']:
+            ws_client.kline(symbol=symbol.lower(), interval='1m')
+            _count += 1
+            if _count % 5 == 0:
+                time.sleep(1)
+    writer.log(LogLevel.INFO.value, f"feed process subscribe {len(params['gw_symbols'])} symbols")
+
+
+def _run_okx(writer: FeedWriter, params: dict):
+    from .SDK.okx_sdk.okx.websocket.WsPublic import WsPublic
+
+    symbol_map = params['symbol_map']
+
+    def on_message(message: dict):
+        try:
+            channel = message.get('arg', {'channel': ''})['channel']
+            if 'data' in message and message['data']:
+                if channel == 'books5':
+                    record = parse_okx_books(message, symbol_map)
+                    if record:
+                        writer.put(record)
+                elif channel == 'candle1m':
+                    record = parse_okx_candle(message, symbol_map)
+                    if record:
+                        writer.put(record, block=True)
+            if message.get('event'):
+                writer.log(LogLevel.ERROR.value, f"{message['event']}: {message}")
+        except Exception as e:
+            writer.log(LogLevel.ERROR.value, f"feed on_message error{e}: {message}")
+
+    ws_client = WsPublic(url=params['url'])
+    ws_client.start()
+    if params.get('depth') is not None:
+        ws_client.subscribe([{"channel": "books5", "instId": _} for _ in params['gw_symbols']], on_message)
+    if params.get('bar') is not None:
+        ws_client.subscribe([{"channel": "candle1m", "instId": _} for _ in params['gw_symbols']], on_message)
+    writer.log(LogLevel.INFO.value, f"feed process subscribe {len(params['gw_symbols'])} symbols")
+
+
+FEED_RUNNERS: Dict[str, Callable] = {
+    Exchange.BINANCE.value: _run_binance,
+    Exchange.OKX.value: _run_okx,
+}
+
+
+def run_feed(exchange: str, ring_name: str, capacity: int, wakeup, stop, parent_pid: int, params: dict):
+    '''
+        子进程入口 订阅后等待 stop 或主进程退出
+    '''
+    ring = ShmRing(ring_name, capacity)
+    writer = FeedWriter(ring, wakeup)
+    try:
+        FEED_RUNNERS[exchange](writer, params)
+        while not stop.wait(1):
+            if os.getppid() != parent_pid: # 主进程已退出
+                break
+    except Exception as e:
+        error_msg = traceback.format_exc()
+        writer.log(LogLevel.ERROR.value, f"feed process error: {e} 报错信息:\n{error_msg}")
+    finally:
+        os._exit(0) # websocket 线程非守护线程 直接退出
+
+
+# === 主进程 ===
+class FeedProcess:
+    '''
+        主进程侧 启动行情子进程 读取线程从共享内存取出记录 构造事件推送至 main_engine
+        gateway 需有 main_engine exchange gateway_name ts_last_depth ts_last_bar use_array_depth symbol_contract_map 属性
+    '''
+
+    def __init__(self, gateway, params: dict, capacity: int = 1 << 22, spin_us: int = 50, sleep_timeout: float = 0.05):
+        '''
+            Params:
+                params: 子进程参数
+                    gw_symbols: 订阅的交易所币对
+                    symbol_map: {gw_symbol: (nd_symbol, size)} size 为深度数量的换算系数
+                    depth: 深度 topic 参数 不订阅为 None
+                    bar: K线 topic 参数 不订阅为 None
+                    url: websocket 地址 (OKX)
+                capacity: 共享内存环形缓冲字节数 2的幂
+                spin_us: 读取线程无数据时自旋的微秒数 之后休眠等待子进程唤醒
+                sleep_timeout: 休眠的最长秒数 仅作为写入与休眠标志竞争时的兜底 正常由子进程写入后唤醒
+        '''
+        self.gateway = gateway
+        self.params = params
+        self.capacity = capacity
+        self.spin_ns = spin_us * 1000
+        self.sleep_timeout = sleep_timeout
+
+        self.ctx = multiprocessing.get_context('spawn')
+        self.ring: ShmRing = None
+        self.process = None
+        self.reader: threading.Thread = None
+        self.wakeup = None
+        self.stop_event = None
+        self.active: bool = False
+        self.record_count: int = 0
+
+    def start(self):
+        self.ring = ShmRing(capacity=self.capacity, create=True)
+        self.wakeup = self.ctx.Event()
+        self.stop_event = self.ctx.Event()
+        self.process = self.ctx.Process(
+            target=run_feed,
+            args=(self.gateway.exchange.value, self.ring.name, self.capacity, self.wakeup, self.stop_event, os.getpid(), self.params),
+            name=f"nd_feed_{self.gateway.gateway_name}",
+            daemon=True,
+        )
+        self.process.start()
+        self.active = True
+        self.reader = threading.Thread(target=self.run_reader, name=f"nd_feed_reader_{self.gateway.gateway_name}", daemon=True)
+        self.reader.start()
+        msg = f"行情子进程已启动 pid: {self.process.pid}"
+        self.gateway.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway.gateway_name)
+
+    def stop(self, timeout: float = 3):
+        '''
+            停止子进程与读取线程 释放共享内存
+        '''
+        if not self.active:
+            return
+        self.active = False
+        self.stop_event.set()
+        self.wakeup.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.reader.join(timeout)
+        self.ring.close()
+        self.ring.unlink()
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'pid': self.process.pid if self.process else None,
+            'alive': bool(self.process and self.process.is_alive()),
+            'records': self.record_count,
+            'dropped': self.ring.get_dropped() if self.active else 0,
+            'buffered_bytes': self.ring.used() if self.active else 0,
+        }
+
+    def run_reader(self):
+        ring = self.ring
+        loads = marshal.loads
+        idle_start = 0
+        while self.active:
+            try:
+                records = ring.drain(loads)
+                if records:
+                    idle_start = 0
+                    self.record_count += len(records)
+                    self.on_records(records)
+                    continue
+                now = time.perf_counter_ns()
+                if not idle_start:
+                    idle_start = now
+                if now - idle_start < self.spin_ns:
+                    continue
+                # 自旋结束仍无数据 阻塞等待子进程写入后唤醒 空闲时不占用 CPU
+                # 先设置休眠标志再检查缓冲区 子进程写入后看到标志即 set; 两者的写入同时发生时由 sleep_timeout 兜底
+                self.wakeup.clear()
+                ring.set_reader_sleeping(True)
+                if not ring.readable():
+                    self.wakeup.wait(self.sleep_timeout)
+                ring.set_reader_sleeping(False)
+                idle_start = 0
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                msg = f"行情子进程读取异常: {e} 报错信息:\n{error_msg}"
+                self.gateway.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway.gateway_name)
+
+    def on_records(self, records: List[tuple]):
+        gateway = self.gateway
+        main_engine = gateway.main_engine
+        exchange, gateway_name = gateway.exchange, gateway.gateway_name
+        for record in records:
+            kind = record[0]
+            if kind == RECORD_DEPTH:
+                _, symbol, ts, asks, bids = record
+                gateway.ts_last_depth = int(time.time() * 1000)
+                if gateway.use_array_depth:
+                    contract = gateway.symbol_contract_map.get(symbol)
+                    depth_data = ArrayDepthData.from_levels(symbol, exchange, ts, asks, bids, tick_size=contract.tick_size if contract else 0)
+                else:
+                    depth_data = DepthData(symbol=symbol, exchange=exchange, ts=ts, asks=asks, bids=bids)
+                main_engine.put_event(event_type=EventType.DEPTH, exchange=exchange, gateway_name=gateway_name, symbol=symbol, data=depth_data)
+            elif kind == RECORD_BAR:
+                _, symbol, open_ts, volume, turnover, open_price, high_price, low_price, close_price = record
+                gateway.ts_last_bar = int(time.time() * 1000)
+                bar_data = BarData(
+                    symbol=symbol,
+                    exchange=exchange,
+                    gateway_name=gateway_name,
+                    open_ts=open_ts,
+                    interval=Interval.MINUTE,
+                    volume=volume,
+                    turnover=turnover,
+                    open_price=open_price,
+                    high_price=high_price,
+                    low_price=low_price,
+                    close_price=close_price,
+                )
+                main_engine.put_event(event_type=EventType.BAR, exchange=exchange, gateway_name=gateway_name, symbol=symbol, data=bar_data)
+            elif kind == RECORD_LOG:
+                _, level, msg = record
+                main_engine.write_log(msg, level=level, source=gateway_name)
@@ -1,8 +1,41 @@
+import threading
+import time
+import traceback
 from abc import ABC, abstractmethod
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Tuple
 from ..trader.constant import (
     LogLevel, Direction, Offset, Status, Exchange, Product, GatewayName, Interval, EventType
 )
-from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, Event
+from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, Event, OrderRequest, CancelRequest
+from ..trader.order_book import LocalOrderBook
+from ..trader.contract_cache import load_contract_cache, save_contract_cache
+from ..trader.snapshot import diff_contracts
+from .ws_trade import WsTradeClient, WsTradeTimeout
+from .decoder import build_depth_symbol_map
+
+
+class ContractMaps(NamedTuple):
+    '''
+        合约信息与 symbol 映射 由 set_contract_map 整体替换 读取方不会看到新旧混合的映射
+        各映射为只读 MappingProxyType
+    '''
+    symbol_contract_map: Mapping[str, ContractData] # nd_symbol: ContractData
+    gw_total_symbols: Tuple[str, ...] # gw_symbol tuple
+    nd2gw_symbol_map: Mapping[str, str] # nd_symbol: gw_symbol
+    gw2nd_symbol_map: Mapping[str, str] # gw_symbol: nd_symbol
+    depth_symbol_map: Mapping[str, Tuple[str, float, float]] # gw_symbol: (nd_symbol, size, tick_size) 见 decoder
+
+    @classmethod
+    def build(cls, symbol_contract_map: Dict[str, ContractData]) -> 'ContractMaps':
+        symbol_contract_map = dict(symbol_contract_map)
+        return cls(
+            symbol_contract_map=MappingProxyType(symbol_contract_map),
+            gw_total_symbols=tuple(contract.gw_symbol for contract in symbol_contract_map.values()),
+            nd2gw_symbol_map=MappingProxyType({symbol: contract.gw_symbol for symbol, contract in symbol_contract_map.items()}),
+            gw2nd_symbol_map=MappingProxyType({contract.gw_symbol: symbol for symbol, contract in symbol_contract_map.items()}),
+            depth_symbol_map=MappingProxyType(build_depth_symbol_map(symbol_contract_map)),
+        )
 
 
 class BaseGateway(ABC):
@@ -15,11 +48,167 @@ class BaseGateway(ABC):
             实例化 clint 获取精度信息
         '''
         self.reconnect_seconds_after_lost_depth: int = 3
+        self.use_feed_process: bool = False # 公有行情在子进程中接收与解析 见 feed_process 需在 connect 之前设置
+        self.feed_process = None # FeedProcess
+        self.use_array_depth: bool = False # 推送 ArrayDepthData 由 DEPTH topic 参数 array 开启 见 array_depth
+        self.use_local_book: bool = False # 由增量深度维护本地订单簿 由 DEPTH topic 参数 book 开启 见 order_book
+        self.depth_level: int = 20 # 本地订单簿推送的深度档位数量 DEPTH topic 参数 level
+        self.order_books: Dict[str, LocalOrderBook] = {} # nd_symbol: LocalOrderBook
+        self.use_ws_trade: bool = False # 通过 websocket 下单 撤单 改单 未连接时回退 REST 见 ws_trade 需在 connect 之前设置
+        self.ws_trade_client: WsTradeClient = None
+        self.contract_cache: str = '' # 合约信息缓存文件路径 为空不缓存 见 contract_cache
+        self.contract_cache_loaded: bool = False # 合约信息来自缓存 connect 后立即后台刷新
+        self.contract_refresh_interval: float = 3600 # connect 后定时刷新合约信息 秒 0 不定时刷新
+        self.contract_max_drop_ratio: float = 0.2 # 刷新结果缺少超过该比例的已有合约时视为查询不完整 不替换
+        self.contract_maps: ContractMaps = ContractMaps.build({}) # 合约信息与 symbol 映射 见 set_contract_map
 
 
     def add_main_engine(self, main_engine): # : MainEngine
         self.main_engine = main_engine
 
+    # === 合约信息 读取 contract_maps 中的只读映射 ===
+    @property
+    def symbol_contract_map(self) -> Mapping[str, ContractData]:
+        return self.contract_maps.symbol_contract_map
+
+    @property
+    def gw_total_symbols(self) -> Tuple[str, ...]:
+        return self.contract_maps.gw_total_symbols
+
+    @property
+    def nd2gw_symbol_map(self) -> Mapping[str, str]:
+        return self.contract_maps.nd2gw_symbol_map
+
+    @property
+    def gw2nd_symbol_map(self) -> Mapping[str, str]:
+        return self.contract_maps.gw2nd_symbol_map
+
+    @property
+    def depth_symbol_map(self) -> Mapping[str, Tuple[str, float, float]]:
+        return self.contract_maps.depth_symbol_map
+
+    def set_contract_map(self, symbol_contract_map: Dict[str, ContractData]):
+        '''
+            设置合约信息 symbol_contract_map {nd_symbol: ContractData} 生成全部映射后一次赋值
+        '''
+        self.contract_maps = ContractMaps.build(symbol_contract_map)
+
+    def update_contract_map(self, symbol_contract_map: Dict[str, ContractData]):
+        '''
+            query_contracts 解析完成后调用 检查后整体替换并写入缓存
+            已有合约信息时 新结果缺少超过 contract_max_drop_ratio 的已有合约视为查询不完整(限频 部分产品类型查询失败) 不替换并抛出异常
+        '''
+        old_map = self.symbol_contract_map
+        dropped = len(old_map.keys() - symbol_contract_map.keys())
+        if old_map and dropped > len(old_map) * self.contract_max_drop_ratio:
+            raise ValueError(f"合约信息查询结果不完整 缺少 {dropped}/{len(old_map)} 个已有合约 未替换")
+        self.set_contract_map(symbol_contract_map)
+        self.save_contract_cache()
+
+    def init_depth_options(self):
+        '''
+            connect 时读取 DEPTH topic 参数
+        '''
+        depth_params = self.main_engine.topic.get(self.gateway_name, {}).get(EventType.DEPTH.value, {})
+        self.use_array_depth = bool(depth_params.get('array', False))
+        self.use_local_book = bool(depth_params.get('book', False))
+        self.depth_level = depth_params.get('level', 20)
+
+    def publish_order_book(self, book: LocalOrderBook):
+        '''
+            推送本地订单簿前 depth_level 档
+        '''
+        depth_data = book.get_depth(self.depth_level, use_array=self.use_array_depth)
+        self.main_engine.put_event(event_type=EventType.DEPTH, exchange=self.exchange, gateway_name=self.gateway_name, symbol=book.symbol, data=depth_data)
+
+    def start_ws_trade(self, client: WsTradeClient):
+        '''
+            connect 时启动 websocket 下单通道 最多等待 client.timeout 秒 未连接时先使用 REST
+        '''
+        client.on_log = lambda msg, level: self.main_engine.write_log(msg, level=level, source=self.gateway_name)
+        self.ws_trade_client = client
+        if not client.start(wait=client.timeout):
+            msg = f"websocket 下单通道未连接 连接前使用 REST 下单"
+            self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+
+    def ws_trade_request(self, *args, rest_on_timeout: bool = True) -> dict or None:
+        '''
+            通过 websocket 下单通道发送请求 args 传给 ws_trade_client.request
+            Return: 交易所响应 未开启或未连接返回 None 由调用方回退 REST
+            rest_on_timeout: 超时未响应时返回 None 回退 REST; 为 False 时抛出 WsTradeTimeout 下单使用 避免重复下单
+        '''
+        if self.ws_trade_client is None:
+            return None
+        try:
+            return self.ws_trade_client.request(*args)
+        except WsTradeTimeout as e:
+            if not rest_on_timeout:
+                raise
+            msg = f"websocket 下单通道 {e} 回退 REST"
+            self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+            return None
+
+    def load_contract_cache(self) -> bool:
+        '''
+            构造 gateway 时读取合约信息缓存 成功时调用 set_contract_map 返回 True
+        '''
+        symbol_contract_map = load_contract_cache(self.contract_cache, self.gateway_name)
+        if not symbol_contract_map:
+            return False
+        self.set_contract_map(symbol_contract_map)
+        self.contract_cache_loaded = True
+        return True
+
+    def save_contract_cache(self):
+        '''
+            query_contracts 解析完成后写入缓存 构造时可能尚无 main_engine 异常直接打印
+        '''
+        if not self.contract_cache:
+            return
+        try:
+            save_contract_cache(self.contract_cache, self.gateway_name, self.symbol_contract_map)
+        except Exception as e:
+            print(f"{self.gateway_name} 保存合约信息缓存异常: {e}")
+
+    def start_contract_refresh(self):
+        '''
+            connect 时启动后台刷新线程 合约信息来自缓存时立即刷新 之后每 contract_refresh_interval 秒刷新
+            query_contracts 解析完成后由 update_contract_map 检查后整体替换 不会读到不完整的合约信息
+        '''
+        if not self.contract_cache_loaded and not self.contract_refresh_interval:
+            return
+        threading.Thread(target=self.run_contract_refresh, daemon=True).start()
+
+    def run_contract_refresh(self):
+        refresh_now = self.contract_cache_loaded
+        while True:
+            if not refresh_now:
+                if not self.contract_refresh_interval:
+                    return
+                time.sleep(self.contract_refresh_interval)
+            refresh_now = False
+            try:
+                old_map = self.symbol_contract_map
+                self.query_contracts()
+                changes = diff_contracts(old_map, self.symbol_contract_map)
+                msg = f"合约信息已刷新 合约数量: {len(self.symbol_contract_map)} 变化: {len(changes)}" + ''.join(f"\n    {c}" for c in changes[:20])
+                self.main_engine.write_log(msg, level=LogLevel.WARNING.value if changes else LogLevel.INFO.value, source=self.gateway_name)
+            except Exception as e:
+                msg = f"run_contract_refresh error: {e}\n{traceback.format_exc()}"
+                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+
+    def dump_state(self) -> dict:
+        '''
+            快照中保存的 gateway 状态 例如合约信息 重启时传入 warm_state 跳过 REST 初始化
+        '''
+        return {}
+
+    def load_state(self, state: dict):
+        '''
+            从快照恢复 dump_state 保存的状态
+        '''
+        pass
+
     @abstractmethod
     def connect(self, symbols: list):
         '''
@@ -49,6 +238,30 @@ class BaseGateway(ABC):
         '''
         pass
 
+    def amend_order(self, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, **kwargs) -> bool:
+        '''
+            改单 订单号不变 new_price / new_amount 为空时不修改 new_amount 为包含已成交的订单总量
+            kwargs: direction 订单方向 由 MainEngine 从 OMS 传入
+            成功返回True 不支持改单的 gateway 返回False
+        '''
+        msg = f"amend_order error: {self.gateway_name} 不支持改单"
+        self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        return False
+
+    def send_orders(self, requests: List[OrderRequest]) -> List[str]:
+        '''
+            批量下单 默认逐个调用 send_order 支持批量接口的 gateway 重写
+            return: 与 requests 顺序一致的 orderid 列表 失败为空字符串
+        '''
+        return [self.send_order(req.symbol, req.direction, req.offset, req.price, req.amount, **req.kwargs) for req in requests]
+
+    def cancel_orders(self, requests: List[CancelRequest]) -> List[bool]:
+        '''
+            批量撤单 默认逐个调用 cancel_order 支持批量接口的 gateway 重写
+            return: 与 requests 顺序一致的撤单结果
+        '''
+        return [self.cancel_order(req.symbol, req.orderid) for req in requests]
+
     @abstractmethod
     def query_order(self, symbol: str, order_id: str):
         '''
@@ -6,16 +6,26 @@ import time
 import json
 from typing import Any, Dict, List, Tuple
 import threading
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 
 from .gateway import BaseGateway
+from .feed_process import FeedProcess
+from ..trader.snapshot import diff_contracts
 from ..trader.constant import (
     LogLevel, Direction, Offset, Status, Exchange, Product, GatewayName, EventType, Interval
 )
-from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event
+from ..trader.object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event, OrderRequest, CancelRequest
+from ..trader.array_depth import ArrayDepthData
+from ..trader.order_book import LocalOrderBook
+from .decoder import json_loads, decode_okx_books5
 from .SDK.okx_sdk.okx import PublicData, Account, Trade
 from .SDK.okx_sdk.okx.websocket.WsPublic import WsPublic
 from .SDK.okx_sdk.okx.websocket.WsPrivate import WsPrivate
+from .SDK.okx_sdk.okx.websocket.WsClientProtocol import WsClientProtocol
+from .ws_trade import OkxWsTradeClient, WsTradeTimeout
+
+# SDK websocket 消息使用 decoder 选择的 json backend 解析
+WsClientProtocol.loads = staticmethod(json_loads)
 
 # 产品类别映射
 instType2product: Dict[str, Product] = {
@@ -46,6 +56,10 @@ STATUS_OKX2ND: Dict[str, Status] = {
     "mmp_canceled": Status.CANCELLED
 }
 
+# 批量接口单次上限
+BATCH_ORDER_LIMIT = 20
+BATCH_CANCEL_LIMIT = 20
+
 
 class OkxGateway(BaseGateway):
     '''
@@ -57,7 +71,13 @@ class OkxGateway(BaseGateway):
             1. 暂不支持杠杠、期权交易
     '''
 
-    def __init__(self, api: dict) -> None:
+    def __init__(self, api: dict, warm_state: dict = None, contract_cache: str = '') -> None:
+        '''
+            Params:
+                warm_state: 快照中的 gateway 状态 get_gateway_state(load_snapshot(path), gateway_name)
+                    传入时跳过 REST 初始化 connect 后在后台重新查询并替换
+                contract_cache: 合约信息缓存文件路径 有缓存时跳过合约查询 connect 后后台刷新 见 contract_cache
+        '''
         # === Gateway 基础信息 ===
         self.gateway_name : str = GatewayName.OKX.value
         self.exchange = Exchange.OKX
@@ -72,6 +92,8 @@ class OkxGateway(BaseGateway):
         self.ts_last_bar: int = 0 # 上一次获取K线时的时间戳
         self.ts_last_subcribe: int = 0 # 上一次订阅深度的时间戳
 
+        self.warm_state = warm_state
+        self.contract_cache = contract_cache
         self.on_init()
 
     def on_init(self):
@@ -82,7 +104,12 @@ class OkxGateway(BaseGateway):
         self.tradeClient = Trade.TradeAPI(api_key=self.key, api_secret_key=self.secret, passphrase=self.passphrase, use_server_time=False, flag='0', debug=False)
 
         # === 初始化工作 此前必须 init rest clint ===
-        self.on_rest_init() # 获取价格精度等信息  
+        if self.warm_state:
+            self.load_state(self.warm_state) # 从快照恢复 connect 后后台校验
+        elif self.load_contract_cache(): # 合约信息来自缓存 connect 后后台刷新
+            self.query_account_config()
+        else:
+            self.on_rest_init() # 获取价格精度等信息
 
     def init_ws_client(self):
         '''
@@ -95,12 +122,12 @@ class OkxGateway(BaseGateway):
             # wss://wsaws.okx.com:8443/ws/v5/public : 有depth 无bar
             # wss://wsaws.okx.com:8443/ws/v5/business:无depth 有bar
         # 不允许同时订阅bar & depth
-        if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys() and \
-            EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+        if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys() and \
+            EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
             raise ValueError("不允许同时订阅深度和K线")
-        if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+        if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys():
             self.ws_public_url = "wss://wsaws.okx.com:8443/ws/v5/public"
-        elif EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+        elif EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
             self.ws_public_url = "wss://wsaws.okx.com:8443/ws/v5/business"
 
         # WS client
@@ -123,11 +150,12 @@ class OkxGateway(BaseGateway):
         # 1. 获取合约信息
         total_insts = []
         for instType_ in ["SPOT", "MARGIN", "SWAP", "FUTURES"]: # TODO: 期货合约信息获取
-            insts = self.publicDataClient.get_instruments(instType=instType_)['data']
-            total_insts.extend(insts)
-            time.sleep(0.25)
+            res = self.publicDataClient.get_instruments(instType=instType_) # 限速 20次/2s
+            if res.get('code') != '0': # 任一产品类型失败则整体失败 避免替换为缺少该产品类型的合约信息
+                raise Exception(f"get_instruments {instType_} 失败: code: {res.get('code')} msg: {res.get('msg')}")
+            total_insts.extend(res['data'])
         # 2. 解析合约信息
-        self.symbol_contract_map: Dict[str, ContractData] = {} # nd_symbol: ContractData
+        symbol_contract_map: Dict[str, ContractData] = {} # nd_symbol: ContractData
         
         for inst in total_insts:
 
@@ -161,12 +189,38 @@ class OkxGateway(BaseGateway):
                 delivery_date = delivery_date # 交割日期
             )
             # 保存合约信息
-            self.symbol_contract_map[contract.symbol] = contract
+            symbol_contract_map[contract.symbol] = contract
+
+        # 3. 全部解析完成后检查并整体替换 后台刷新时不会读到不完整的合约信息
+        self.update_contract_map(symbol_contract_map)
+
+    def dump_state(self) -> dict:
+        return {
+            'symbol_contract_map': dict(self.symbol_contract_map),
+            'account_config': self.account_config,
+        }
 
-            self.gw_total_symbols = tuple([c.gw_symbol for c in self.symbol_contract_map.values()])
+    def load_state(self, state: dict):
+        self.set_contract_map(state['symbol_contract_map'])
+        self.account_config: dict = state['account_config']
+        self.acctLv: str = self.account_config['acctLv']
+        self.posMode: str = self.account_config['posMode']
 
-            self.nd2gw_symbol_map = {contract.symbol: contract.gw_symbol for contract in self.symbol_contract_map.values()}
-            self.gw2nd_symbol_map = {contract.gw_symbol: contract.symbol for contract in self.symbol_contract_map.values()}
+    def validate_state(self):
+        '''
+            从快照恢复后 在后台重新查询合约信息与账户配置 替换快照中的数据
+        '''
+        try:
+            old_map, old_posMode = self.symbol_contract_map, self.posMode
+            self.on_rest_init()
+            changes = diff_contracts(old_map, self.symbol_contract_map)
+            if old_posMode != self.posMode:
+                changes.append(f"仓位模式 posMode: {old_posMode} -> {self.posMode}")
+            msg = f"快照校验完成 合约数量: {len(self.symbol_contract_map)} 变化: {len(changes)}" + ''.join(f"\n    {c}" for c in changes[:20])
+            self.main_engine.write_log(msg, level=LogLevel.WARNING.value if changes else LogLevel.INFO.value, source=self.gateway_name)
+        except Exception as e:
+            msg = f"validate_state error: {e}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
 
     def query_account_config(self) -> None:
         '''
@@ -206,6 +260,75 @@ class OkxGateway(BaseGateway):
         return self.gw2nd_symbol_map.get(symbol, symbol)
     
 
+    def _order_sz(self, symbol: str, direction: Direction, ordType: str, price: float, amount: float) -> Tuple[Any, str]:
+        '''
+            base 数量 amount 转换为下单参数 sz 合约按面值转换为张数 按合约精度处理
+            Return: (sz, tgtCcy)
+        '''
+        contract = self.symbol_contract_map[symbol]
+        product = contract.product
+        tgtCcy = ''
+        if product in [Product.FUTURES, Product.SWAP, Product.OPTION]:
+            contract_num = amount / contract.size
+            sz = self._float_precision(contract_num, contract.qty_precision)
+        elif product == Product.SPOT:
+            if ordType in LIMIT_ORDER_TYPES:
+                sz = self._float_precision(amount, contract.qty_precision)
+            elif ordType in MARKET_ORDER_TYPES:
+                tgtCcy = 'base_ccy'
+                sz = self._float_precision(amount, contract.qty_precision)
+        elif product == Product.MARGIN:
+            if ordType in LIMIT_ORDER_TYPES:
+                sz = self._float_precision(amount, contract.qty_precision)
+            elif ordType in MARKET_ORDER_TYPES:
+                if direction == Direction.LONG:
+                    sz = self._float_precision(amount * price, contract.qty_precision)
+                elif direction == Direction.SHORT:
+                    sz = self._float_precision(amount, contract.qty_precision)
+        return sz, tgtCcy
+
+    def _order_params(self, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, **kwargs) -> dict or None:
+        '''
+            place_order 参数 合约不存在返回 None
+        '''
+        # 转化为交易所symbol -- instId
+        gw_symbol = self.switch_gw_symbol(symbol)
+
+        # 检查币对是否存在
+        if gw_symbol not in self.gw_total_symbols:
+            msg = f"send_order error: {symbol} not find in exchange_symbols"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return None
+        
+        product: Product = self.symbol_contract_map[symbol].product # 产品类型
+        
+        if 'tdMode' not in kwargs: # --tdMode
+            tdMode = self._get_defult_tdMode(product)
+        else:
+            tdMode = kwargs['tdMode']
+
+        side = 'buy' if direction == Direction.LONG else 'sell' # --side
+        
+        if self.posMode == 'long_short_mode': # --posSide
+            if (direction == Direction.LONG and offset == Offset.OPEN) or\
+            (direction == Direction.SHORT and offset == Offset.CLOSE):
+                posSide = 'LONG'
+            elif (direction == Direction.LONG and offset == Offset.CLOSE) or\
+            (direction == Direction.SHORT and offset == Offset.OPEN):
+                posSide = 'SHORT'
+        else:
+            posSide =''
+
+        ordType = kwargs.get('ordType', 'limit') # --ordType
+
+        price_precision = self.symbol_contract_map[symbol].price_precision
+        px = self._float_precision(price, price_precision) if ordType in LIMIT_ORDER_TYPES else '' # --px
+        sz, tgtCcy = self._order_sz(symbol, direction, ordType, price, amount) # --sz --tgtCcy
+
+        # 去掉kwargs中的 instId tdMode side posSide ordType px sz tgtCcy
+        kwargs_ = {k: v for k, v in kwargs.items() if k not in ['instId', 'tdMode', 'side', 'posSide', 'ordType', 'px', 'sz', 'tgtCcy']}
+        return dict(instId=gw_symbol, tdMode=tdMode, side=side, posSide=posSide, ordType=ordType, px=px, sz=sz, tgtCcy=tgtCcy, **kwargs_)
+
     def send_order(self, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, **kwargs) -> str:
         '''
             发送订单
@@ -221,99 +344,66 @@ class OkxGateway(BaseGateway):
             Note
                 1. 若kwargs无特殊指定: 杠杠类产品均为逐仓
                 2. amount 为base下单数量 自动转换为传参数量
+                3. use_ws_trade 开启时通过 websocket 下单 未连接时使用 REST
 
         '''
         try:
-            # 转化为交易所symbol -- instId
-            gw_symbol = self.switch_gw_symbol(symbol)
-
-            # 检查币对是否存在
-            if gw_symbol not in self.gw_total_symbols:
-                msg = f"send_order error: {symbol} not find in exchange_symbols"
-                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            params = self._order_params(symbol, direction, offset, price, amount, **kwargs)
+            if params is None:
                 return ""
-            
-            product: Product = self.symbol_contract_map[symbol].product # 产品类型
-            
-            if 'tdMode' not in kwargs: # --tdMode
-                tdMode = self._get_defult_tdMode(product)
-            else:
-                tdMode = kwargs['tdMode']
-
-            side = 'buy' if direction == Direction.LONG else 'sell' # --side
-            
-            if self.posMode == 'long_short_mode': # --posSide
-                if (direction == Direction.LONG and offset == Offset.OPEN) or\
-                (direction == Direction.SHORT and offset == Offset.CLOSE):
-                    posSide = 'LONG'
-                elif (direction == Direction.LONG and offset == Offset.CLOSE) or\
-                (direction == Direction.SHORT and offset == Offset.OPEN):
-                    posSide = 'SHORT'
-            else:
-                posSide =''
-
-            ordType = kwargs.get('ordType', 'limit') # --ordType
-
-            price_precision = self.symbol_contract_map[symbol].price_precision
-            px = self._float_precision(price, price_precision) if ordType in LIMIT_ORDER_TYPES else '' # --px
-            tgtCcy = '' # --tgtCcy
-            # --sz
-            if product in [Product.FUTURES, Product.SWAP, Product.OPTION]:
-                contract_num = amount / self.symbol_contract_map[symbol].size
-                sz = self._float_precision(contract_num, self.symbol_contract_map[symbol].qty_precision)
-            elif product == Product.SPOT:
-                if ordType in LIMIT_ORDER_TYPES:
-                    sz = self._float_precision(amount, self.symbol_contract_map[symbol].qty_precision)
-                elif ordType in MARKET_ORDER_TYPES:
-                    tgtCcy = 'base_ccy'
-                    sz = self._float_precision(amount, self.symbol_contract_map[symbol].qty_precision)
-            elif product == Product.MARGIN:
-                if ordType in LIMIT_ORDER_TYPES:
-                    sz = self._float_precision(amount, self.symbol_contract_map[symbol].qty_precision)
-                elif ordType in MARKET_ORDER_TYPES:
-                    if direction == Direction.LONG:
-                        sz = self._float_precision(amount * price, self.symbol_contract_map[symbol].qty_precision)
-                    elif direction == Direction.SHORT:
-                        sz = self._float_precision(amount, self.symbol_contract_map[symbol].qty_precision)
-            
-            # 去掉kwargs中的 instId tdMode side posSide ordType px sz tgtCcy
-            kwargs_ = {k: v for k, v in kwargs.items() if k not in ['instId', 'tdMode', 'side', 'posSide', 'ordType', 'px', 'sz', 'tgtCcy']}
-            
-            # 下单
-            # # --临时debug
-            # msg = f"{'<' *24}]nsend_order debug:\ninstId@{gw_symbol} tdMode@{tdMode} side@{side} posSide@{posSide} ordType@{ordType} px@{px} sz@{sz} tgtCcy@{tgtCcy} kwargs@{kwargs_}"
-            # self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
-
-            res = self.tradeClient.place_order(instId=gw_symbol, tdMode=tdMode, side=side, posSide=posSide, ordType=ordType, px=px, sz=sz, tgtCcy=tgtCcy, **kwargs_)
-            
-            # # --临时debug
-            # msg = f"res@{res}\n{'>' *24}"
-            # self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
-
+            res = self.ws_trade_request('order', [params], rest_on_timeout=False) # 响应与 REST 相同 未连接返回 None
+            if res is None:
+                res = self.tradeClient.place_order(**params)
             if res['code'] != '0':
                 msg = f"send_order error: {res}"
                 self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
                 return ""
             else:
-                # order_data = OrderData(
-                #     symbol=symbol,
-                #     exchange=self.exchange,
-                #     orderid=str(res['data'][0]['ordId']),
-                #     direction=direction,
-                #     offset=offset,
-                #     price=price,
-                #     volume=amount,
-                #     traded=0,
-                #     status=Status.SUBMITTING,
-                #     ts=int(time.time() * 1000)
-                # )
-                # self.main_engine.put_event(event_type=EventType.ORDER, exchange=self.exchange, gateway_name=self.gateway_name, symbol=symbol, data=order_data)
                 return res['data'][0]['ordId']
 
+        except WsTradeTimeout as e:
+            msg = f"send_order error: websocket {e} 订单状态未知 以订单推送为准; 合约: {symbol} 价格: {price} 数量: {amount}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return ""
         except Exception as e:
             msg = f"send_order error: {e}"
             self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
             return ""
+
+    def send_orders(self, requests: List[OrderRequest]) -> List[str]:
+        '''
+            批量下单 place_multiple_orders 每次最多 BATCH_ORDER_LIMIT 个 可包含不同合约
+            Return:
+                与 requests 顺序一致的 ordId 列表 失败为空字符串
+        '''
+        results = [''] * len(requests)
+        batch = [] # (index, params)
+        for index, req in enumerate(requests):
+            try:
+                params = self._order_params(req.symbol, req.direction, req.offset, req.price, req.amount, **req.kwargs)
+            except Exception as e:
+                msg = f"send_orders error: {e}; 合约: {req.symbol}"
+                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+                continue
+            if params is not None:
+                batch.append((index, params))
+        for start in range(0, len(batch), BATCH_ORDER_LIMIT):
+            chunk = batch[start:start + BATCH_ORDER_LIMIT]
+            try:
+                res = self.tradeClient.place_multiple_orders([params for _, params in chunk])
+                if res['code'] not in ('0', '1'): # 1: 部分成功
+                    msg = f"send_orders error: {res}"
+                    self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+                for (index, params), item in zip(chunk, res.get('data', [])):
+                    if item.get('sCode') == '0':
+                        results[index] = item['ordId']
+                    elif res['code'] == '1':
+                        msg = f"send_orders error: {item}; 合约: {params['instId']} 价格: {params['px']} 数量: {params['sz']}"
+                        self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            except Exception as e:
+                msg = f"send_orders error: {e}; 订单数量: {len(chunk)}"
+                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        return results
     
     def cancel_order(self, symbol: str, orderid: str):
         '''
@@ -327,7 +417,9 @@ class OkxGateway(BaseGateway):
         '''
         gw_symbol = self.switch_gw_symbol(symbol)
         try:
-            res = self.tradeClient.cancel_order(instId=gw_symbol, ordId=orderid)
+            res = self.ws_trade_request('cancel-order', [{'instId': gw_symbol, 'ordId': orderid}])
+            if res is None:
+                res = self.tradeClient.cancel_order(instId=gw_symbol, ordId=orderid)
             if res['code'] == '0' and res['data'][0]['sCode'] == '0':
                 return True
             else:
@@ -337,6 +429,55 @@ class OkxGateway(BaseGateway):
             self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
             return False
 
+    def cancel_orders(self, requests: List[CancelRequest]) -> List[bool]:
+        '''
+            批量撤单 cancel_multiple_orders 每次最多 BATCH_CANCEL_LIMIT 个 可包含不同合约
+            Return:
+                与 requests 顺序一致的撤单结果
+        '''
+        results = [False] * len(requests)
+        for start in range(0, len(requests), BATCH_CANCEL_LIMIT):
+            chunk = requests[start:start + BATCH_CANCEL_LIMIT]
+            try:
+                res = self.tradeClient.cancel_multiple_orders([{'instId': self.switch_gw_symbol(req.symbol), 'ordId': req.orderid} for req in chunk])
+                for offset, item in enumerate(res.get('data', [])):
+                    results[start + offset] = item.get('sCode') == '0'
+            except Exception as e:
+                msg = f"cancel_orders error: {e}; 订单数量: {len(chunk)}"
+                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        return results
+
+    def amend_order(self, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, **kwargs) -> bool:
+        '''
+            改单 amend_order 订单号不变
+            Parameters:
+                symbol: nd_symbol 币对
+                orderid: 订单号
+                new_price: 新价格 为空不修改
+                new_amount: 新订单总量(base数量) 包含已成交 为空不修改
+                kwargs: cxlOnFail 改单失败时是否撤单 默认 false
+            Return:
+                True: 改单成功
+                False: 改单失败
+        '''
+        try:
+            gw_symbol = self.switch_gw_symbol(symbol)
+            newPx = self._float_precision(new_price, self.symbol_contract_map[symbol].price_precision) if new_price is not None else ''
+            newSz = self._order_sz(symbol, kwargs.get('direction', Direction.LONG), 'limit', new_price, new_amount)[0] if new_amount is not None else ''
+            cxlOnFail = kwargs.get('cxlOnFail', '')
+            res = self.ws_trade_request('amend-order', [{'instId': gw_symbol, 'ordId': orderid, 'newPx': newPx, 'newSz': newSz, 'cxlOnFail': cxlOnFail}])
+            if res is None:
+                res = self.tradeClient.amend_order(instId=gw_symbol, ordId=orderid, newPx=newPx, newSz=newSz, cxlOnFail=cxlOnFail)
+            if res['code'] == '0' and res['data'][0]['sCode'] == '0':
+                return True
+            msg = f"amend_order error: {res}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return False
+        except Exception as e:
+            msg = f"amend_order error: {e}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return False
+
     def query_order(self, symbol: str, orderid: str) -> OrderData or None:
         '''
             查询订单
@@ -449,8 +590,11 @@ class OkxGateway(BaseGateway):
             res = self.accountClient.get_positions()
             if res['code'] == '0':
                 positions = {}
-                for instId in [x['instId'] for x in res['data']]:
-                    instId_pos = [x for x in res['data'] if x['instId'] == instId]
+                # 按 instId 分组 双向持仓同一 instId 有 long short 两条
+                instId_positions: Dict[str, List[dict]] = {}
+                for x in res['data']:
+                    instId_positions.setdefault(x['instId'], []).append(x)
+                for instId, instId_pos in instId_positions.items():
                     gw_symbol = instId
                     nd_symbol = self.swich_nd_symbol(gw_symbol)
                     netQty = 0
@@ -553,6 +697,9 @@ class OkxGateway(BaseGateway):
             if channel == "books5" and is_data:
                 self.ts_last_depth = self.get_ts() # 更新最新的depth时间戳
                 self.on_depth_callback(message)
+            elif channel in ("books", "books-l2-tbt") and is_data:
+                self.ts_last_depth = self.get_ts()
+                self.on_books_callback(message)
             elif channel == "orders" and is_data:
                 self.on_order_trade_callback(message)
             elif channel == 'candle1m' and is_data and len(message['data']) > 0:
@@ -575,20 +722,18 @@ class OkxGateway(BaseGateway):
             'bids': [['1608.31', '552', '0', '17'], ['1608.3', '7', '0', '2'], ['1608.29', '6', '0', '2'], ['1608.28', '14', '0', '1'], ['1608.27', '277', '0', '3']], 
             'instId': 'ETH-USDT-SWAP', 'ts': '1694422506102', 'seqId': 9653444247}
             ]}
+            books5 推送已排序 不再排序 数量乘以合约面值
         '''
-
-        gw_swmbol = message.get('arg', {}).get('instId', '').upper()
-        symbol = self.swich_nd_symbol(gw_swmbol)
-        contract_ = self.symbol_contract_map.get(symbol, None)
-        if not contract_:
+        symbol_info = self.depth_symbol_map.get(message['arg']['instId'])
+        if symbol_info is None:
             return
-        size = contract_.size
-        asks_list = message.get('data', [])[0].get('asks', None)
-        bids_list = message.get('data', [])[0].get('bids', None)
-        sorted_asks_list = sorted(asks_list, key=lambda x: float(x[0]))
-        sorted_asks = tuple([(float(x[0]), float(x[1]) * size) for x in sorted_asks_list])
-        sorted_bids_list = sorted(bids_list, key=lambda x: float(x[0]), reverse=True)
-        sorted_bids = tuple([(float(x[0]), float(x[1]) * size) for x in sorted_bids_list])
+        symbol, size, tick_size = symbol_info
+        book = message['data'][0]
+        if self.use_array_depth:
+            depth_data = ArrayDepthData.from_raw(symbol, self.exchange, int(time.time() * 1000), book['asks'], book['bids'], size=size, tick_size=tick_size, presorted=True)
+            self.main_engine.put_event(event_type=EventType.DEPTH, exchange=self.exchange, gateway_name=self.gateway_name, symbol=symbol, data=depth_data)
+            return
+        sorted_asks, sorted_bids = decode_okx_books5(book, size)
 
         depth_data = DepthData(
             symbol=symbol,
@@ -599,6 +744,61 @@ class OkxGateway(BaseGateway):
         )
         self.main_engine.put_event(event_type=EventType.DEPTH, exchange=self.exchange, gateway_name=self.gateway_name, symbol=symbol, data=depth_data)
 
+    def on_books_callback(self, message: dict):
+        '''
+            books / books-l2-tbt 增量深度 更新本地订单簿 丢包或 checksum 不一致时重新订阅该合约
+            {'arg': {'channel': 'books', 'instId': 'BTC-USDT-SWAP'}, 'action': 'snapshot' | 'update',
+            'data': [{'asks': [['41006.8', '0.60038921', '0', '1']], 'bids': [...], 'ts': '1629966436396', 'checksum': -1200119424, 'prevSeqId': 123, 'seqId': 456}]}
+        '''
+        gw_symbol = message['arg']['instId']
+        book = self.order_books.get(self.swich_nd_symbol(gw_symbol))
+        if book is None:
+            return
+        action = message.get('action', 'snapshot')
+        updated = False
+        for data in message['data']:
+            if book.on_okx_books(action, data):
+                updated = True
+            elif not book.ready:
+                break
+        if book.ready:
+            if updated:
+                self.publish_order_book(book)
+        elif not book.resyncing:
+            if book.gap_reason:
+                msg = f"{book.symbol} 本地订单簿丢包: {book.gap_reason} 重新订阅 (累计: {book.gap_count})"
+                self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+                book.gap_reason = ''
+            self.resync_order_book(gw_symbol, book)
+
+    def resync_order_book(self, gw_symbol: str, book: LocalOrderBook):
+        '''
+            后台线程重新订阅该合约的深度频道 服务端推送 snapshot 后恢复
+        '''
+        book.resyncing = True
+        threading.Thread(target=self._resync_order_book, args=(gw_symbol, book), daemon=True).start()
+
+    def _resync_order_book(self, gw_symbol: str, book: LocalOrderBook, timeout: float = 5):
+        try:
+            args = [{"channel": self.depth_channel, "instId": gw_symbol}]
+            self.wsPublicClient.unsubscribe(args, self.on_message)
+            time.sleep(0.5)
+            self.wsPublicClient.subscribe(args, self.on_message)
+            deadline = time.time() + timeout
+            while not book.ready and time.time() < deadline:
+                time.sleep(0.1)
+            if book.ready:
+                msg = f"{book.symbol} 本地订单簿已同步 seqId: {book.seq_id} 档位: {len(book.bids)}/{len(book.asks)}"
+                self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
+            else:
+                msg = f"{book.symbol} 重新订阅 {timeout} 秒未收到深度快照"
+                self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+        except Exception as e:
+            msg = f"{book.symbol} 本地订单簿重新订阅失败: {e}"
+            self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        finally:
+            book.resyncing = False
+
     def on_bar_callback(self, message: dict):
         '''
             data 需要是字典; EventType.BAR 永远仅推送已经走完的K线
@@ -630,7 +830,6 @@ class OkxGateway(BaseGateway):
             symbol=symbol,
             exchange=self.exchange,
             gateway_name=self.gateway_name,
-            datetime=datetime.fromtimestamp(int(message['data'][0][0])/1000, tz=timezone(timedelta(hours=8))),
             open_ts=int(message['data'][0][0]),
             interval=Interval.MINUTE,
             volume=float(message['data'][0][6]),
@@ -698,16 +897,32 @@ class OkxGateway(BaseGateway):
         self.WsPrivateClient.subscribe(self.order_trade_args, self.on_message)
         time.sleep(0.5)
 
+        # 2/3. 深度与K线在子进程中订阅与解析
+        if self.use_feed_process:
+            if self.use_local_book:
+                msg = f"行情子进程不支持本地订单簿 使用快照深度"
+                self.main_engine.write_log(msg, level=LogLevel.WARNING.value, source=self.gateway_name)
+            self.start_feed_process(gw_symbols)
+            self.ts_last_subcribe = self.get_ts()
+            return
+
         # 2. 订阅深度
-        if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+        if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys():
             if self.wsPublicClient.is_alive() is False:
                 self.wsPublicClient.start()
-            self.books5_args = [{"channel": "books5", "instId": _} for _ in gw_symbols]
-            self.wsPublicClient.subscribe(self.books5_args, self.on_message)
+            if self.use_local_book:
+                self.order_books = {}
+                for gw_symbol in gw_symbols:
+                    symbol = self.swich_nd_symbol(gw_symbol)
+                    contract = self.symbol_contract_map.get(symbol)
+                    if contract:
+                        self.order_books[symbol] = LocalOrderBook(symbol, self.exchange, size=contract.size, tick_size=contract.tick_size)
+            self.depth_args = [{"channel": self.depth_channel, "instId": _} for _ in gw_symbols]
+            self.wsPublicClient.subscribe(self.depth_args, self.on_message)
             time.sleep(0.5)
 
         # 3. 订阅K线
-        if EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+        if EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
             if self.wsPublicClient.is_alive() is False:
                 self.wsPublicClient.start()
             self.bar_args = [{"channel": "candle1m", "instId": _} for _ in gw_symbols]
@@ -716,6 +931,31 @@ class OkxGateway(BaseGateway):
 
         self.ts_last_subcribe = self.get_ts() # 记录最后一次订阅时间
 
+    def start_feed_process(self, gw_symbols: list):
+        '''
+            启动行情子进程 已启动时重启
+            Parameters:
+                gw_symbols: 交易所币对
+        '''
+        topic = self.main_engine.topic[self.gateway_name]
+        symbol_map = {}
+        for gw_symbol in gw_symbols:
+            symbol = self.swich_nd_symbol(gw_symbol)
+            contract = self.symbol_contract_map.get(symbol)
+            if contract:
+                symbol_map[gw_symbol] = (symbol, contract.size)
+        params = {
+            'gw_symbols': list(gw_symbols),
+            'symbol_map': symbol_map,
+            'depth': {} if EventType.DEPTH.value in topic else None,
+            'bar': {} if EventType.BAR.value in topic else None,
+            'url': self.ws_public_url,
+        }
+        if self.feed_process is not None:
+            self.feed_process.stop()
+        self.feed_process = FeedProcess(self, params)
+        self.feed_process.start()
+
     def connect(self, symbols: list):
         '''
             用于 main_engine 中的 connect 理论上是只会调用一次 是gateway的入口函数
@@ -732,7 +972,13 @@ class OkxGateway(BaseGateway):
 
         self.subscribed_nd_symbols = symbols.copy()  # 被订阅的nd币对
         self.subscribed_gw_symbols = [self.switch_gw_symbol(symbol) for symbol in symbols] # 被订阅的gw币对
+        self.init_depth_options()
+        depth_params = self.main_engine.topic[self.gateway_name].get(EventType.DEPTH.value, {})
+        self.depth_channel = depth_params.get('book_channel', 'books') if self.use_local_book else 'books5' # 深度频道
         
+        if self.use_ws_trade:
+            self.start_ws_trade(OkxWsTradeClient(self.key, self.secret, self.passphrase, url=self.ws_private_url))
+
         try:
 
             self.subscribe_data(self.subscribed_gw_symbols)
@@ -740,6 +986,11 @@ class OkxGateway(BaseGateway):
             self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
             
             self.thread_ws_monitor.start() # 启动 ws 监控线程
+            self.start_contract_refresh() # 后台刷新合约信息
+
+            if self.warm_state: # 从快照恢复 后台校验
+                self.warm_state = None
+                threading.Thread(target=self.validate_state, daemon=True).start()
 
         except Exception as e:
             msg = f"subscribe_data error: {e}"
@@ -749,11 +1000,21 @@ class OkxGateway(BaseGateway):
         '''
             取消所有订阅 重新订阅 websocket
         '''
+        if self.use_feed_process:
+            try:
+                self.feed_process.restart()
+                msg = f"_reconnect: 行情子进程已重启"
+                self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
+            except Exception as e:
+                msg = f"_reconnect feed process error: {e}"
+                self.main_engine.write_log(msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+            return
+
         try:
             self.WsPrivateClient.unsubscribe(self.order_trade_args, self.on_message) # 取消订阅
-            if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys():
-                self.wsPublicClient.unsubscribe(self.books5_args, self.on_message)
-            if EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+            if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys():
+                self.wsPublicClient.unsubscribe(self.depth_args, self.on_message)
+            if EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
                 self.wsPublicClient.unsubscribe(self.bar_args, self.on_message)
             msg = f"_reconnect: websocket 取消订阅"
             self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
@@ -764,9 +1025,9 @@ class OkxGateway(BaseGateway):
         try:
             self.WsPrivateClient.subscribe(self.order_trade_args, self.on_message) # 重新订阅
             time.sleep(0.5)
-            if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys():
-                self.wsPublicClient.subscribe(self.books5_args, self.on_message)
-            if EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+            if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys():
+                self.wsPublicClient.subscribe(self.depth_args, self.on_message)
+            if EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
                 self.wsPublicClient.subscribe(self.bar_args, self.on_message)
             msg = f"_reconnect: websocket 重新订阅"
             self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
@@ -786,7 +1047,7 @@ class OkxGateway(BaseGateway):
                 time.sleep(5)
 
                 # ==== 如果订阅深度 重连条件判断 1. 深度数据超过3秒未更新
-                if EventType.DEPTH.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+                if EventType.DEPTH.value in self.main_engine.topic[self.gateway_name].keys():
                     now_ts = self.get_ts()
                     is_reconnect_1 = True if self.ts_last_depth and now_ts - self.ts_last_depth > self.reconnect_seconds_after_lost_depth * 1000 else False # 深度数据超过N秒未更新
 
@@ -800,7 +1061,7 @@ class OkxGateway(BaseGateway):
                         self.main_engine.write_log(msg, level=LogLevel.INFO.value, source=self.gateway_name)
 
                 # ==== 如果订阅K线 重连条件判断 1. K线数据超过3秒未更新
-                if EventType.BAR.value in self.main_engine.strategy.topic[self.gateway_name].keys():
+                if EventType.BAR.value in self.main_engine.topic[self.gateway_name].keys():
                     now_ts = self.get_ts()
                     is_reconnect_2 = True if self.ts_last_bar and now_ts - self.ts_last_bar > 63 * 1000 else False # K线数据超过N秒未更新
 
@@ -0,0 +1,209 @@
+'''
+    Replay Gateway 将事件日志按原顺序推送给 MainEngine 复现实盘行情与回报
+
+    用法:
+        main_engine = MainEngine()
+        main_engine.add_gateways([ReplayGateway(journal_path, gateway_name=GatewayName.OKX.value, speed=0)])
+        main_engine.add_strategy(strategy) # 与实盘相同的策略与 topic
+        main_engine.start() # 替换为 start_replay 日志回放完毕后返回统计信息
+
+    gateway_name 为日志中被回放的 gateway 名称 策略无需修改; 日志中有多个 gateway 时每个 gateway 添加一个 ReplayGateway
+    第一个添加的 ReplayGateway 负责回放 其余的只接收下单请求
+    回放速度 speed: 0 尽快回放; 1 按日志时间间隔回放; N 为 N 倍速
+    strategy.get_ts 返回日志时间 定时器按日志时间推进 单线程处理 结果可复现
+
+    note: 日志中的 ORDER TRADE 为实盘回报 回放时策略的下单与撤单不会成交 仅记录在 sent_orders 中
+'''
+import time
+import traceback
+from queue import Empty
+from typing import Any, Dict, List
+
+from .gateway import BaseGateway
+from ..trader.constant import (
+    LogLevel, Direction, Offset, Status, Exchange
+)
+from ..trader.object import OrderData, PositionData, AccountData, Event
+from ..trader.event_queue import RingEventQueue
+from ..trader.journal import read_journal
+
+
+class ReplayGateway(BaseGateway):
+    '''
+        事件日志回放网关
+    '''
+
+    def __init__(self, journal_path: str, gateway_name: str, exchange: Exchange = None, speed: float = 0):
+        '''
+            Params:
+                journal_path: 日志文件或日志目录
+                gateway_name: 被回放的 gateway 名称
+                exchange: 下单回报使用的交易所 为空时使用日志中该 gateway 事件的交易所
+                speed: 回放速度 0 尽快回放 1 原速 N 倍速
+        '''
+        self.gateway_name: str = gateway_name
+        self.exchange = exchange
+        super().__init__('replay', 'replay', self.exchange)
+
+        self.journal_path = journal_path
+        self.speed = speed
+
+        self.replay_ts: int = 0 # 日志时间戳13位
+        self.is_replay_driver: bool = False # 是否负责回放
+        self.replayed_count: int = 0 # 已回放事件数量
+        self.sent_order_count: int = 0
+        self.sent_orders: List[OrderData] = [] # 回放期间策略发送的订单
+
+    def add_main_engine(self, main_engine): # : MainEngine
+        self.main_engine = main_engine
+        # 第一个 ReplayGateway 负责回放: main_engine.start --> self.start_replay
+        if not getattr(main_engine, 'replay_driver', None):
+            main_engine.replay_driver = self
+            self.is_replay_driver = True
+            self.main_engine.start = self.start_replay
+
+    def on_init(self):
+        pass
+
+    def connect(self, symbols: list):
+        self.subscribed_nd_symbols = symbols.copy()
+
+    def get_replay_ts(self) -> int:
+        '''
+            当前回放到的日志时间 13位时间戳
+        '''
+        return self.main_engine.replay_driver.replay_ts
+
+    def send_order(self, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, **kwargs) -> str:
+        '''
+            记录订单 不撮合
+        '''
+        self.sent_order_count += 1
+        orderid = f"ReplayGateway-ORDER-{self.sent_order_count}"
+        self.sent_orders.append(OrderData(
+            symbol=symbol,
+            exchange=self.exchange,
+            orderid=orderid,
+            direction=direction,
+            offset=offset,
+            price=price,
+            volume=amount,
+            traded=0,
+            status=Status.SUBMITTING,
+            ts=self.get_replay_ts()
+        ))
+        return orderid
+
+    def cancel_order(self, symbol: str, orderid: str) -> bool:
+        for order in self.sent_orders:
+            if order.orderid == orderid and order.symbol == symbol:
+                order.status = Status.CANCELLED
+                order.ts = self.get_replay_ts()
+                return True
+        return False
+
+    def query_order(self, symbol: str, orderid: str) -> OrderData or None:
+        for order in self.sent_orders:
+            if order.orderid == orderid and order.symbol == symbol:
+                return order
+        return None
+
+    def query_active_orders(self, symbol: str) -> List[OrderData]:
+        return []
+
+    def query_account(self) -> AccountData or None:
+        return None
+
+    def query_position(self, symbol: str) -> PositionData or None:
+        return None
+
+    def start_replay(self) -> Dict[str, Any]:
+        '''
+            回放日志 替换 main_engine.start
+            return: {'events': 回放事件数量, 'elapsed_s': 耗时, 'journal_span_s': 日志时间跨度}
+        '''
+        main_engine = self.main_engine
+        replay_names = {name for name, gateway in main_engine.gateways.items() if isinstance(gateway, ReplayGateway)}
+
+        # A. 策略时间绑定为日志时间
+        for strategy in main_engine.strategies.values():
+            strategy.get_ts = self.get_replay_ts
+
+        # --- 深度限频按日志时间推送 与回放速度无关
+        queue = main_engine.get_queue_event()
+        queue.set_clock(lambda: self.replay_ts / 1000)
+
+        # B. 策略 on_start 与 gateway connect
+        main_engine.build_route_table()
+        main_engine.start_strategies()
+        main_engine.connect_gateways()
+
+        if isinstance(queue, RingEventQueue):
+            queue.bind_consumer()
+        main_engine.is_event_processing = True
+        msg = f"开始回放事件日志: {self.journal_path} 速度: {self.speed or '最快'}"
+        main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.gateway_name)
+
+        first_ns = 0
+        last_ns = 0
+        start_perf = time.perf_counter()
+        for ts_ns, event in read_journal(self.journal_path):
+            if not main_engine.is_event_processing: # main_engine.stop()
+                break
+            if event.gateway_name not in replay_names:
+                continue
+            gateway = main_engine.gateways[event.gateway_name]
+            if gateway.exchange is None:
+                gateway.exchange = event.exchange
+            if not first_ns:
+                first_ns = ts_ns
+            last_ns = ts_ns
+
+            # --- 按日志时间间隔等待
+            if self.speed > 0:
+                delay = start_perf + (ts_ns - first_ns) / 1e9 / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            # --- 推进日志时间与定时器
+            self.replay_ts = ts_ns // 1000000
+            main_engine.process_timers(self.replay_ts)
+            main_engine.put_event(event_type=event.event_type, exchange=event.exchange, gateway_name=event.gateway_name, symbol=event.symbol, data=event.data)
+            self.replayed_count += 1
+            self._process_pending_events(queue)
+
+        queue.clear_conflation() # 邮箱中未到推送时间的深度移回 DEPTH 通道
+        self._process_pending_events(queue)
+        for strategy in main_engine.strategies.values():
+            try:
+                strategy.on_finish()
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                msg = f"{strategy.strategy_name} on_finish 异常: {e} 报错信息:\n{error_msg}"
+                main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.gateway_name)
+        result = {
+            'events': self.replayed_count,
+            'elapsed_s': time.perf_counter() - start_perf,
+            'journal_span_s': (last_ns - first_ns) / 1e9,
+        }
+        main_engine.is_event_processing = False
+        msg = f"事件日志回放结束: {result}"
+        main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.gateway_name)
+        return result
+
+    def _process_pending_events(self, queue):
+        '''
+            处理队列中的所有事件 包括策略回调中产生的事件
+        '''
+        main_engine = self.main_engine
+        while True:
+            try:
+                events: List[Event] = queue.get_batch(max_size=main_engine.batch_size, block=False)
+            except Empty:
+                return
+            for event in events:
+                try:
+                    main_engine.process_event(event)
+                except Exception as e:
+                    msg = f"{main_engine.engine_name} 事件处理异常: {e}"
+                    main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=main_engine.engine_name)
@@ -0,0 +1,265 @@
+'''
+    Synthetic Gateway 按目标速率生成 DEPTH / BAR / ORDER / TRADE 事件 用于引擎压力测试 见 example/bench_engine.py
+
+    用法:
+        gateway = SyntheticGateway(rate=20000, mix={EventType.DEPTH: 0.7, EventType.BAR: 0.1, EventType.ORDER: 0.1, EventType.TRADE: 0.1})
+        main_engine.add_gateways([gateway])
+        main_engine.add_strategy(strategy) # 订阅 gateway.gateway_name 下的合约
+        main_engine.start() # connect 后生产线程开始写入 put_event
+        gateway.set_rate(50000) # 运行中调整速率 0为暂停
+
+    生成方式:
+        threads 个生产线程各负责 rate / threads 事件/秒 按时间计算应发送数量 落后时连续发送直到追上 不丢弃
+        事件类型按 mix 权重平滑交错 合约依次轮换
+        DEPTH / BAR 默认复用预先创建的对象 只测引擎开销; fresh_data=True 时每次新建 包含对象创建开销
+        ORDER / TRADE 每次新建 订单号递增 订单状态为全部成交 OMS 中按已结束订单淘汰 内存不增长
+'''
+import itertools
+import threading
+import time
+from typing import Dict, List
+
+from .gateway import BaseGateway
+from ..trader.constant import (
+    LogLevel, Direction, Offset, Status, Exchange, Interval, EventType
+)
+from ..trader.object import OrderData, TradeData, PositionData, AccountData, DepthData, BarData
+
+DEFAULT_MIX = {EventType.DEPTH: 0.7, EventType.BAR: 0.1, EventType.ORDER: 0.1, EventType.TRADE: 0.1}
+
+
+def build_type_pattern(mix: Dict[EventType, float], length: int = 100) -> List[EventType]:
+    '''
+        按权重生成长度为 length 的事件类型序列 平滑加权轮询 同类事件尽量分散
+    '''
+    weights = {event_type: weight for event_type, weight in mix.items() if weight > 0}
+    if not weights:
+        raise ValueError(f"事件类型权重为空: {mix}")
+    total = sum(weights.values())
+    current = {event_type: 0.0 for event_type in weights}
+    pattern = []
+    for _ in range(length):
+        for event_type, weight in weights.items():
+            current[event_type] += weight
+        event_type = max(current, key=current.get)
+        current[event_type] -= total
+        pattern.append(event_type)
+    return pattern
+
+
+class SyntheticGateway(BaseGateway):
+    '''
+        合成行情与回报网关 不连接交易所
+    '''
+
+    def __init__(
+        self,
+        gateway_name: str = 'SyntheticGateway',
+        exchange: Exchange = Exchange.OKX,
+        rate: float = 10000,
+        mix: Dict[EventType, float] = None,
+        depth_levels: int = 5,
+        threads: int = 1,
+        fresh_data: bool = False,
+    ):
+        '''
+            Params:
+                rate: 目标速率 事件/秒 所有合约合计 0为暂停
+                mix: 事件类型权重 {EventType: weight} 支持 DEPTH BAR ORDER TRADE
+                depth_levels: 深度档位数量
+                threads: 生产线程数量 模拟多个 ws 线程同时写入
+                fresh_data: DEPTH / BAR 是否每次新建对象
+        '''
+        self.gateway_name: str = gateway_name
+        self.exchange: Exchange = exchange
+        super().__init__('', '', exchange)
+
+        self.rate: float = rate
+        self.mix: Dict[EventType, float] = dict(mix or DEFAULT_MIX)
+        self.depth_levels = depth_levels
+        self.threads = threads
+        self.fresh_data = fresh_data
+
+        self.type_pattern: List[EventType] = build_type_pattern(self.mix)
+        self.symbols: List[str] = []
+        self.depths: Dict[str, DepthData] = {}
+        self.bars: Dict[str, BarData] = {}
+
+        self.active: bool = False
+        self.producer_threads: List[threading.Thread] = []
+        self.rate_version: int = 0 # set_rate 后生产线程重新计时
+        self.order_count = itertools.count(1) # next 在 CPython 中线程安全
+        self.last_orderid: str = ''
+        self.emitted_count: Dict[EventType, int] = {event_type: 0 for event_type in EventType} # 各生产线程分别累加 读取时近似值
+        self.producer_cpu_s: List[float] = []
+        self.sent_orders: List[OrderData] = []
+
+    def on_init(self):
+        pass
+
+    def connect(self, symbols: list):
+        self.symbols = list(symbols)
+        self.subscribed_nd_symbols = list(symbols)
+        for index, symbol in enumerate(self.symbols):
+            self.depths[symbol] = self._make_depth(symbol, 100.0 + index)
+            self.bars[symbol] = self._make_bar(symbol, 100.0 + index)
+        self.start()
+
+    def start(self):
+        '''
+            启动生产线程
+        '''
+        if self.active:
+            return
+        self.active = True
+        self.producer_cpu_s = [0.0] * self.threads
+        self.producer_threads = [
+            threading.Thread(target=self._run_producer, args=(index,), name=f"nd_synthetic_{index}", daemon=True)
+            for index in range(self.threads)
+        ]
+        for thread in self.producer_threads:
+            thread.start()
+        msg = f"合成行情启动 合约数量: {len(self.symbols)} 速率: {self.rate} 事件类型: {[t.value for t in self.mix]} 线程: {self.threads}"
+        self.main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.gateway_name)
+
+    def stop(self, timeout: float = 1):
+        self.active = False
+        for thread in self.producer_threads:
+            thread.join(timeout)
+
+    def set_rate(self, rate: float):
+        '''
+            调整目标速率 事件/秒 0为暂停
+        '''
+        self.rate = rate
+        self.rate_version += 1
+
+    def get_emitted_total(self) -> int:
+        return sum(self.emitted_count.values())
+
+    def _make_depth(self, symbol: str, mid: float) -> DepthData:
+        levels = range(1, self.depth_levels + 1)
+        return DepthData(
+            symbol=symbol,
+            exchange=self.exchange,
+            ts=int(time.time() * 1000),
+            asks=tuple((mid + 0.1 * i, 1.0 * i) for i in levels),
+            bids=tuple((mid - 0.1 * i, 1.0 * i) for i in levels),
+        )
+
+    def _make_bar(self, symbol: str, price: float) -> BarData:
+        open_ts = int(time.time() // 60 * 60000)
+        return BarData(
+            symbol=symbol,
+            exchange=self.exchange,
+            gateway_name=self.gateway_name,
+            open_ts=open_ts,
+            interval=Interval.MINUTE,
+            volume=10,
+            turnover=10 * price,
+            open_price=price,
+            high_price=price + 1,
+            low_price=price - 1,
+            close_price=price,
+        )
+
+    def _emit(self, event_type: EventType, symbol: str):
+        if event_type == EventType.DEPTH:
+            data = self._make_depth(symbol, 100.0) if self.fresh_data else self.depths[symbol]
+        elif event_type == EventType.BAR:
+            data = self._make_bar(symbol, 100.0) if self.fresh_data else self.bars[symbol]
+        elif event_type == EventType.ORDER:
+            self.last_orderid = orderid = f"SYN-{next(self.order_count)}"
+            data = OrderData(
+                symbol=symbol,
+                exchange=self.exchange,
+                orderid=orderid,
+                direction=Direction.LONG,
+                offset=Offset.OPEN,
+                price=100.0,
+                volume=1,
+                traded=1,
+                status=Status.ALLTRADED,
+                ts=int(time.time() * 1000),
+            )
+        elif event_type == EventType.TRADE:
+            data = TradeData(
+                symbol=symbol,
+                exchange=self.exchange,
+                orderid=self.last_orderid,
+                tradeid=f"SYN-T-{next(self.order_count)}",
+                direction=Direction.LONG,
+                offset=Offset.OPEN,
+                price=100.0,
+                volume=1,
+                ts=int(time.time() * 1000),
+            )
+        else:
+            raise ValueError(f"不支持的合成事件类型: {event_type}")
+        self.main_engine.put_event(event_type=event_type, exchange=self.exchange, gateway_name=self.gateway_name, symbol=symbol, data=data)
+        self.emitted_count[event_type] += 1
+
+    def _run_producer(self, index: int):
+        '''
+            按 rate / threads 写入事件 每个线程从不同位置开始轮换合约
+        '''
+        pattern = self.type_pattern
+        symbols = self.symbols
+        if not symbols:
+            return
+        sequence = index * 7 # 错开各线程的事件类型与合约
+        rate_version = -1
+        start = sent = 0
+        cpu_start = time.thread_time()
+        while self.active:
+            rate = self.rate / self.threads
+            if rate <= 0:
+                time.sleep(0.01)
+                rate_version = -1
+                continue
+            now = time.perf_counter()
+            if rate_version != self.rate_version: # 速率变化后重新计时
+                rate_version = self.rate_version
+                start, sent = now, 0
+            due = int((now - start) * rate) - sent
+            if due <= 0:
+                time.sleep(min((sent + 1) / rate - (now - start), 0.001))
+                continue
+            for _ in range(min(due, 1000)): # 分批发送 及时响应速率变化与停止
+                self._emit(pattern[sequence % len(pattern)], symbols[sequence % len(symbols)])
+                sequence += 1
+                sent += 1
+            self.producer_cpu_s[index] = time.thread_time() - cpu_start
+
+    def send_order(self, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, **kwargs) -> str:
+        '''
+            记录订单 不撮合
+        '''
+        orderid = f"SYN-{next(self.order_count)}"
+        self.sent_orders.append(OrderData(
+            symbol=symbol,
+            exchange=self.exchange,
+            orderid=orderid,
+            direction=direction,
+            offset=offset,
+            price=price,
+            volume=amount,
+            status=Status.SUBMITTING,
+            ts=int(time.time() * 1000),
+        ))
+        return orderid
+
+    def cancel_order(self, symbol: str, orderid: str) -> bool:
+        return True
+
+    def query_order(self, symbol: str, orderid: str) -> OrderData or None:
+        return None
+
+    def query_active_orders(self, symbol: str) -> List[OrderData]:
+        return []
+
+    def query_account(self) -> AccountData or None:
+        return None
+
+    def query_position(self, symbol: str) -> PositionData or None:
+        return None
@@ -0,0 +1,292 @@
+'''
+    websocket 下单通道 WsTradeClient
+
+    REST 每次下单都要发送 HTTP 请求头并签名 websocket 下单复用一条已认证的长连接:
+        OKX: /ws/v5/private 登录后发送 op: order / cancel-order / amend-order 响应 data 与 REST 相同
+        Binance: U本位合约 websocket API wss://ws-fapi.binance.com/ws-fapi/v1
+            method: order.place / order.cancel / order.modify 每个请求单独签名 响应 result 与 REST 相同
+    每个请求带唯一 id 读取线程按 id 把响应交给等待中的调用线程 多个线程可同时在一条连接上发送请求
+    断线后读取线程自动重连 重连期间 ready 为 False
+
+    开启: connect 之前设置 gateway.use_ws_trade = True
+    回退 REST:
+        未连接 (启动中 重连中) 或发送失败: request 返回 None gateway 改用 REST
+        已发送但超时未响应 或等待时断线: 抛出 WsTradeTimeout 订单状态未知
+            撤单 改单 回退 REST 重试; 下单不回退 避免重复下单 结果以订单推送为准
+'''
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import socket
+import threading
+import time
+from typing import Callable, Dict
+
+from websocket import create_connection, WebSocketTimeoutException
+
+from ..trader.constant import LogLevel
+
+
+def binance_param_str(params: dict) -> Dict[str, str]:
+    '''
+        Binance 请求参数转为字符串 bool 转为小写 'true' / 'false' 丢弃 None
+        websocket API 签名与 REST batchOrders 共用
+    '''
+    return {k: (str(v).lower() if isinstance(v, bool) else str(v)) for k, v in params.items() if v is not None}
+
+
+class WsTradeTimeout(Exception):
+    '''
+        请求已发送 未收到响应
+    '''
+    pass
+
+
+class _Waiter:
+    __slots__ = ('event', 'response')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+
+
+class WsTradeClient(threading.Thread):
+    '''
+        websocket 请求-响应 通道基类 子类实现 login ping 与 request
+    '''
+
+    def __init__(self, url: str, timeout: float = 5, ping_interval: float = 20, reconnect_interval: float = 1, on_log: Callable = None):
+        '''
+            Params:
+                url: websocket 地址
+                timeout: 连接 登录 与等待响应的超时秒数
+                ping_interval: 连接空闲 ping_interval 秒后发送心跳
+                reconnect_interval: 断线后重连间隔秒数
+                on_log: on_log(msg, level) 为空时 print
+        '''
+        super().__init__(daemon=True)
+        self.url = url
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.reconnect_interval = reconnect_interval
+        self.on_log = on_log
+
+        self.ws = None
+        self.ready: bool = False # 已连接 (并已登录) 可以发送请求
+        self.active: bool = False
+        self.connect_count: int = 0
+        self.id_count = itertools.count(1)
+        self.pending: Dict[str, _Waiter] = {} # id: _Waiter
+        self.connected_event = threading.Event()
+
+    def write_log(self, msg: str, level: int = LogLevel.INFO.value):
+        if self.on_log is not None:
+            self.on_log(msg, level)
+        else:
+            print(msg)
+
+    def start(self, wait: float = 0):
+        '''
+            启动读取线程 wait > 0 时最多等待 wait 秒直到连接成功
+            Return: 是否已连接
+        '''
+        self.active = True
+        super().start()
+        if wait > 0:
+            self.connected_event.wait(wait)
+        return self.ready
+
+    def close(self):
+        self.active = False
+        self.ready = False
+        ws = self.ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def run(self):
+        while self.active:
+            try:
+                self._open()
+                self._read()
+            except Exception as e:
+                if self.active:
+                    msg = f"{self.__class__.__name__} 连接断开: {e}"
+                    self.write_log(msg, level=LogLevel.WARNING.value)
+            self._on_disconnected()
+            if self.active:
+                time.sleep(self.reconnect_interval)
+
+    def _open(self):
+        ws = create_connection(self.url, timeout=self.timeout, enable_multithread=True) # send 加锁 多线程发送
+        self.login(ws)
+        ws.settimeout(self.ping_interval) # recv 超时即空闲 发送心跳
+        self.ws = ws
+        self.ready = True
+        self.connect_count += 1
+        self.connected_event.set()
+        msg = f"{self.__class__.__name__} 已连接 {self.url}"
+        self.write_log(msg, level=LogLevel.INFO.value)
+
+    def _read(self):
+        ws = self.ws
+        while self.active:
+            try:
+                message = ws.recv()
+            except WebSocketTimeoutException:
+                self.ping()
+                continue
+            if not message: # close 帧
+                raise ConnectionError("服务端关闭连接")
+            self.on_message(message)
+
+    def _on_disconnected(self):
+        '''
+            唤醒所有等待中的请求 response 为 None 时 send_request 抛出 WsTradeTimeout
+        '''
+        self.ready = False
+        self.connected_event.clear()
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        pending, self.pending = self.pending, {}
+        for waiter in pending.values():
+            waiter.event.set()
+
+    def on_message(self, message: str):
+        try:
+            data = json.loads(message)
+        except ValueError: # 'pong' 等非 json 消息
+            return
+        waiter = self.pending.pop(str(data.get('id')), None)
+        if waiter is not None:
+            waiter.response = data
+            waiter.event.set()
+        else:
+            self.on_unmatched(data)
+
+    def on_unmatched(self, data: dict):
+        '''
+            无对应请求的消息 例如 OKX 参数错误返回的 event: error 或已超时请求的响应
+        '''
+        msg = f"{self.__class__.__name__} 未匹配的消息: {data}"
+        self.write_log(msg, level=LogLevel.WARNING.value)
+
+    def next_id(self) -> str:
+        return str(next(self.id_count))
+
+    def send_request(self, request_id: str, payload: dict, timeout: float = None) -> dict or None:
+        '''
+            发送请求并等待响应
+            Return: 响应 未连接或发送失败返回 None 此时请求未到达交易所 可安全回退 REST
+            Raise: WsTradeTimeout 已发送 超时或断线未收到响应
+        '''
+        ws = self.ws
+        if not self.ready or ws is None:
+            return None
+        waiter = _Waiter()
+        self.pending[request_id] = waiter
+        try:
+            ws.send(json.dumps(payload))
+        except Exception as e:
+            self.pending.pop(request_id, None)
+            self.ready = False
+            try:
+                ws.sock.shutdown(socket.SHUT_RDWR) # 唤醒读取线程 断开重连
+            except Exception:
+                pass
+            msg = f"{self.__class__.__name__} 发送失败 等待重连: {e}"
+            self.write_log(msg, level=LogLevel.WARNING.value)
+            return None
+        if not waiter.event.wait(timeout or self.timeout):
+            self.pending.pop(request_id, None)
+            raise WsTradeTimeout(f"请求 {request_id} {timeout or self.timeout}秒未响应")
+        if waiter.response is None:
+            raise WsTradeTimeout(f"请求 {request_id} 等待响应时连接断开")
+        return waiter.response
+
+    def login(self, ws):
+        '''
+            连接后 设置 ready 前调用 可直接在 ws 上收发
+        '''
+        pass
+
+    def ping(self):
+        self.ws.ping()
+
+
+class OkxWsTradeClient(WsTradeClient):
+    '''
+        OKX /ws/v5/private 下单通道
+    '''
+
+    def __init__(self, key: str, secret: str, passphrase: str, url: str = "wss://ws.okx.com:8443/ws/v5/private", **kwargs):
+        super().__init__(url, **kwargs)
+        self.key, self.secret, self.passphrase = key, secret, passphrase
+
+    def login(self, ws):
+        timestamp = str(int(time.time()))
+        message = timestamp + 'GET' + '/users/self/verify'
+        sign = base64.b64encode(hmac.new(self.secret.encode(), message.encode(), hashlib.sha256).digest()).decode()
+        ws.send(json.dumps({"op": "login", "args": [{"apiKey": self.key, "passphrase": self.passphrase, "timestamp": timestamp, "sign": sign}]}))
+        while True:
+            data = json.loads(ws.recv())
+            if data.get('event') == 'login':
+                if data.get('code') != '0':
+                    raise ConnectionError(f"登录失败: {data}")
+                return
+            if data.get('event') == 'error':
+                raise ConnectionError(f"登录失败: {data}")
+
+    def ping(self):
+        self.ws.send('ping') # 30秒无消息服务端断开连接
+
+    def request(self, op: str, args: list, timeout: float = None) -> dict or None:
+        '''
+            op: order / cancel-order / amend-order / batch-orders ...
+            args: 与 REST 相同的参数 空字符串参数不发送 数字转为字符串
+            Return: {'id', 'op', 'code', 'msg', 'data': [{'ordId', 'clOrdId', 'sCode', 'sMsg'}]} 未连接返回 None
+        '''
+        args = [
+            {k: str(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v for k, v in arg.items() if v != '' and v is not None}
+            for arg in args
+        ]
+        request_id = self.next_id()
+        return self.send_request(request_id, {"id": request_id, "op": op, "args": args}, timeout)
+
+
+class BinanceWsTradeClient(WsTradeClient):
+    '''
+        Binance U本位合约 websocket API 下单通道 HMAC 签名
+    '''
+
+    def __init__(self, key: str, secret: str, url: str = "wss://ws-fapi.binance.com/ws-fapi/v1", **kwargs):
+        super().__init__(url, **kwargs)
+        self.key, self.secret = key, secret
+
+    def sign(self, params: dict) -> dict:
+        '''
+            加入 apiKey timestamp 按参数名排序拼接 key=value& 计算 HMAC SHA256
+        '''
+        params = binance_param_str(params)
+        params['apiKey'] = self.key
+        params['timestamp'] = str(int(time.time() * 1000))
+        payload = '&'.join(f"{k}={params[k]}" for k in sorted(params))
+        params['signature'] = hmac.new(self.secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        return params
+
+    def request(self, method: str, params: dict, timeout: float = None) -> dict or None:
+        '''
+            method: order.place / order.cancel / order.modify / order.status ...
+            params: 与 REST 相同的参数
+            Return: {'id', 'status', 'result'} 或 {'id', 'status', 'error': {'code', 'msg'}} 未连接返回 None
+        '''
+        request_id = self.next_id()
+        return self.send_request(request_id, {"id": request_id, "method": method, "params": self.sign(params)}, timeout)
@@ -0,0 +1,276 @@
+'''
+    数组深度 ArrayDepthData
+
+    价格与数量保存在连续的 numpy float64 数组中:
+        ask_prices / ask_sizes: 卖单 价格从低到高
+        bid_prices / bid_sizes: 买单 价格从高到低
+    asks / bids 为与 DepthData 兼容的只读视图 支持 len 下标 切片 迭代 与 tuple 比较 访问时才生成 (price, volume)
+    深度创建后不再修改 mid microprice 等指标在首次调用时计算并缓存
+
+    开启: strategy.set_topic(gateway_name, EventType.DEPTH, {'array': True})
+        gateway 推送 ArrayDepthData 同一 gateway 的其他策略收到的也是 ArrayDepthData 用法与 DepthData 相同
+'''
+from typing import Any, Dict, Iterator, Sequence, Tuple
+
+import numpy as np
+
+from .constant import Direction, Exchange
+from .object import DepthData
+
+EMPTY = np.empty(0, dtype=np.float64)
+
+
+class DepthLevels:
+    '''
+        单边深度的 tuple 兼容视图 元素为 (price, volume)
+    '''
+
+    __slots__ = ('prices', 'sizes')
+
+    def __init__(self, prices: np.ndarray, sizes: np.ndarray):
+        self.prices = prices
+        self.sizes = sizes
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __bool__(self) -> bool:
+        return len(self.prices) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(zip(self.prices[index].tolist(), self.sizes[index].tolist()))
+        return (float(self.prices[index]), float(self.sizes[index]))
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        return zip(self.prices.tolist(), self.sizes.tolist())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, DepthLevels):
+            return np.array_equal(self.prices, other.prices) and np.array_equal(self.sizes, other.sizes)
+        if isinstance(other, (tuple, list)):
+            return self.to_tuple() == tuple(tuple(level) for level in other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(self.to_tuple())
+
+    def to_tuple(self) -> tuple:
+        return tuple(zip(self.prices.tolist(), self.sizes.tolist()))
+
+
+def _sorted_levels(raw: Sequence, size: float, descending: bool, presorted: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+        交易所原始深度 [[price, volume, ...], ...] (字符串或数字) --> 按价格排序的 (prices, sizes)
+        价格与数量各自直接由字符串列表转为连续数组 不经过二维数组与切片拷贝
+        presorted: 原始深度已按价格排序 不再 argsort
+    '''
+    if not raw:
+        return EMPTY, EMPTY
+    prices = np.array([level[0] for level in raw], dtype=np.float64)
+    sizes = np.array([level[1] for level in raw], dtype=np.float64)
+    if not presorted:
+        order = np.argsort(-prices if descending else prices, kind='stable')
+        prices = prices[order]
+        sizes = sizes[order]
+    if size != 1:
+        sizes *= size
+    return prices, sizes
+
+
+class ArrayDepthData(DepthData):
+    '''
+        numpy 数组深度 DepthData 的子类
+    '''
+
+    __slots__ = ('ask_prices', 'ask_sizes', 'bid_prices', 'bid_sizes', 'tick_size', '_cache')
+
+    def __init__(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        ts: int = 0,
+        ask_prices: np.ndarray = EMPTY,
+        ask_sizes: np.ndarray = EMPTY,
+        bid_prices: np.ndarray = EMPTY,
+        bid_sizes: np.ndarray = EMPTY,
+        tick_size: float = 0,
+    ):
+        '''
+            Params:
+                ask_prices ask_sizes: 卖单 价格从低到高 float64
+                bid_prices bid_sizes: 买单 价格从高到低 float64
+                tick_size: 最小价格变动单位 用于 spread_ticks 0 为未知
+        '''
+        self.symbol = symbol
+        self.exchange = exchange
+        self.ts = ts
+        self.ask_prices = ask_prices
+        self.ask_sizes = ask_sizes
+        self.bid_prices = bid_prices
+        self.bid_sizes = bid_sizes
+        self.tick_size = tick_size
+        self._cache: Dict[Any, Any] = {}
+
+    @classmethod
+    def from_raw(cls, symbol: str, exchange: Exchange, ts: int, raw_asks: Sequence, raw_bids: Sequence, size: float = 1, tick_size: float = 0, presorted: bool = False) -> 'ArrayDepthData':
+        '''
+            由交易所原始深度创建 [[price, volume, ...], ...] 价格与数量可为字符串 数量乘以合约面值 size
+            presorted: 原始深度已排序 (OKX books5 Binance 有限档深度) 跳过排序
+            note: 创建 numpy 数组有固定开销 仅转换深度时慢于 DepthData 的 tuple 档位少时更明显 见 example/bench_decode.py
+        '''
+        ask_prices, ask_sizes = _sorted_levels(raw_asks, size, descending=False, presorted=presorted)
+        bid_prices, bid_sizes = _sorted_levels(raw_bids, size, descending=True, presorted=presorted)
+        return cls(symbol, exchange, ts, ask_prices, ask_sizes, bid_prices, bid_sizes, tick_size)
+
+    @classmethod
+    def from_levels(cls, symbol: str, exchange: Exchange, ts: int, asks: Sequence[Tuple[float, float]], bids: Sequence[Tuple[float, float]], tick_size: float = 0) -> 'ArrayDepthData':
+        '''
+            由已排序的 (price, volume) 序列创建 例如 DepthData.asks
+        '''
+        asks_array = np.array(asks, dtype=np.float64).reshape(-1, 2)
+        bids_array = np.array(bids, dtype=np.float64).reshape(-1, 2)
+        return cls(
+            symbol, exchange, ts,
+            np.ascontiguousarray(asks_array[:, 0]), np.ascontiguousarray(asks_array[:, 1]),
+            np.ascontiguousarray(bids_array[:, 0]), np.ascontiguousarray(bids_array[:, 1]),
+            tick_size,
+        )
+
+    # === DepthData 兼容 ===
+    @property
+    def asks(self) -> DepthLevels:
+        return DepthLevels(self.ask_prices, self.ask_sizes)
+
+    @property
+    def bids(self) -> DepthLevels:
+        return DepthLevels(self.bid_prices, self.bid_sizes)
+
+    @property
+    def best_ask(self) -> Tuple[float, float] or None:
+        if len(self.ask_prices):
+            return (float(self.ask_prices[0]), float(self.ask_sizes[0]))
+        return None
+
+    @property
+    def best_bid(self) -> Tuple[float, float] or None:
+        if len(self.bid_prices):
+            return (float(self.bid_prices[0]), float(self.bid_sizes[0]))
+        return None
+
+    def to_depth_data(self) -> DepthData:
+        return DepthData(symbol=self.symbol, exchange=self.exchange, ts=self.ts, asks=self.asks.to_tuple(), bids=self.bids.to_tuple())
+
+    def __getstate__(self) -> dict:
+        return {
+            'symbol': self.symbol, 'exchange': self.exchange, 'ts': self.ts,
+            'ask_prices': self.ask_prices, 'ask_sizes': self.ask_sizes,
+            'bid_prices': self.bid_prices, 'bid_sizes': self.bid_sizes,
+            'tick_size': self.tick_size,
+        }
+
+    def __setstate__(self, state: dict):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._cache = {}
+
+    def __copy__(self) -> 'ArrayDepthData':
+        return ArrayDepthData(self.symbol, self.exchange, self.ts, self.ask_prices, self.ask_sizes, self.bid_prices, self.bid_sizes, self.tick_size)
+
+    # === 指标 首次计算后缓存 ===
+    @property
+    def mid(self) -> float or None:
+        '''
+            中间价 任一边为空返回 None
+        '''
+        cache = self._cache
+        if 'mid' not in cache:
+            cache['mid'] = (float(self.ask_prices[0]) + float(self.bid_prices[0])) / 2 if len(self.ask_prices) and len(self.bid_prices) else None
+        return cache['mid']
+
+    @property
+    def spread(self) -> float or None:
+        cache = self._cache
+        if 'spread' not in cache:
+            cache['spread'] = float(self.ask_prices[0]) - float(self.bid_prices[0]) if len(self.ask_prices) and len(self.bid_prices) else None
+        return cache['spread']
+
+    @property
+    def microprice(self) -> float or None:
+        '''
+            按一档数量加权的价格 (ask * bid_size + bid * ask_size) / (bid_size + ask_size)
+        '''
+        cache = self._cache
+        if 'microprice' not in cache:
+            if not len(self.ask_prices) or not len(self.bid_prices):
+                cache['microprice'] = None
+            else:
+                ask, ask_size = float(self.ask_prices[0]), float(self.ask_sizes[0])
+                bid, bid_size = float(self.bid_prices[0]), float(self.bid_sizes[0])
+                total = ask_size + bid_size
+                cache['microprice'] = (ask * bid_size + bid * ask_size) / total if total else (ask + bid) / 2
+        return cache['microprice']
+
+    def spread_ticks(self, tick_size: float = 0) -> float or None:
+        '''
+            价差的 tick 数量 tick_size 为空时使用创建时传入的合约 tick_size
+        '''
+        tick_size = tick_size or self.tick_size
+        spread = self.spread
+        if spread is None or not tick_size:
+            return None
+        return round(spread / tick_size, 8)
+
+    def imbalance(self, levels: int = 1) -> float or None:
+        '''
+            前 levels 档买卖数量不平衡 (bid - ask) / (bid + ask) 取值 -1~1 正数为买方更强
+        '''
+        key = ('imbalance', levels)
+        cache = self._cache
+        if key not in cache:
+            bid = float(self.bid_sizes[:levels].sum())
+            ask = float(self.ask_sizes[:levels].sum())
+            cache[key] = (bid - ask) / (bid + ask) if bid + ask else None
+        return cache[key]
+
+    def _cumulative(self, side: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+            return: (prices, sizes, 累计数量)
+        '''
+        cache = self._cache
+        key = ('cumsum', side)
+        if key not in cache:
+            prices, sizes = (self.ask_prices, self.ask_sizes) if side == 'asks' else (self.bid_prices, self.bid_sizes)
+            cache[key] = (prices, sizes, np.cumsum(sizes))
+        return cache[key]
+
+    def vwap(self, direction: Direction, volume: float) -> float or None:
+        '''
+            以市价成交 volume 的平均成交价 LONG 吃卖单 SHORT 吃买单; 深度不足返回 None
+        '''
+        key = ('vwap', direction, volume)
+        cache = self._cache
+        if key in cache:
+            return cache[key]
+        prices, sizes, cumsum = self._cumulative('asks' if direction == Direction.LONG else 'bids')
+        if volume <= 0 or not len(cumsum) or cumsum[-1] < volume:
+            cache[key] = None
+            return None
+        last = int(np.searchsorted(cumsum, volume, side='left')) # 最后一档
+        filled = cumsum[last - 1] if last else 0.0
+        notional = float(np.dot(prices[:last], sizes[:last])) + float(prices[last]) * (volume - filled)
+        cache[key] = notional / volume
+        return cache[key]
+
+    def cumulative_depth(self, side: str, price: float) -> float:
+        '''
+            价格优于或等于 price 的累计数量 side: 'asks' 卖单价格 <= price; 'bids' 买单价格 >= price
+        '''
+        prices, _, cumsum = self._cumulative(side)
+        if side == 'asks':
+            count = int(np.searchsorted(prices, price, side='right'))
+        elif side == 'bids':
+            count = int(np.searchsorted(-prices, -price, side='right'))
+        else:
+            raise ValueError(f"side 仅支持 'asks' 'bids': {side}")
+        return float(cumsum[count - 1]) if count else 0.0
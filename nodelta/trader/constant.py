@@ -89,6 +89,7 @@ class EventType(Enum):
     POSITION = "position"
     ACCOUNT = "account"
     BACKTESTEND = "backtestend"
+    TASK = "task" # 引擎内部事件 在事件处理线程中执行回调 例如异步下单完成回调
 
 
 class Interval(Enum):
@@ -0,0 +1,79 @@
+'''
+    合约信息磁盘缓存
+
+    gateway 启动时需要 REST 查询全部合约信息 (OKX 4个产品类型 Binance exchange_info) 耗时数秒
+    缓存文件保存解析后的 ContractData (json 每个 gateway 一个文件) 构造 gateway 时读取缓存即可下单
+    connect 后后台线程重新查询合约信息 整体替换 symbol_contract_map 等映射并写回缓存 之后按 contract_refresh_interval 定时刷新
+    新上架 下架的合约无需重启即可生效
+
+    用法:
+        gateway = OkxGateway(api, contract_cache='OutPut/contracts/OKX.json')
+        gateway.contract_refresh_interval = 3600 # 后台刷新间隔 秒 0 不定时刷新
+
+    写入: 先写临时文件再替换 不会产生不完整的缓存
+    缓存文件损坏 版本不一致 或 gateway 不一致时视为无缓存 照常 REST 初始化
+'''
+import json
+import os
+import time
+from dataclasses import fields
+from typing import Dict
+
+from .constant import Exchange, Product
+from .object import ContractData
+
+CONTRACT_CACHE_VERSION = 1
+CONTRACT_FIELDS = tuple(f.name for f in fields(ContractData))
+
+
+def contract_to_dict(contract: ContractData) -> dict:
+    data = {name: getattr(contract, name) for name in CONTRACT_FIELDS}
+    data['exchange'] = contract.exchange.value
+    data['product'] = contract.product.value
+    return data
+
+
+def contract_from_dict(data: dict) -> ContractData:
+    kwargs = {name: data[name] for name in CONTRACT_FIELDS if name in data}
+    kwargs['exchange'] = Exchange(data['exchange'])
+    kwargs['product'] = Product(data['product'])
+    return ContractData(**kwargs)
+
+
+def load_contract_cache(path: str, gateway_name: str) -> Dict[str, ContractData] or None:
+    '''
+        读取缓存 文件不存在或无法读取返回 None
+        Return: {nd_symbol: ContractData}
+    '''
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') != CONTRACT_CACHE_VERSION or cache.get('gateway_name') != gateway_name:
+            return None
+        contracts = [contract_from_dict(data) for data in cache['contracts']]
+        return {contract.symbol: contract for contract in contracts}
+    except Exception:
+        return None
+
+
+def save_contract_cache(path: str, gateway_name: str, symbol_contract_map: Dict[str, ContractData]):
+    '''
+        先写临时文件再替换
+    '''
+    cache = {
+        'version': CONTRACT_CACHE_VERSION,
+        'gateway_name': gateway_name,
+        'ts': int(time.time() * 1000),
+        'contracts': [contract_to_dict(contract) for contract in symbol_contract_map.values()],
+    }
+    dir_path = os.path.dirname(path)
+    if dir_path and not os.path.exists(dir_path):
+        os.makedirs(dir_path, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -1,13 +1,17 @@
 from typing import Dict, Any, List, Tuple, Union, Callable
 import os
-import sys
 import logging
-from logging import StreamHandler
 # from logging.handlers import RotatingFileHandler
 from datetime import datetime
-from queue import Empty, Queue
+from collections import deque
+from queue import Empty
 import threading
 import signal
+import asyncio
+import functools
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor
+import time
 import traceback
 
 from ..gateway.gateway import BaseGateway
@@ -15,16 +19,29 @@ from .strategy_template import StrategyTemplate
 from .constant import (
     LogLevel, Direction, Offset, Status, Exchange, Product, GatewayName, Interval, EventType
 )
-from .object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event
-from ..utils.sender import Sender
+from .object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event, TimerData, OrderRequest, CancelRequest
+from .event_queue import PriorityEventQueue, RingEventQueue
+from .latency import LatencyRecorder
+from .timer import TimerWheel
+from .oms import OrderManager, PositionManager
+from .journal import JournalRecorder
+from .snapshot import SnapshotManager
+from .watchdog import EngineWatchdog
+from ..utils.sender import AlertDispatcher
+from ..utils.logger import LogSampler, setup_queue_logging, stop_queue_logging
 
 class MainEngine:
 
-    def __init__(self):
+    def __init__(self, queue_type: str = 'priority', wait_strategy: str = 'spin_block', batch_size: int = 64):
         '''
             Params:
                 name: Engin名称
                 path: 数据路径 会自动创建f"EngineData_{self.engine_name}" 文件夹
+                queue_type: 事件队列类型
+                    priority: PriorityEventQueue 单锁队列
+                    ring: RingEventQueue 每个gateway线程独占环形缓冲 事件循环批量取出 适合高频行情
+                wait_strategy: queue_type='ring' 时的等待策略 block / spin_block / busy_poll
+                batch_size: 事件循环单次最多取出的事件数量
         '''
         # === 全局变量 ===
         self.gateways = {}  # gateway_name: gateway
@@ -33,6 +50,21 @@ class MainEngine:
         self.is_event_processing = False # 事件处理循环是否正在运行
         self.newest_processed_bar_opening_ts: int = 0 # 最新处理的K线时间戳; 初始值0
 
+        # === 策略与路由 ===
+        self.strategies: Dict[str, StrategyTemplate] = {} # strategy_name: strategy
+        self.strategy: StrategyTemplate = None # 兼容单策略写法 指向第一个添加的策略
+        self.subscribe_symbols: Dict[str, List[str]] = {} # 所有策略订阅合约汇总 gateway_name: [symbol1, symbol2]
+        self.topic: Dict[str, Dict[str, dict]] = {} # 所有策略topic汇总 {gateway_name: {event_type.value: {params}}}
+        self.route_table: Dict[Tuple[str, str], Tuple[StrategyTemplate, ...]] = {} # 事件路由表 (gateway_name, symbol): (strategy1, strategy2)
+        self.order_strategy_map: Dict[Tuple[str, str], StrategyTemplate] = {} # 订单归属 (gateway_name, orderid): strategy
+        self._finished_order_keys = deque() # 已结束订单的 (gateway_name, orderid) 超出上限后从 order_strategy_map 中删除
+        self._finished_order_key_set: set = set() # 与 _finished_order_keys 相同 避免重复的结束推送重复记录
+        self.max_finished_order_keys: int = 10000 # 保留的已结束订单归属数量上限
+        # 下单请求返回前 订单回报可能已到达 此时订单归属未知 见 __hold_order_event
+        self._sending_orders: Dict[str, int] = {} # gateway_name: 未返回的下单请求数量
+        self._held_order_events: Dict[str, List[tuple]] = {} # gateway_name: 暂存的 ORDER/TRADE 事件 (handler, exchange, gateway_name, symbol, data)
+        self._sending_lock = threading.Lock()
+
         # # === 数据路径 ===
         # # engine 文件夹
         # self.path_engineDir = os.path.join(path, f"EngineData_{self.engine_name}")
@@ -47,17 +79,74 @@ class MainEngine:
         #     f.write(f"{datetime.now()} - {self.engine_name} - {self.engine_name} Engine init")
         
         # === 日志配置 ===
+        # 日志写入在后台线程中完成 write_log 仅入队; set_log_file 写入滚动文件 set_log_sampling 对高频日志采样
         self.logger = logging.getLogger(__name__)
-        self.logger.propagate = False
-        self.logger.setLevel(logging.DEBUG)
-        formatter = logging.Formatter('%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s')
-        stream_handler = StreamHandler(sys.stderr)
-        stream_handler.setLevel(logging.DEBUG)
-        stream_handler.setFormatter(formatter)
-        self.logger.addHandler(stream_handler)
+        self.log_listener = setup_queue_logging(self.logger)
+        self.log_sampler = LogSampler()
+        # write_log(lark_url=...) 的告警由后台线程发送 去重 限频 重试 见 AlertDispatcher
+        self.alert_dispatcher = AlertDispatcher()
 
         # === 事件队列 ===
-        self.__queue_event = Queue()
+        # 按事件类型分通道 ORDER/TRADE > TIMER > BAR > DEPTH
+        if queue_type == 'priority':
+            self.__queue_event = PriorityEventQueue()
+        elif queue_type == 'ring':
+            self.__queue_event = RingEventQueue(wait_strategy=wait_strategy)
+        else:
+            raise ValueError(f"不支持的事件队列类型: {queue_type}")
+        self.batch_size = batch_size
+        self.depth_conflation: bool = True # 深度合并开关 回测中关闭: 限频按时钟推送 而回测时间不随真实时间推进
+
+        # === asyncio 模式 ===
+        # start_async 启动后 事件循环运行在 asyncio loop 中 策略回调可以是 async def
+        self.loop: asyncio.AbstractEventLoop = None
+        self._async_wakeup_pending: bool = False # 已安排 loop 处理事件 避免重复 call_soon_threadsafe
+        self._async_tasks: set = set() # 运行中的异步回调
+        self._async_timer: asyncio.TimerHandle = None # 限频深度到期后唤醒 loop
+        self._depth_tasks: Dict[Tuple[str, str, str], asyncio.Task] = {} # (strategy_name, gateway_name, symbol): 运行中的异步 on_depth
+        self._pending_depths: Dict[Tuple[str, str, str], tuple] = {} # 异步 on_depth 未完成时到达的最新深度 (exchange, depth)
+        self._async_stop_event: asyncio.Event = None
+
+        # === 本地订单管理 ===
+        # 由 ORDER/TRADE 事件与 send_order 更新 order_reconcile_interval 秒通过 REST 对账一次 0为不对账
+        self.oms = OrderManager()
+        self.order_reconcile_interval: float = 30
+        # 本地持仓与资产 由 TRADE 事件增量更新 account_reconcile_interval 秒通过 REST 对账一次 0为不对账
+        self.positions = PositionManager(get_contract=self.get_contract)
+        self.account_reconcile_interval: float = 60
+        self.account_reconcile_max_skips: int = 10 # 同一持仓或资产连续多少轮因新成交未对账时告警
+        self._account_reconcile_skips: Dict[str, Dict[Tuple[str, str], int]] = {} # gateway_name: {('position', symbol) / ('asset', name): 连续未对账轮数}
+
+        # === 异步下单 I/O 线程池 ===
+        # 每个 gateway 一个线程池 未完成的请求数量超过 io_max_pending 时拒绝新请求
+        self.io_max_workers: int = 4
+        self.io_max_pending: int = 64
+        self.io_pools: Dict[str, ThreadPoolExecutor] = {} # gateway_name: ThreadPoolExecutor
+        self.io_semaphores: Dict[str, threading.BoundedSemaphore] = {} # gateway_name: 未完成请求计数
+        self._io_lock = threading.Lock()
+
+        # === 定时器 ===
+        # 实盘由定时线程按系统时间推进 回测由 BacktestCtaGateway 按回测时间推进
+        self.timer_wheel = TimerWheel(tick_ms=10)
+        self._timer_id_count = itertools.count(1)
+
+        # === 耗时统计 ===
+        # 按 (event_type, gateway_name, symbol) 统计排队耗时与处理耗时 kill -USR1 pid 打印统计
+        self.latency_recorder = LatencyRecorder()
+
+        # === 事件日志 ===
+        # start_journal 后 put_event 的外部事件写入日志文件 可由 ReplayGateway 回放
+        self.journal: JournalRecorder = None
+
+        # === 快照 ===
+        # enable_snapshot 后定期保存 OMS 持仓 策略状态 与 gateway 合约信息 重启时恢复
+        self.snapshot: SnapshotManager = None
+
+        # === 监控 ===
+        # enable_watchdog 后后台线程检查事件队列积压与执行过久的回调 超过阈值时记录调用栈并告警
+        self.current_event: Tuple[Event, int] = None # 正在处理的 (事件, 开始时间 time.perf_counter_ns())
+        self.event_thread_ident: int = 0 # 事件处理线程 start / start_async 时设置
+        self.watchdog: EngineWatchdog = None
 
         # === 事件处理函数 ===
         self.event_handlers = {
@@ -65,6 +154,8 @@ class MainEngine:
             EventType.TRADE: self.__on_trade,
             EventType.ORDER: self.__on_order,
             EventType.BAR: self.__on_bar,
+            EventType.TIMER: self.__on_timer,
+            EventType.TASK: self.__on_task,
         }
     
     def add_gateways(self, gateways: List[BaseGateway]):
@@ -77,21 +168,211 @@ class MainEngine:
 
     def add_strategy(self, strategy: StrategyTemplate):
         '''
-            添加策略
+            添加策略 可多次调用 同一个MainEngine可同时运行多个策略
+            strategy_name 必须唯一
+        '''
+        if strategy.strategy_name in self.strategies:
+            msg = f"策略名称重复: {strategy.strategy_name}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            raise ValueError(msg)
+        self.strategies[strategy.strategy_name] = strategy
+        if self.strategy is None:
+            self.strategy = strategy
+        strategy.add_main_engine(self)  # 传入MainEngine
+        self.build_route_table()
+
+    def build_route_table(self):
+        '''
+            根据所有策略的 subscribe_symbols 与 topic 生成:
+                1. self.subscribe_symbols 订阅合约汇总
+                2. self.topic topic汇总 同一gateway同一事件类型的参数 后添加的策略覆盖先添加的策略
+                3. self.route_table (gateway_name, symbol) -> 订阅该合约的策略
+            并根据各策略的深度 topic 参数设置事件队列的深度合并
+        '''
+        subscribe_symbols: Dict[str, List[str]] = {}
+        topic: Dict[str, Dict[str, dict]] = {}
+        route_table: Dict[Tuple[str, str], List[StrategyTemplate]] = {}
+        for strategy in self.strategies.values():
+            for gateway_name, symbols in strategy.subscribe_symbols.items():
+                gateway_symbols = subscribe_symbols.setdefault(gateway_name, [])
+                for symbol in symbols:
+                    if symbol not in gateway_symbols:
+                        gateway_symbols.append(symbol)
+                    handlers = route_table.setdefault((gateway_name, symbol), [])
+                    if strategy not in handlers:
+                        handlers.append(strategy)
+            for gateway_name, gateway_topic in strategy.topic.items():
+                for event_type_value, params in gateway_topic.items():
+                    topic.setdefault(gateway_name, {}).setdefault(event_type_value, {}).update(params)
+        self.subscribe_symbols = subscribe_symbols
+        self.topic = topic
+        self.route_table = {k: tuple(v) for k, v in route_table.items()}
+        self.__apply_depth_conflation()
+
+    def __apply_depth_conflation(self):
+        '''
+            深度合并设置 仅当订阅该合约的所有策略都开启合并时才合并
+            推送频率取各策略 max_rate 的最大值 任一策略不限频(0)则不限频
+        '''
+        self.__queue_event.clear_conflation()
+        if not self.depth_conflation:
+            return
+        for (gateway_name, symbol), strategies in self.route_table.items():
+            max_rates = []
+            for strategy in strategies:
+                params = strategy.topic.get(gateway_name, {}).get(EventType.DEPTH.value, {})
+                max_rate = params.get('max_rate', 0)
+                if isinstance(max_rate, dict):
+                    max_rate = max_rate.get(symbol, 0)
+                if not params.get('conflate', False) and not max_rate:
+                    break
+                max_rates.append(max_rate)
+            else:
+                max_rate = 0 if 0 in max_rates else max(max_rates)
+                self.__queue_event.set_conflation(gateway_name, symbol, max_rate)
+
+    def get_route_strategies(self, gateway_name: str, symbol: str, orderid: str = '') -> Tuple[StrategyTemplate, ...]:
+        '''
+            获取事件需要分发的策略
+            订单与成交事件: 若订单由某个策略发出 仅分发给该策略; 否则分发给所有订阅该合约的策略
+                归属未知且有未返回的下单请求时 事件先暂存 见 __hold_order_event
+        '''
+        if orderid:
+            strategy = self.order_strategy_map.get((gateway_name, orderid), None)
+            if strategy is not None:
+                return (strategy,)
+        return self.route_table.get((gateway_name, symbol), ())
+
+    def send_order(self, gateway_name, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, strategy_name: str = '', **kwargs) -> str:
+        '''
+            下单
+            Params:
+                strategy_name: 发出订单的策略名称 用于订单与成交事件的路由
         '''
-        self.strategy = strategy
-        self.strategy.add_main_engine(self)  # 传入MainEngine
-    
-    def send_order(self, gateway_name, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, **kwargs) -> str:
         gateway = self.gateways[gateway_name]
+        sent = []
+        self.__begin_send(gateway_name)
         try:
             orderId = gateway.send_order(symbol=symbol, direction=direction, offset=offset, price=price, amount=amount, **kwargs)
+            if orderId:
+                sent.append((gateway, orderId, symbol, direction, offset, price, amount, strategy_name))
             return orderId
         except Exception as e:
             error_msg = traceback.format_exc()
             msg = f"send_order {gateway_name} 下单失败 : {e}; 合约: {symbol} 方向: {direction.value} 开平: {offset.value} 价格: {price} 数量: {amount} 报错信息:\n{error_msg}"
             self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
             return ''
+        finally:
+            self.__end_send(gateway_name, sent)
+
+    def is_event_thread(self) -> bool:
+        '''
+            当前线程是否为事件处理线程 事件循环启动前主线程视为事件处理线程(on_start 回测)
+        '''
+        return threading.get_ident() == (self.event_thread_ident or threading.main_thread().ident)
+
+    def call_in_event_thread(self, gateway_name: str, symbol: str, func: Callable):
+        '''
+            在事件处理线程中执行 func: 当前为事件处理线程时立即执行 否则通过 TASK 事件执行
+            OMS 与订单归属只在事件处理线程中修改 I/O 线程池中的请求结果经此写入
+        '''
+        if self.is_event_thread():
+            func()
+        else:
+            self.put_event(event_type=EventType.TASK, exchange=None, gateway_name=gateway_name, symbol=symbol, data=func)
+
+    def __begin_send(self, gateway_name: str):
+        '''
+            下单请求发出前计数 请求返回前到达的未知订单回报会被暂存
+        '''
+        with self._sending_lock:
+            self._sending_orders[gateway_name] = self._sending_orders.get(gateway_name, 0) + 1
+
+    def __end_send(self, gateway_name: str, sent: List[tuple]):
+        '''
+            下单请求返回 在事件处理线程中记录订单归属与 OMS 后计数减一
+            sent: 下单成功的 (gateway, orderid, symbol, direction, offset, price, amount, strategy_name)
+        '''
+        self.call_in_event_thread(gateway_name, sent[0][2] if sent else '', functools.partial(self.__finish_send, gateway_name, sent))
+
+    def __finish_send(self, gateway_name: str, sent: List[tuple]):
+        '''
+            事件处理线程 记录订单归属与 OMS 之后通过 TASK 事件重新分发暂存的事件
+        '''
+        for args in sent:
+            self.__on_order_sent(gateway_name, *args)
+        with self._sending_lock:
+            self._sending_orders[gateway_name] -= 1
+            has_held = bool(self._held_order_events.get(gateway_name))
+        if has_held:
+            self.put_event(event_type=EventType.TASK, exchange=None, gateway_name=gateway_name, symbol='', data=functools.partial(self.__release_order_events, gateway_name))
+
+    def __hold_order_event(self, handler: Callable, exchange: Exchange, gateway_name: str, symbol: str, data: Any) -> bool:
+        '''
+            ORDER/TRADE 事件的订单归属未知 且该合约有多个策略订阅 同时有未返回的下单请求时暂存事件
+            该订单可能由未返回的请求发出 按订阅关系分发会推送给其他策略
+            return: 是否已暂存
+        '''
+        if not data.orderid or (gateway_name, data.orderid) in self.order_strategy_map or len(self.route_table.get((gateway_name, symbol), ())) < 2:
+            return False
+        with self._sending_lock:
+            if not self._sending_orders.get(gateway_name):
+                return False
+            self._held_order_events.setdefault(gateway_name, []).append((handler, exchange, gateway_name, symbol, data))
+        return True
+
+    def __release_order_events(self, gateway_name: str):
+        '''
+            按到达顺序重新分发暂存的事件 仍未知归属且仍有未返回的下单请求时再次暂存
+        '''
+        with self._sending_lock:
+            events = self._held_order_events.pop(gateway_name, [])
+        for handler, *args in events:
+            handler(*args)
+
+    def __on_order_sent(self, gateway_name: str, gateway: BaseGateway, orderId: str, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, strategy_name: str):
+        '''
+            下单成功 记录订单所属策略 写入 OMS 在事件处理线程中执行
+        '''
+        if strategy_name in self.strategies:
+            self.order_strategy_map[(gateway_name, orderId)] = self.strategies[strategy_name]
+        self.oms.on_send_order(gateway_name, OrderData(
+            symbol=symbol,
+            exchange=getattr(gateway, 'exchange', None),
+            orderid=orderId,
+            direction=direction,
+            offset=offset,
+            price=price,
+            volume=amount,
+            status=Status.SUBMITTING,
+            ts=int(time.time() * 1000)
+        ))
+
+    def send_orders(self, gateway_name, requests: List[OrderRequest], strategy_name: str = '') -> List[str]:
+        '''
+            批量下单 gateway 按交易所批量接口上限自动分批
+            Params:
+                strategy_name: 发出订单的策略名称 用于订单与成交事件的路由
+            return: 与 requests 顺序一致的 orderid 列表 失败为空字符串
+        '''
+        if not requests:
+            return []
+        gateway = self.gateways[gateway_name]
+        sent = []
+        self.__begin_send(gateway_name)
+        try:
+            orderIds = gateway.send_orders(list(requests))
+            for req, orderId in zip(requests, orderIds):
+                if orderId:
+                    sent.append((gateway, orderId, req.symbol, req.direction, req.offset, req.price, req.amount, strategy_name))
+            return orderIds
+        except Exception as e:
+            error_msg = traceback.format_exc()
+            msg = f"send_orders {gateway_name} 批量下单失败 : {e}; 订单数量: {len(requests)} 报错信息:\n{error_msg}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            return [''] * len(requests)
+        finally:
+            self.__end_send(gateway_name, sent)
     
     def cancel_order(self, gateway_name, symbol: str, orderid: str) -> bool:
         gateway = self.gateways[gateway_name]
@@ -101,7 +382,135 @@ class MainEngine:
         except Exception as e:
             error_msg = traceback.format_exc()
             msg = f"cancel_order {gateway_name} 撤单失败 : {e}; 合约: {symbol} 订单号: {orderid} 报错信息:\n{error_msg}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            return False
+
+    def amend_order(self, gateway_name, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, **kwargs) -> bool:
+        '''
+            改单 订单号不变 比撤单后重新下单少一次请求 且订单不会离开订单簿
+            Params:
+                new_price: 新价格 为空不修改
+                new_amount: 新订单总量 包含已成交 为空不修改
+            note: 订单方向从 OMS 读取传给 gateway (Binance 改单需要)
+        '''
+        gateway = self.gateways[gateway_name]
+        try:
+            order = self.oms.get_order(gateway_name, orderid)
+            if order is not None:
+                kwargs.setdefault('direction', order.direction)
+                if new_price is None and new_amount is not None:
+                    new_price = order.price
+                elif new_amount is None and new_price is not None:
+                    new_amount = order.volume
+            amend_bool: bool = gateway.amend_order(symbol=symbol, orderid=orderid, new_price=new_price, new_amount=new_amount, **kwargs)
+            if amend_bool:
+                self.call_in_event_thread(gateway_name, symbol, functools.partial(self.oms.on_amend_order, gateway_name, orderid, price=new_price, volume=new_amount))
+            return amend_bool
+        except Exception as e:
+            error_msg = traceback.format_exc()
+            msg = f"amend_order {gateway_name} 改单失败 : {e}; 合约: {symbol} 订单号: {orderid} 价格: {new_price} 数量: {new_amount} 报错信息:\n{error_msg}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
             return False
+
+    def cancel_orders(self, gateway_name, requests: List[CancelRequest]) -> List[bool]:
+        '''
+            批量撤单 gateway 按交易所批量接口上限自动分批
+            return: 与 requests 顺序一致的撤单结果
+        '''
+        if not requests:
+            return []
+        gateway = self.gateways[gateway_name]
+        try:
+            return gateway.cancel_orders(list(requests))
+        except Exception as e:
+            error_msg = traceback.format_exc()
+            msg = f"cancel_orders {gateway_name} 批量撤单失败 : {e}; 订单数量: {len(requests)} 报错信息:\n{error_msg}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            return [False] * len(requests)
+
+    def __submit_io(self, gateway_name: str, symbol: str, func: Callable, callback: Callable = None, fail_result: Any = None) -> Future:
+        '''
+            提交至 gateway 的 I/O 线程池执行 完成后 callback(result) 通过 TASK 事件在事件处理线程中执行
+            未完成的请求超过 io_max_pending 时不提交 返回结果为 fail_result 的 Future
+        '''
+        with self._io_lock:
+            if gateway_name not in self.io_pools:
+                self.io_pools[gateway_name] = ThreadPoolExecutor(max_workers=self.io_max_workers, thread_name_prefix=f"nd_io_{gateway_name}")
+                self.io_semaphores[gateway_name] = threading.BoundedSemaphore(self.io_max_pending)
+        semaphore = self.io_semaphores[gateway_name]
+
+        def run():
+            result = fail_result
+            try:
+                result = func()
+                return result
+            finally:
+                semaphore.release()
+                if callback is not None:
+                    self.put_event(event_type=EventType.TASK, exchange=None, gateway_name=gateway_name, symbol=symbol, data=functools.partial(callback, result))
+
+        if not semaphore.acquire(blocking=False):
+            msg = f"{gateway_name} I/O 请求积压超过 {self.io_max_pending} 拒绝请求 合约: {symbol}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            future = Future()
+            future.set_result(fail_result)
+            if callback is not None:
+                self.put_event(event_type=EventType.TASK, exchange=None, gateway_name=gateway_name, symbol=symbol, data=functools.partial(callback, fail_result))
+            return future
+        return self.io_pools[gateway_name].submit(run)
+
+    def send_order_async(self, gateway_name, symbol: str, direction: Direction, offset: Offset, price: float, amount: float, strategy_name: str = '', callback: Callable[[str], Any] = None, **kwargs) -> Future:
+        '''
+            异步下单 在 gateway 的 I/O 线程池中执行 send_order 不阻塞事件处理
+            Params:
+                callback: 下单完成后在事件处理线程中执行 callback(orderid) 下单失败 orderid 为 ''
+            return: concurrent.futures.Future 结果为 orderid; asyncio 模式下可 await asyncio.wrap_future(future)
+            note: 订单回报(ORDER 事件)照常推送; 回报早于下单请求返回时 若该合约有多个策略订阅 回报暂存至请求返回后按订单归属分发
+        '''
+        func = functools.partial(self.send_order, gateway_name=gateway_name, symbol=symbol, direction=direction, offset=offset, price=price, amount=amount, strategy_name=strategy_name, **kwargs)
+        return self.__submit_io(gateway_name, symbol, func, callback=callback, fail_result='')
+
+    def cancel_order_async(self, gateway_name, symbol: str, orderid: str, callback: Callable[[bool], Any] = None) -> Future:
+        '''
+            异步撤单 在 gateway 的 I/O 线程池中执行 cancel_order 不阻塞事件处理
+            Params:
+                callback: 撤单完成后在事件处理线程中执行 callback(cancel_bool)
+            return: concurrent.futures.Future 结果为 cancel_bool
+        '''
+        func = functools.partial(self.cancel_order, gateway_name=gateway_name, symbol=symbol, orderid=orderid)
+        return self.__submit_io(gateway_name, symbol, func, callback=callback, fail_result=False)
+
+    def amend_order_async(self, gateway_name, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, callback: Callable[[bool], Any] = None, **kwargs) -> Future:
+        '''
+            异步改单 在 gateway 的 I/O 线程池中执行 amend_order 不阻塞事件处理
+            Params:
+                callback: 改单完成后在事件处理线程中执行 callback(amend_bool)
+            return: concurrent.futures.Future 结果为 amend_bool
+        '''
+        func = functools.partial(self.amend_order, gateway_name=gateway_name, symbol=symbol, orderid=orderid, new_price=new_price, new_amount=new_amount, **kwargs)
+        return self.__submit_io(gateway_name, symbol, func, callback=callback, fail_result=False)
+
+    def send_orders_async(self, gateway_name, requests: List[OrderRequest], strategy_name: str = '', callback: Callable[[List[str]], Any] = None) -> Future:
+        '''
+            异步批量下单 在 gateway 的 I/O 线程池中执行 send_orders
+            Params:
+                callback: 完成后在事件处理线程中执行 callback(orderids)
+            return: concurrent.futures.Future 结果为 orderid 列表
+        '''
+        requests = list(requests)
+        func = functools.partial(self.send_orders, gateway_name=gateway_name, requests=requests, strategy_name=strategy_name)
+        return self.__submit_io(gateway_name, requests[0].symbol if requests else '', func, callback=callback, fail_result=[''] * len(requests))
+
+    def cancel_orders_async(self, gateway_name, requests: List[CancelRequest], callback: Callable[[List[bool]], Any] = None) -> Future:
+        '''
+            异步批量撤单 在 gateway 的 I/O 线程池中执行 cancel_orders
+            Params:
+                callback: 完成后在事件处理线程中执行 callback(cancel_bools)
+            return: concurrent.futures.Future 结果为撤单结果列表
+        '''
+        requests = list(requests)
+        func = functools.partial(self.cancel_orders, gateway_name=gateway_name, requests=requests)
+        return self.__submit_io(gateway_name, requests[0].symbol if requests else '', func, callback=callback, fail_result=[False] * len(requests))
         
     def query_order(self, gateway_name, symbol: str, orderid: str) -> OrderData or None:
         '''
@@ -167,73 +576,415 @@ class MainEngine:
         '''
             交易所订单更新事件
         '''
-        try:
-            if symbol not in self.strategy.subscribe_symbols.get(gateway_name, []):
-                return
-            self.strategy.on_order(exchange=exchange, gateway_name=gateway_name, symbol=symbol, order=order)
-        except Exception as e:
-            error_msg = traceback.format_exc()
-            msg = f"on_order 异常: {e} Gateway: {gateway_name} strategy:{self.strategy.strategy_name} 合约: {symbol} 订单: {order} 报错信息:\n{error_msg}"
-            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+        if self.__hold_order_event(self.__on_order, exchange, gateway_name, symbol, order):
+            return
+        self.oms.on_order(gateway_name, order)
+        for strategy in self.get_route_strategies(gateway_name, symbol, order.orderid):
+            try:
+                result = strategy.on_order(exchange=exchange, gateway_name=gateway_name, symbol=symbol, order=order)
+                if result is not None:
+                    self.spawn_callback(result, strategy.strategy_name, 'on_order')
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                self.write_log(msg="on_order 异常: %s Gateway: %s strategy:%s 合约: %s 订单: %s 报错信息:\n%s", level=LogLevel.ERROR.value, source=self.engine_name,
+                               args=(e, gateway_name, strategy.strategy_name, symbol, order, error_msg))
+        # 已结束订单的归属记录超出上限后删除 成交事件可能晚于订单结束事件 因此不立即删除
+        key = (gateway_name, order.orderid)
+        if order.status in [Status.ALLTRADED, Status.CANCELLED, Status.REJECTED] and key in self.order_strategy_map and key not in self._finished_order_key_set:
+            self._finished_order_keys.append(key)
+            self._finished_order_key_set.add(key)
+            while len(self._finished_order_keys) > self.max_finished_order_keys:
+                finished_key = self._finished_order_keys.popleft()
+                self._finished_order_key_set.discard(finished_key)
+                self.order_strategy_map.pop(finished_key, None)
 
     def __on_depth(self, exchange: Exchange, gateway_name: str, symbol: str, depth: DepthData):
         '''
             交易所深度更新事件
         '''
+        for strategy in self.route_table.get((gateway_name, symbol), ()):
+            self.__dispatch_depth(strategy, exchange, gateway_name, symbol, depth)
+
+    def __dispatch_depth(self, strategy: StrategyTemplate, exchange: Exchange, gateway_name: str, symbol: str, depth: DepthData):
+        '''
+            推送深度至单个策略 该策略上一次异步 on_depth 未完成时只保留最新深度 完成后再推送
+        '''
+        key = (strategy.strategy_name, gateway_name, symbol)
+        if key in self._depth_tasks:
+            self._pending_depths[key] = (exchange, depth)
+            return
         try:
-            if symbol not in self.strategy.subscribe_symbols.get(gateway_name, []):
-                return
-            self.strategy.on_depth(exchange=exchange, gateway_name=gateway_name, symbol=symbol, depth=depth)
+            result = strategy.on_depth(exchange=exchange, gateway_name=gateway_name, symbol=symbol, depth=depth)
+            if result is not None:
+                task = self.spawn_callback(result, strategy.strategy_name, 'on_depth')
+                if task is not None:
+                    self._depth_tasks[key] = task
+                    task.add_done_callback(lambda task: self.__on_depth_task_done(strategy, key))
         except Exception as e:
             error_msg = traceback.format_exc()
-            msg = f"on_depth 异常: {e} Gateway: {gateway_name} strategy:{self.strategy.strategy_name} 合约: {symbol} 深度: {depth} 报错信息:\n{error_msg}"
-            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            self.write_log(msg="on_depth 异常: %s Gateway: %s strategy:%s 合约: %s 深度: %s 报错信息:\n%s", level=LogLevel.ERROR.value, source=self.engine_name,
+                           args=(e, gateway_name, strategy.strategy_name, symbol, depth, error_msg))
+
+    def __on_depth_task_done(self, strategy: StrategyTemplate, key: Tuple[str, str, str]):
+        self._depth_tasks.pop(key, None)
+        pending = self._pending_depths.pop(key, None)
+        if pending is not None and self.is_event_processing:
+            _, gateway_name, symbol = key
+            exchange, depth = pending
+            self.__dispatch_depth(strategy, exchange, gateway_name, symbol, depth)
 
     def __on_trade(self, exchange: Exchange, gateway_name: str, symbol: str, trade: TradeData):
         '''
             交易所成交更新事件
         '''
-        try:
-            if symbol not in self.strategy.subscribe_symbols.get(gateway_name, []):
+        if self.__hold_order_event(self.__on_trade, exchange, gateway_name, symbol, trade):
+            return
+        self.oms.on_trade(gateway_name, trade)
+        self.positions.on_trade(gateway_name, trade)
+        for strategy in self.get_route_strategies(gateway_name, symbol, trade.orderid):
+            try:
+                result = strategy.on_trade(exchange, gateway_name, symbol, trade)
+                if result is not None:
+                    self.spawn_callback(result, strategy.strategy_name, 'on_trade')
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                self.write_log(msg="on_trade 异常: %s Gateway: %s strategy:%s 合约: %s 成交: %s 报错信息:\n%s", level=LogLevel.ERROR.value, source=self.engine_name,
+                               args=(e, gateway_name, strategy.strategy_name, symbol, trade, error_msg))
+
+    def __on_bar(self, exchange: Exchange, gateway_name: str, symbol: str, bar: BarData):
+        '''
+            交易所K线更新事件
+        '''
+        for strategy in self.route_table.get((gateway_name, symbol), ()):
+            try:
+                result = strategy.on_bar(exchange, gateway_name, symbol, bar)
+                if result is not None:
+                    self.spawn_callback(result, strategy.strategy_name, 'on_bar')
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                self.write_log(msg="on_bar 异常: %s Gateway: %s strategy:%s 合约: %s K线: %s 报错信息:\n%s", level=LogLevel.ERROR.value, source=self.engine_name,
+                               args=(e, gateway_name, strategy.strategy_name, symbol, bar, error_msg))
+
+    def get_contract(self, gateway_name: str, symbol: str) -> ContractData or None:
+        '''
+            获取合约信息
+        '''
+        gateway = self.gateways.get(gateway_name)
+        if gateway is None:
+            return None
+        return gateway.symbol_contract_map.get(symbol, None)
+
+    def get_order(self, gateway_name: str, orderid: str) -> OrderData or None:
+        '''
+            从本地订单簿获取订单 无网络请求
+        '''
+        return self.oms.get_order(gateway_name, orderid)
+
+    def get_active_orders(self, gateway_name: str, symbol: str = '') -> List[OrderData]:
+        '''
+            从本地订单簿获取活跃订单 symbol 为空时返回 gateway 所有活跃订单 无网络请求
+        '''
+        return self.oms.get_active_orders(gateway_name, symbol)
+
+    def get_outstanding_notional(self, gateway_name: str, symbol: str = '') -> float:
+        '''
+            活跃订单未成交部分的名义价值 price * (volume - traded)
+        '''
+        return self.oms.get_outstanding_notional(gateway_name, symbol)
+
+    def get_account(self, gateway_name: str) -> AccountData or None:
+        '''
+            从本地获取账户持仓与资产 首次调用时通过 REST 加载
+        '''
+        if not self.positions.is_loaded(gateway_name):
+            self.load_account(gateway_name)
+        return self.positions.get_account(gateway_name)
+
+    def get_position(self, gateway_name: str, symbol: str) -> PositionData or None:
+        '''
+            从本地获取持仓 首次调用时通过 REST 加载
+        '''
+        if not self.positions.is_loaded(gateway_name):
+            self.load_account(gateway_name)
+        return self.positions.get_position(gateway_name, symbol)
+
+    def load_account(self, gateway_name: str) -> bool:
+        '''
+            通过 REST 查询账户 覆盖本地持仓与资产
+        '''
+        account = self.query_account(gateway_name)
+        if account is None:
+            return False
+        self.positions.load_account(account)
+        return True
+
+    def start_account_reconcile(self):
+        '''
+            启动持仓与资产对账线程 每 account_reconcile_interval 秒:
+                1. 通过 REST 查询账户
+                2. 通过 TASK 事件在事件处理线程中比较 记录不一致项后以 REST 结果覆盖本地
+                    查询期间有新成交的持仓与资产本轮不对账 避免把尚未反映在 REST 结果中的成交当作不一致
+                    其余项目照常对账 同一项目连续 account_reconcile_max_skips 轮未对账时告警
+        '''
+        if not self.account_reconcile_interval:
+            return
+
+        def run_reconcile():
+            while self.is_event_processing:
+                for gateway_name in list(self.gateways.keys()): # 启动时立即加载一次
+                    try:
+                        self.reconcile_account(gateway_name)
+                    except Exception as e:
+                        error_msg = traceback.format_exc()
+                        msg = f"{gateway_name} 持仓对账异常: {e} 报错信息:\n{error_msg}"
+                        self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+                time.sleep(self.account_reconcile_interval)
+
+        threading.Thread(target=run_reconcile, name='nd_account_reconcile', daemon=True).start()
+
+    def reconcile_account(self, gateway_name: str):
+        '''
+            单个 gateway 的持仓与资产对账 在对账线程中执行 REST 查询
+        '''
+        trade_seq = self.positions.trade_seq.get(gateway_name, 0)
+        account = self.query_account(gateway_name)
+        if account is None:
+            return
+
+        def apply():
+            if not self.positions.is_loaded(gateway_name):
+                self.positions.load_account(account)
                 return
-            self.strategy.on_trade(exchange, gateway_name, symbol, trade)
+            skip = self.positions.touched_since(gateway_name, trade_seq)
+            mismatches = self.positions.reconcile(account, skip=skip)
+            if mismatches:
+                msg = f"{gateway_name} 持仓对账不一致 已以 REST 为准:\n" + '\n'.join(mismatches)
+                self.write_log(msg=msg, level=LogLevel.WARNING.value, source=self.engine_name)
+            skip_counts = self._account_reconcile_skips.get(gateway_name, {})
+            skip_counts = self._account_reconcile_skips[gateway_name] = {key: skip_counts.get(key, 0) + 1 for key in skip}
+            max_skips = self.account_reconcile_max_skips
+            stale = [f"{kind} {name}" for (kind, name), count in skip_counts.items() if max_skips and count % max_skips == 0]
+            if stale:
+                msg = f"{gateway_name} 以下持仓或资产连续 {max_skips} 轮对账期间有新成交 未对账: {', '.join(stale)}"
+                self.write_log(msg=msg, level=LogLevel.WARNING.value, source=self.engine_name)
+
+        self.put_event(event_type=EventType.TASK, exchange=None, gateway_name=gateway_name, symbol='', data=apply)
+
+    def start_order_reconcile(self):
+        '''
+            启动订单对账线程 每 order_reconcile_interval 秒:
+                1. 查询订阅合约的 REST 活跃订单
+                2. 本地活跃但 REST 未返回的订单 逐个查询最终状态
+                3. 结果通过 TASK 事件在事件处理线程中修正本地订单簿
+        '''
+        if not self.order_reconcile_interval:
+            return
+
+        def run_reconcile():
+            while self.is_event_processing:
+                time.sleep(self.order_reconcile_interval)
+                for gateway_name, gateway in self.gateways.copy().items():
+                    for symbol in self.subscribe_symbols.get(gateway_name, []):
+                        try:
+                            self.reconcile_orders(gateway_name, gateway, symbol)
+                        except Exception as e:
+                            error_msg = traceback.format_exc()
+                            msg = f"{gateway_name} {symbol} 订单对账异常: {e} 报错信息:\n{error_msg}"
+                            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+
+        threading.Thread(target=run_reconcile, name='nd_order_reconcile', daemon=True).start()
+
+    def reconcile_orders(self, gateway_name: str, gateway: BaseGateway, symbol: str):
+        '''
+            单个合约的订单对账 在对账线程中执行 REST 查询
+        '''
+        local_ids = {order.orderid for order in self.oms.get_active_orders(gateway_name, symbol)}
+        rest_orders: List[OrderData] = gateway.query_active_orders(symbol) or []
+        for orderid in local_ids - {order.orderid for order in rest_orders}:
+            order = gateway.query_order(symbol, orderid)
+            if order is not None:
+                rest_orders.append(order)
+
+        def apply():
+            repairs = self.oms.apply_reconcile(gateway_name, symbol, rest_orders)
+            if repairs:
+                msg = f"{gateway_name} {symbol} 订单对账修正 {len(repairs)} 个订单:\n" + '\n'.join(repairs)
+                self.write_log(msg=msg, level=LogLevel.WARNING.value, source=self.engine_name)
+
+        self.put_event(event_type=EventType.TASK, exchange=None, gateway_name=gateway_name, symbol=symbol, data=apply)
+
+    def __on_task(self, exchange: Exchange, gateway_name: str, symbol: str, task: Callable):
+        '''
+            引擎内部任务 在事件处理线程中执行 例如异步下单完成回调
+        '''
+        try:
+            result = task()
+            if result is not None:
+                self.spawn_callback(result, getattr(task, '__qualname__', ''), 'task')
         except Exception as e:
             error_msg = traceback.format_exc()
-            msg = f"on_trade 异常: {e} Gateway: {gateway_name} strategy:{self.strategy.strategy_name} 合约: {symbol} 成交: {trade} 报错信息:\n{error_msg}"
-            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            self.write_log(msg="task 异常: %s Gateway: %s 合约: %s 任务: %s 报错信息:\n%s", level=LogLevel.ERROR.value, source=self.engine_name,
+                           args=(e, gateway_name, symbol, task, error_msg))
 
-    def __on_bar(self, exchange: Exchange, gateway_name: str, symbol: str, bar: BarData):
+    def __on_timer(self, exchange: Exchange, gateway_name: str, symbol: str, timer: TimerData):
         '''
-            交易所K线更新事件
+            定时器到期事件 仅推送给创建定时器的策略
         '''
+        if timer.cancelled: # 入队后被撤销
+            return
+        strategy = self.strategies.get(timer.strategy_name)
+        if strategy is None:
+            return
         try:
-            if symbol not in self.strategy.subscribe_symbols.get(gateway_name, []):
-                return
-            self.strategy.on_bar(exchange, gateway_name, symbol, bar)
+            result = strategy.on_timer(timer)
+            if result is not None:
+                self.spawn_callback(result, strategy.strategy_name, 'on_timer')
         except Exception as e:
             error_msg = traceback.format_exc()
-            msg = f"on_bar 异常: {e} Gateway: {gateway_name} strategy:{self.strategy.strategy_name} 合约: {symbol} K线: {bar} 报错信息:\n{error_msg}"
-            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            self.write_log(msg="on_timer 异常: %s strategy:%s 定时器: %s 报错信息:\n%s", level=LogLevel.ERROR.value, source=self.engine_name,
+                           args=(e, strategy.strategy_name, timer, error_msg))
 
-    def write_log(self, msg: str, level:int = logging.INFO, source: str = '', lark_url = None):
+    def set_timer(self, strategy_name: str, interval_ms: int, periodic: bool = True, data: Any = None, timer_id: str = '') -> str:
         '''
-            写入日志
+            添加定时器 到期后推送 TIMER 事件 由策略 on_timer 处理
             Params:
-                msg: 日志内容
+                interval_ms: 定时间隔 毫秒 精度为时间轮 tick(10ms) 回测中精度为K线周期
+                periodic: True 周期触发 False 仅触发一次
+                data: 自定义数据 随 TimerData 返回
+                timer_id: 定时器ID 为空时自动生成
+            return: timer_id
+        '''
+        timer_id = timer_id or f"{strategy_name}.timer.{next(self._timer_id_count)}"
+        timer = TimerData(
+            timer_id=timer_id,
+            strategy_name=strategy_name,
+            interval_ms=interval_ms,
+            periodic=periodic,
+            data=data,
+        )
+        self.timer_wheel.add(timer)
+        return timer_id
+
+    def cancel_timer(self, timer_id: str) -> bool:
+        '''
+            撤销定时器 定时器不存在或一次性定时器已触发返回 False
+        '''
+        return self.timer_wheel.cancel(timer_id)
+
+    def process_timers(self, now_ts: int):
+        '''
+            推进时间轮至 now_ts 到期的定时器推送 TIMER 事件
+        '''
+        for timer in self.timer_wheel.advance(now_ts):
+            self.put_event(event_type=EventType.TIMER, exchange=None, gateway_name='', symbol='', data=timer)
+
+    def start_timer(self):
+        '''
+            启动定时线程 按系统时间推进时间轮
+        '''
+        def run_timer():
+            interval = self.timer_wheel.tick_ms / 1000
+            while self.is_event_processing:
+                try:
+                    self.process_timers(int(time.time() * 1000))
+                except Exception as e:
+                    error_msg = traceback.format_exc()
+                    msg = f"定时器推进异常: {e} 报错信息:\n{error_msg}"
+                    self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+                time.sleep(interval)
+
+        threading.Thread(target=run_timer, name='nd_timer', daemon=True).start()
+
+    def write_log(self, msg: str, level:int = logging.INFO, source: str = '', lark_url = None, args: tuple = ()):
+        '''
+            写入日志 仅入队 格式化与写入在后台线程中完成
+            Params:
+                msg: 日志内容 可包含 %s 占位符 由 args 延迟格式化
                 level: 日志等级
                 source: 日志来源 strategy, gateway, engine
+                lark_url: 同时发送 lark 告警 仅入队 由 alert_dispatcher 后台线程发送
+                args: msg 的格式化参数 例如 write_log("成交: %s", args=(trade,)) 不在调用线程中生成 repr
         '''
         try:
+            if not self.logger.isEnabledFor(level):
+                return
+            skipped = self.log_sampler.sample(source, level) if self.log_sampler.rules and level < logging.ERROR else 0
+            if skipped < 0:
+                return
+            if skipped:
+                msg = f"{msg} (采样: 跳过 {skipped} 条)"
             if source:
-                _msg = f"{source} : {msg}"
-            self.logger.log(level, _msg)
+                msg = f"{source} : {msg}"
+            self.logger.log(level, msg, *args)
             if lark_url:
-                Sender.lark(title=f"{self.strategy.strategy_name}", text=msg, bot_url=lark_url)
+                text = msg % args if args else msg
+                self.alert_dispatcher.lark(title=f"{source or self.engine_name}", text=text, bot_url=lark_url)
         except Exception as e:
             error_msg = traceback.format_exc()
             msg = f"写入日志异常: {e} 报错信息:\n{error_msg}"
             print(msg)
 
+    def set_log_file(self, file_path: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 10, when: str = ''):
+        '''
+            日志同时写入滚动文件
+            Params:
+                max_bytes: 按大小滚动 单个文件最大字节数
+                when: 按时间滚动 例如 'midnight' 'H' 设置后忽略 max_bytes
+                backup_count: 保留的历史文件数量
+        '''
+        self.log_listener = setup_queue_logging(self.logger, file_path=file_path, max_bytes=max_bytes, backup_count=backup_count, when=when)
+
+    def enable_snapshot(self, path: str, interval: float = 60, max_age: float = 300):
+        '''
+            启用快照 需在 add_strategy 之后 start 之前调用 快照文件存在时启动时恢复:
+                OMS 与持仓在策略 on_start 之前恢复 之后由 REST 对账修正
+                策略 variables_name 变量与注册的 ArrayManager 在 on_start 之后恢复 快照超过 max_age 秒不恢复
+            gateway 合约信息需在创建 gateway 时传入 warm_state=get_gateway_state(load_snapshot(path), gateway_name)
+            Params:
+                interval: 保存间隔 秒 0为仅在退出时保存
+        '''
+        self.snapshot = SnapshotManager(self, path, interval=interval, max_age=max_age)
+        msg = f"快照已启用: {path} {'已读取快照' if self.snapshot.snapshot else '无可用快照'}"
+        self.write_log(msg=msg, level=LogLevel.INFO.value, source=self.engine_name)
+
+    def enable_watchdog(self, slow_callback_ms: float = 100, backlog_threshold: int = 1000, interval: float = 0.05, alert_interval: float = 60, lark_url: str = None) -> EngineWatchdog:
+        '''
+            启用监控线程 start 之前调用 参数见 EngineWatchdog
+        '''
+        self.watchdog = EngineWatchdog(self, slow_callback_ms=slow_callback_ms, backlog_threshold=backlog_threshold,
+                                       interval=interval, alert_interval=alert_interval, lark_url=lark_url)
+        return self.watchdog
+
+    def start_journal(self, dir_path: str, prefix: str = 'journal', max_bytes: int = 256 * 1024 * 1024):
+        '''
+            开始记录事件日志 序列化与写文件在后台线程中完成
+            Params:
+                dir_path: 日志目录
+                max_bytes: 单个文件最大字节数 超过后滚动
+        '''
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = JournalRecorder(dir_path, prefix=prefix, max_bytes=max_bytes)
+        msg = f"事件日志记录已启动: {dir_path}"
+        self.write_log(msg=msg, level=LogLevel.INFO.value, source=self.engine_name)
+
+    def stop_journal(self):
+        '''
+            停止记录事件日志 写完队列中的事件后关闭文件
+        '''
+        journal, self.journal = self.journal, None
+        if journal is not None:
+            journal.close()
+            msg = f"事件日志记录已停止: {journal.get_stats()}"
+            self.write_log(msg=msg, level=LogLevel.INFO.value, source=self.engine_name)
+
+    def set_log_sampling(self, source: str, level: int, every_n: int):
+        '''
+            日志采样 source 的 level 级别日志每 every_n 条记录 1 条 source 为空对所有来源生效
+            ERROR 及以上级别不采样; every_n <= 1 取消采样
+        '''
+        self.log_sampler.set_rule(source, level, every_n)
+
     def register_finish_func(self):
         '''
             注册策略结束事件
@@ -244,12 +995,75 @@ class MainEngine:
             signal.signal(signal.SIGBREAK, self.on_exit) # Ctrl + Break
         elif hasattr(signal, 'SIGQUIT'):
             signal.signal(signal.SIGQUIT, self.on_exit) # Ctrl + \
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.on_dump_signal) # kill -USR1 pid 打印运行状态
+
+    def on_dump_signal(self, signum, frame) -> None:
+        '''
+            收到 SIGUSR1 后在后台线程中打印运行状态 不阻塞事件处理
+        '''
+        threading.Thread(target=self.dump_status, daemon=True).start()
+
+    def dump_status(self) -> str:
+        '''
+            打印并返回运行状态: 事件队列积压 各事件耗时统计 活跃订单 持仓
+            活跃订单与持仓均来自本地 不发送网络请求
+        '''
+        try:
+            lines = [f"===== {self.engine_name} 运行状态 ====="]
+            lines.append(f"事件队列积压: {self.__queue_event.qsize()}")
+            for lane_name, metric in self.__queue_event.get_metrics().items():
+                lines.append(f"    {lane_name}: {metric}")
+            lines.append(f"各事件类型积压: {self.__queue_event.get_backlog()}")
+            if self.watchdog is not None:
+                lines.append(f"监控: {self.watchdog.get_gauges()}")
+            if self.journal is not None:
+                lines.append(f"事件日志: {self.journal.get_stats()}")
+            lines.append("事件耗时统计:")
+            lines.append(self.latency_recorder.format_report())
+            for gateway_name, gateway in self.gateways.copy().items():
+                if getattr(gateway, 'feed_process', None) is not None:
+                    lines.append(f"{gateway_name} 行情子进程: {gateway.feed_process.get_metrics()}")
+                for symbol in self.subscribe_symbols.get(gateway_name, []):
+                    try:
+                        orders = self.oms.get_active_orders(gateway_name, symbol)
+                        lines.append(f"{gateway_name} {symbol} 活跃订单: {len(orders)} 未成交名义价值: {self.oms.get_outstanding_notional(gateway_name, symbol)}")
+                        for order in orders:
+                            lines.append(f"    {order}")
+                        lines.append(f"{gateway_name} {symbol} 持仓: {self.positions.get_position(gateway_name, symbol)}")
+                    except Exception as e:
+                        lines.append(f"{gateway_name} {symbol} 查询订单与持仓异常: {e}")
+            report = '\n'.join(lines)
+            self.write_log(msg=report, level=LogLevel.INFO.value, source=self.engine_name)
+            return report
+        except Exception as e:
+            error_msg = traceback.format_exc()
+            msg = f"打印运行状态异常: {e} 报错信息:\n{error_msg}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            return msg
 
     def on_exit(self, signum, frame) -> None:
         '''
             进程结束前调用策略 on_finish 事件后退出程序
         '''
-        self.strategy.on_finish()
+        for strategy in self.strategies.values():
+            try:
+                strategy.on_finish()
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                msg = f"{strategy.strategy_name} on_finish 异常: {e} 报错信息:\n{error_msg}"
+                self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+        for gateway in self.gateways.values():
+            if getattr(gateway, 'feed_process', None) is not None:
+                gateway.feed_process.stop(timeout=1) # 释放共享内存
+        if self.snapshot is not None:
+            try:
+                self.snapshot.save()
+            except Exception as e:
+                print(f"保存快照异常: {e}")
+        self.stop_journal()
+        self.alert_dispatcher.flush(timeout=5) # 发送队列中的告警
+        stop_queue_logging(self.logger) # 写完队列中的日志
         os._exit(0) # 结束所有线程退出程序
     
     def set_gateway_params(self, gateway_name: str, params: Dict[str, Any]):
@@ -262,30 +1076,37 @@ class MainEngine:
         msg = f"设置gateway属性成功: {gateway_name} {params}"
         self.write_log(msg=msg, level=LogLevel.INFO.value, source=self.engine_name)
         
-    def start(self):
+    def start_strategies(self):
         '''
-            启动引擎
-
-        note:
-            1. strategy engine 中的 symbol 都有统一的命名规范; 
-                gateway 中接收到的都是规范 smyobl 需要转化成 gateway 所需的 gateway_symbol, 传递回 main_engine 时需要转化成统一的 symbol
+            注册on_finish 依次运行所有策略的 on_start 事件
         '''
+        self.build_route_table()
+        self.register_finish_func()
+        if self.snapshot is not None:
+            self.snapshot.restore_engine()
+        for strategy in self.strategies.values():
+            try:
+                strategy.warm_started = self.snapshot is not None and self.snapshot.has_strategy_state(strategy.strategy_name)
+                result = strategy.on_start()
+                if result is not None:
+                    self.spawn_callback(result, strategy.strategy_name, 'on_start')
+            except Exception as e:
+                msg = f"{strategy.strategy_name} on_start 异常: {e}"
+                self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+                raise Exception(msg)
+            if self.snapshot is not None:
+                self.snapshot.restore_strategy(strategy)
+        self.build_route_table() # on_start 中可能修改订阅
 
-        # 0. 策略：注册on_finish 运行on_start 事件
-        try:
-            self.register_finish_func()
-            self.strategy.on_start()
-        except Exception as e:
-            msg = f"{self.strategy.strategy_name} register_finish_func or on_start 异常: {e}"
-            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
-            raise Exception(msg)
-
-        # 1. 连接所有交易所 订阅行情与成交数据
+    def connect_gateways(self):
+        '''
+            连接所有交易所 订阅所有策略所需的行情与成交数据
+        '''
         for gateway_name, gateway in self.gateways.copy().items():
             try:
-                symbols = self.strategy.subscribe_symbols.get(gateway_name, []) # 订阅的合约
-                print(f"{gateway_name} 正在订阅 {self.strategy.subscribe_symbols}")
-                print(f"strategy.subscribe_symbols.keys: {self.strategy.subscribe_symbols.keys()}")
+                symbols = self.subscribe_symbols.get(gateway_name, []) # 订阅的合约
+                msg = f"{gateway_name} 正在订阅 {symbols} 所有订阅 gateway: {list(self.subscribe_symbols.keys())}"
+                self.write_log(msg=msg, level=LogLevel.DEBUG.value, source=self.engine_name)
                 if symbols:
                     # 1. check symbol 命名规范
                     for symbol in symbols:
@@ -303,28 +1124,191 @@ class MainEngine:
                 msg = f"Gateway: {gateway_name} 订阅数据失败: {e}"
                 self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
 
+    def start(self):
+        '''
+            启动引擎
+
+        note:
+            1. strategy engine 中的 symbol 都有统一的命名规范; 
+                gateway 中接收到的都是规范 smyobl 需要转化成 gateway 所需的 gateway_symbol, 传递回 main_engine 时需要转化成统一的 symbol
+        '''
+
+        # 0. 策略：注册on_finish 运行on_start 事件
+        self.start_strategies()
+
+        # 1. 连接所有交易所 订阅行情与成交数据
+        self.connect_gateways()
+
         # 2. 启动事件处理循环
         self.write_log(msg=f"事件处理循环启动", level=LogLevel.INFO.value, source=self.engine_name)
         self.is_event_processing = True
-        while True:
+        if isinstance(self.__queue_event, RingEventQueue):
+            self.__queue_event.bind_consumer()
+        self.start_timer()
+        self.start_order_reconcile()
+        self.start_account_reconcile()
+        if self.snapshot is not None:
+            self.snapshot.start()
+        self.event_thread_ident = threading.get_ident()
+        if self.watchdog is not None:
+            self.watchdog.start()
+        while self.is_event_processing:
             try:
-                event : Event = self.__queue_event.get(block=True)
-                handler = self.event_handlers.get(event.event_type)
-                if handler is not None:
-                    handler(event.exchange, event.gateway_name, event.symbol, event.data)
-                    # --- 如果是 trade 事件则自动打印 log
-                    if event.event_type in [EventType.TRADE]:
-                        msg = f"{event.event_type} Event Done; Data: {event.data}"
-                        self.write_log(msg=msg, level=LogLevel.INFO.value, source=self.engine_name)
-                    # --- 如果是 bar 事件更新 self.newest_processed_bar_opening_ts
-                    if event.event_type == EventType.BAR:
-                        self.newest_processed_bar_opening_ts = event.data.open_ts
-                else:
-                    msg = f"事件处理函数不存在: {event.event_type}"
+                events = self.__queue_event.get_batch(max_size=self.batch_size, block=True, timeout=1)
+            except Empty: # 定期检查 is_event_processing 以便 stop() 后退出
+                continue
+            for event in events:
+                try:
+                    self.process_event(event)
+                except Exception as e:
+                    msg = f"{self.engine_name} 事件处理异常: {e}"
                     self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+
+    async def start_async(self):
+        '''
+            以 asyncio 方式启动引擎 需在 asyncio loop 中运行: asyncio.run(main_engine.start_async())
+
+            1. gateway 线程调用 put_event 后通过 loop.call_soon_threadsafe 通知 loop 批量处理事件
+            2. 策略回调可以是 async def 回调返回的协程作为 task 并发运行 不阻塞其他事件的分发
+                note: 同一策略的异步回调可能交替执行 需要顺序执行时请自行加锁(asyncio.Lock)
+                异步 on_depth 同一策略同一合约同时只运行一个 期间到达的深度只保留最新一个 完成后推送
+            3. 阻塞的 REST 请求可通过 StrategyTemplate.run_blocking 在线程池中执行
+        '''
+        self.loop = asyncio.get_running_loop()
+        self._async_stop_event = asyncio.Event()
+        if isinstance(self.__queue_event, RingEventQueue):
+            self.__queue_event.bind_consumer()
+
+        # 0. 策略：注册on_finish 运行on_start 事件
+        self.start_strategies()
+
+        # 1. 连接所有交易所 订阅行情与成交数据
+        self.connect_gateways()
+
+        # 2. 处理启动过程中已入队的事件 之后由 put_event 唤醒
+        self.write_log(msg=f"asyncio 事件处理循环启动", level=LogLevel.INFO.value, source=self.engine_name)
+        self.is_event_processing = True
+        self.start_timer()
+        self.start_order_reconcile()
+        self.start_account_reconcile()
+        if self.snapshot is not None:
+            self.snapshot.start()
+        self.event_thread_ident = threading.get_ident()
+        if self.watchdog is not None:
+            self.watchdog.start()
+        self._async_wakeup_pending = True
+        self.__process_events_async()
+        try:
+            await self._async_stop_event.wait()
+            if self._async_tasks:
+                await asyncio.gather(*self._async_tasks, return_exceptions=True)
+        finally:
+            self.is_event_processing = False
+            self.loop = None
+
+    def __process_events_async(self):
+        '''
+            在 loop 中处理队列中的事件 单次最多处理 batch_size 个 剩余事件交还 loop 后继续处理 避免饿死其他 task
+        '''
+        self._async_wakeup_pending = False # 先清除标记 处理期间新入队的事件会再次唤醒
+        if not self.is_event_processing:
+            return
+        try:
+            events = self.__queue_event.get_batch(max_size=self.batch_size, block=False)
+        except Empty: # 队列中只剩未到推送时间的限频深度
+            self.__schedule_ready_depth()
+            return
+        for event in events:
+            try:
+                self.process_event(event)
             except Exception as e:
                 msg = f"{self.engine_name} 事件处理异常: {e}"
                 self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+        if not self.__queue_event.empty() and not self._async_wakeup_pending:
+            self._async_wakeup_pending = True
+            self.loop.call_soon(self.__process_events_async)
+
+    def __schedule_ready_depth(self):
+        '''
+            限频深度到期时唤醒 loop 已安排更早的唤醒时不重复安排
+        '''
+        ready_in = self.__queue_event.ready_in()
+        if ready_in is None:
+            return
+        when = self.loop.time() + ready_in
+        timer = self._async_timer
+        if timer is not None and not timer.cancelled() and timer.when() <= when and timer.when() > self.loop.time():
+            return
+        if timer is not None:
+            timer.cancel()
+        self._async_timer = self.loop.call_at(when, self.__process_events_async)
+
+    def spawn_callback(self, coro, strategy_name: str, callback_name: str) -> asyncio.Task or None:
+        '''
+            运行策略异步回调返回的协程 非 asyncio 模式下无法运行 记录错误日志
+            return: 创建的 task 未运行返回 None
+        '''
+        if not asyncio.iscoroutine(coro):
+            return None
+        if self.loop is None:
+            coro.close()
+            msg = f"{strategy_name} {callback_name} 为异步回调 需使用 start_async 启动引擎"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+            return None
+        task = self.loop.create_task(coro)
+        self._async_tasks.add(task)
+        task.add_done_callback(lambda task: self.__on_callback_done(task, strategy_name, callback_name))
+        return task
+
+    def __on_callback_done(self, task: asyncio.Task, strategy_name: str, callback_name: str):
+        self._async_tasks.discard(task)
+        if task.cancelled():
+            return
+        e = task.exception()
+        if e is not None:
+            error_msg = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+            msg = f"{callback_name} 异常: {e} strategy:{strategy_name} 报错信息:\n{error_msg}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
+
+    def stop(self):
+        '''
+            停止事件处理循环 start 与 start_async 均适用 可在任意线程调用
+            asyncio 模式下会等待运行中的异步回调结束
+        '''
+        self.is_event_processing = False
+        for pool in self.io_pools.values():
+            pool.shutdown(wait=False)
+        loop = self.loop
+        if loop is not None and self._async_stop_event is not None:
+            loop.call_soon_threadsafe(self._async_stop_event.set)
+
+    def process_event(self, event: Event):
+        '''
+            处理单个事件 调用事件处理函数分发至策略
+        '''
+        handler = self.event_handlers.get(event.event_type)
+        if handler is not None:
+            start_ns = time.perf_counter_ns()
+            self.current_event = (event, start_ns) # 供 watchdog 读取 单次赋值 其他线程读取时不会不一致
+            try:
+                handler(event.exchange, event.gateway_name, event.symbol, event.data)
+            finally:
+                self.current_event = None
+            if self.latency_recorder.enabled:
+                end_ns = time.perf_counter_ns()
+                self.latency_recorder.record(
+                    event.event_type, event.gateway_name, event.symbol,
+                    start_ns - event.put_ns if event.put_ns else -1, end_ns - start_ns
+                )
+            # --- 如果是 trade 事件则自动打印 log
+            if event.event_type in [EventType.TRADE]:
+                self.write_log(msg="%s Event Done; Data: %s", level=LogLevel.INFO.value, source=self.engine_name, args=(event.event_type, event.data))
+            # --- 如果是 bar 事件更新 self.newest_processed_bar_opening_ts
+            if event.event_type == EventType.BAR:
+                self.newest_processed_bar_opening_ts = event.data.open_ts
+        else:
+            msg = f"事件处理函数不存在: {event.event_type}"
+            self.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.engine_name)
     
     def put_event(self, event_type: EventType, exchange: Exchange, gateway_name: str, symbol: str, data: Any):
         '''
@@ -335,11 +1319,20 @@ class MainEngine:
             exchange=exchange,
             gateway_name=gateway_name,
             symbol=symbol,
-            data=data
-
+            data=data,
+            put_ns=time.perf_counter_ns()
         )
 
         self.__queue_event.put(event)
+        if self.journal is not None:
+            self.journal.record(event)
+        # asyncio 模式: 通知 loop 处理事件 已安排且尚未执行时不重复通知
+        if self.loop is not None and not self._async_wakeup_pending:
+            self._async_wakeup_pending = True
+            try:
+                self.loop.call_soon_threadsafe(self.__process_events_async)
+            except RuntimeError: # loop 已关闭
+                pass
 
     def _check_symbol_name(self, symbol: str) -> bool:
         '''
@@ -365,11 +1358,54 @@ class MainEngine:
         else:
             return False
 
-    def get_queue_event(self) -> Queue:
+    def get_queue_event(self) -> Union[PriorityEventQueue, RingEventQueue]:
         '''
             获取事件队列
         '''
         return self.__queue_event
 
+    def get_queue_metrics(self) -> Dict[str, dict]:
+        '''
+            获取事件队列各通道的排队耗时统计
+            return: {lane_name: {'count', 'avg_wait_ms', 'max_wait_ms', 'qsize'}}
+        '''
+        return self.__queue_event.get_metrics()
+
+    def get_queue_backlog(self) -> Dict[str, int]:
+        '''
+            获取各事件类型的积压数量 {event_type.value: count} RingEventQueue 中尚未取出的事件计入 'ring'
+        '''
+        return self.__queue_event.get_backlog()
+
+    def get_latency_stats(self) -> Dict[Tuple[EventType, str, str], Dict[str, dict]]:
+        '''
+            获取事件耗时统计 单位微秒
+            return: {(event_type, gateway_name, symbol): {
+                'queue_wait': {'count', 'mean_us', 'min_us', 'p50_us', 'p99_us', 'p999_us', 'max_us'}, # put_event -> 开始处理
+                'handler': {...}, # 事件处理(策略回调)耗时
+            }}
+        '''
+        return self.latency_recorder.get_stats()
+
+    def get_total_latency_stats(self) -> Dict[EventType, Dict[str, float]]:
+        '''
+            获取按事件类型汇总的端到端耗时 put_event -> 处理结束 单位微秒
+            return: {event_type: {'count', 'mean_us', 'min_us', 'p50_us', 'p99_us', 'p999_us', 'max_us'}}
+        '''
+        return self.latency_recorder.get_total_stats()
+
+    def reset_latency_stats(self):
+        '''
+            清空事件耗时统计
+        '''
+        self.latency_recorder.reset()
+
+    def get_depth_coalesced_count(self) -> Dict[Tuple[str, str], int]:
+        '''
+            获取开启深度合并的合约被合并(丢弃)的深度数量
+            return: {(gateway_name, symbol): count}
+        '''
+        return self.__queue_event.get_coalesced_count()
+
 if __name__ == '__main__':
     pass
\ No newline at end of file
@@ -0,0 +1,575 @@
+'''
+    MainEngine 事件队列
+
+    事件按 EventType 分配至不同的优先级通道(lane):
+        ORDER / TRADE / TASK > TIMER > BAR > DEPTH > 其它(BACKTESTEND 等)
+    取事件时总是先取优先级最高且非空的通道; 同一通道内先进先出, 因此同一合约的事件在通道内保持顺序
+    ORDER 与 TRADE 共用一个通道 保证同一订单的订单回报与成交回报不会乱序
+
+    深度合并(conflation):
+        开启合并的 (gateway_name, symbol) 深度事件不进入 DEPTH 通道 而是放入邮箱 每个合约仅保留最新一条未处理的深度
+        新深度会替换尚未处理的旧深度(保留其排队位置) 并计入被合并数量; 可选最大推送频率(Hz) 未到推送时间的深度继续留在邮箱中被合并
+        推送时间默认按 time.monotonic() 计算 回放时通过 set_clock 改为日志时间 保证结果可复现
+
+    队列实现:
+        PriorityEventQueue: 单锁 + 条件变量 每次 put/get 都需加锁 任意线程均可消费
+        RingEventQueue: 每个生产线程(gateway 线程)独占一个单生产者环形缓冲 消费线程批量取出后放入自己的优先级通道
+            put 不加锁 仅在消费线程休眠时唤醒; 支持 block / spin_block / busy_poll 三种等待策略
+'''
+import threading
+import time
+import weakref
+from collections import deque
+from queue import Empty
+from typing import Callable, Deque, Dict, List, Tuple
+
+from .constant import EventType
+from .object import Event
+
+# 通道名称 下标即优先级 数值越小越优先
+LANE_NAMES: List[str] = ["ORDER_TRADE", "TIMER", "BAR", "DEPTH", "OTHER"]
+
+# 事件类型 -> 通道下标
+EVENT_LANE_MAP: Dict[EventType, int] = {
+    EventType.ORDER: 0,
+    EventType.TRADE: 0,
+    EventType.TASK: 0,
+    EventType.TIMER: 1,
+    EventType.BAR: 2,
+    EventType.DEPTH: 3,
+}
+OTHER_LANE: int = len(LANE_NAMES) - 1
+
+
+class LaneMetrics:
+    '''
+        单个通道的排队耗时统计 单位纳秒
+    '''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count: int = 0 # 出队事件数量
+        self.total_wait_ns: int = 0 # 累计排队时间
+        self.max_wait_ns: int = 0 # 最大排队时间
+
+    def record(self, wait_ns: int):
+        self.count += 1
+        self.total_wait_ns += wait_ns
+        if wait_ns > self.max_wait_ns:
+            self.max_wait_ns = wait_ns
+
+    def reset(self):
+        self.count = 0
+        self.total_wait_ns = 0
+        self.max_wait_ns = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'avg_wait_ms': self.total_wait_ns / self.count / 1e6 if self.count else 0,
+            'max_wait_ms': self.max_wait_ns / 1e6,
+        }
+
+
+class EventLanes:
+    '''
+        优先级通道 非线程安全 由调用方负责加锁
+    '''
+
+    def __init__(self):
+        self.lanes: List[Deque[Event]] = [deque() for _ in LANE_NAMES]
+        self.metrics: List[LaneMetrics] = [LaneMetrics(name) for name in LANE_NAMES]
+        self.size: int = 0 # 包含邮箱中的深度
+        self.type_size: Dict[EventType, int] = {event_type: 0 for event_type in EventType} # 各事件类型积压数量 键固定 其他线程可直接复制读取
+
+        # === 深度合并 ===
+        self.conflation: Dict[Tuple[str, str], float] = {} # 开启合并的合约 (gateway_name, symbol): 最小推送间隔(秒) 0为不限频
+        self.depth_mailbox: Dict[Tuple[str, str], Event] = {} # 未处理的最新深度 按首次入箱顺序排列
+        self.depth_next_ts: Dict[Tuple[str, str], float] = {} # 下一次允许推送的时间 clock()
+        self.clock: Callable[[], float] = time.monotonic # 限频使用的时钟 秒
+        self.coalesced_count: Dict[Tuple[str, str], int] = {} # 被合并(丢弃)的深度数量
+
+    def set_conflation(self, gateway_name: str, symbol: str, max_rate: float = 0):
+        '''
+            开启合约深度合并
+            Params:
+                max_rate: 每秒最多推送次数 0为不限频
+        '''
+        key = (gateway_name, symbol)
+        self.conflation[key] = 1 / max_rate if max_rate > 0 else 0
+        self.coalesced_count.setdefault(key, 0)
+
+    def set_clock(self, clock: Callable[[], float]):
+        '''
+            设置限频使用的时钟 返回秒 回放时传入日志时间
+        '''
+        self.clock = clock
+        self.depth_next_ts.clear()
+
+    def clear_conflation(self):
+        '''
+            关闭所有合约的深度合并 邮箱中的深度移回 DEPTH 通道
+        '''
+        for event in self.depth_mailbox.values():
+            self.lanes[EVENT_LANE_MAP[EventType.DEPTH]].append(event)
+        self.depth_mailbox.clear()
+        self.conflation.clear()
+
+    def push(self, event: Event):
+        if event.event_type == EventType.DEPTH and self.conflation:
+            key = (event.gateway_name, event.symbol)
+            if key in self.conflation:
+                if key in self.depth_mailbox:
+                    self.coalesced_count[key] += 1 # 替换未处理的旧深度 size 不变
+                else:
+                    self.size += 1
+                    self.type_size[EventType.DEPTH] += 1
+                self.depth_mailbox[key] = event
+                return
+        self.lanes[EVENT_LANE_MAP.get(event.event_type, OTHER_LANE)].append(event)
+        self.size += 1
+        self.type_size[event.event_type] += 1
+
+    def pop(self) -> Event or None:
+        '''
+            取出优先级最高的事件 无可处理事件返回 None
+            邮箱中有深度但均未到推送时间时同样返回 None 可通过 ready_in() 获取需要等待的时间
+        '''
+        depth_index = EVENT_LANE_MAP[EventType.DEPTH]
+        for index, lane in enumerate(self.lanes):
+            if index == depth_index and self.depth_mailbox:
+                event = self._pop_mailbox(lane[0].put_ns if lane else None)
+                if event is not None:
+                    self.size -= 1
+                    self.type_size[EventType.DEPTH] -= 1
+                    if event.put_ns:
+                        self.metrics[index].record(time.perf_counter_ns() - event.put_ns)
+                    return event
+            if lane:
+                event = lane.popleft()
+                self.size -= 1
+                self.type_size[event.event_type] -= 1
+                if event.put_ns:
+                    self.metrics[index].record(time.perf_counter_ns() - event.put_ns)
+                return event
+        return None
+
+    def _pop_mailbox(self, lane_head_put_ns: int or None) -> Event or None:
+        '''
+            取出邮箱中第一个已到推送时间的深度
+            若 DEPTH 通道中有更早入队的未合并深度 优先处理通道中的深度
+        '''
+        now = self.clock()
+        for key, event in self.depth_mailbox.items():
+            if self.depth_next_ts.get(key, 0) <= now:
+                if lane_head_put_ns is not None and lane_head_put_ns < event.put_ns:
+                    return None
+                del self.depth_mailbox[key]
+                interval = self.conflation.get(key, 0)
+                if interval:
+                    self.depth_next_ts[key] = now + interval
+                return event
+        return None
+
+    def ready_in(self) -> float or None:
+        '''
+            邮箱中最早可推送的深度还需等待的秒数 邮箱为空返回 None
+        '''
+        if not self.depth_mailbox:
+            return None
+        now = self.clock()
+        return max(min(self.depth_next_ts.get(key, 0) for key in self.depth_mailbox) - now, 0)
+
+    def get_coalesced_count(self) -> Dict[Tuple[str, str], int]:
+        '''
+            各合约被合并的深度数量 {(gateway_name, symbol): count}
+        '''
+        return dict(self.coalesced_count)
+
+    def get_backlog(self) -> Dict[str, int]:
+        '''
+            各事件类型积压数量 {event_type.value: count}
+        '''
+        return {event_type.value: count for event_type, count in self.type_size.copy().items()}
+
+    def get_metrics(self) -> Dict[str, dict]:
+        '''
+            各通道的排队统计与当前积压数量
+        '''
+        metrics = {}
+        for index, name in enumerate(LANE_NAMES):
+            metrics[name] = self.metrics[index].to_dict()
+            metrics[name]['qsize'] = len(self.lanes[index])
+        metrics[LANE_NAMES[EVENT_LANE_MAP[EventType.DEPTH]]]['qsize'] += len(self.depth_mailbox)
+        return metrics
+
+    def reset_metrics(self):
+        for metric in self.metrics:
+            metric.reset()
+
+
+class PriorityEventQueue:
+    '''
+        带优先级通道的阻塞事件队列 接口与 queue.Queue 保持一致: put get qsize empty
+    '''
+
+    def __init__(self):
+        self._lanes = EventLanes()
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+
+    def put(self, event: Event, block: bool = True, timeout: float = None):
+        '''
+            事件入队 队列无上限 block timeout 仅为兼容 queue.Queue
+        '''
+        with self._not_empty:
+            self._lanes.push(event)
+            self._not_empty.notify()
+
+    def get(self, block: bool = True, timeout: float = None) -> Event:
+        '''
+            取出优先级最高的事件 无可处理事件时:
+                block=False 立即抛出 queue.Empty
+                block=True timeout=None 一直等待
+                block=True timeout>0 最多等待 timeout 秒 超时抛出 queue.Empty
+        '''
+        with self._not_empty:
+            endtime = time.monotonic() + timeout if (block and timeout is not None) else None
+            while True:
+                event = self._lanes.pop()
+                if event is not None:
+                    return event
+                if not block:
+                    raise Empty
+                wait_s = self._lanes.ready_in() # 邮箱中限频的深度
+                if endtime is not None:
+                    remaining = endtime - time.monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    wait_s = remaining if wait_s is None else min(wait_s, remaining)
+                self._not_empty.wait(wait_s)
+
+    def set_conflation(self, gateway_name: str, symbol: str, max_rate: float = 0):
+        '''
+            开启合约深度合并 max_rate: 每秒最多推送次数 0为不限频
+        '''
+        with self._mutex:
+            self._lanes.set_conflation(gateway_name, symbol, max_rate)
+
+    def set_clock(self, clock: Callable[[], float]):
+        '''
+            设置深度限频使用的时钟 返回秒 默认 time.monotonic
+        '''
+        with self._mutex:
+            self._lanes.set_clock(clock)
+
+    def clear_conflation(self):
+        with self._not_empty:
+            self._lanes.clear_conflation()
+            self._not_empty.notify()
+
+    def get_coalesced_count(self) -> Dict[Tuple[str, str], int]:
+        '''
+            各合约被合并的深度数量 {(gateway_name, symbol): count}
+        '''
+        with self._mutex:
+            return self._lanes.get_coalesced_count()
+
+    def ready_in(self) -> float or None:
+        '''
+            限频深度最早可取出还需等待的秒数 无限频深度返回 None
+        '''
+        with self._mutex:
+            return self._lanes.ready_in()
+
+    def get_batch(self, max_size: int = 64, block: bool = True, timeout: float = None) -> List[Event]:
+        '''
+            按优先级取出最多 max_size 个事件 等待规则同 get
+        '''
+        events = [self.get(block=block, timeout=timeout)]
+        with self._mutex:
+            while len(events) < max_size:
+                event = self._lanes.pop()
+                if event is None:
+                    break
+                events.append(event)
+        return events
+
+    def qsize(self) -> int:
+        return self._lanes.size
+
+    def empty(self) -> bool:
+        return not self._lanes.size
+
+    def get_backlog(self) -> Dict[str, int]:
+        '''
+            各事件类型积压数量 {event_type.value: count}
+        '''
+        with self._mutex:
+            return self._lanes.get_backlog()
+
+    def get_metrics(self) -> Dict[str, dict]:
+        '''
+            各通道排队耗时统计 {lane_name: {'count', 'avg_wait_ms', 'max_wait_ms', 'qsize'}}
+        '''
+        with self._mutex:
+            return self._lanes.get_metrics()
+
+    def reset_metrics(self):
+        with self._mutex:
+            self._lanes.reset_metrics()
+
+
+class SpscRing:
+    '''
+        单生产者单消费者环形缓冲
+        生产者只修改 tail 消费者只修改 head; 依赖 GIL 保证单次引用赋值的原子性 因此无需加锁
+    '''
+
+    def __init__(self, capacity: int = 65536, owner: threading.Thread = None):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError(f"capacity 必须为2的幂: {capacity}")
+        self.owner = weakref.ref(owner) if owner is not None else None # 生产线程 线程结束且缓冲为空后回收
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.buffer: List[Event] = [None] * capacity
+        self.head: int = 0 # 下一个读取位置 仅消费者修改
+        self.tail: int = 0 # 下一个写入位置 仅生产者修改
+
+    def push(self, item: Event) -> bool:
+        '''
+            写入 缓冲已满返回 False
+        '''
+        tail = self.tail
+        if tail - self.head >= self.capacity:
+            return False
+        self.buffer[tail & self.mask] = item
+        self.tail = tail + 1 # 先写数据再移动 tail 消费者看到 tail 时数据已就绪
+        return True
+
+    def drain(self, push: Callable[[Event], None]) -> int:
+        '''
+            取出当前所有数据并逐个交给 push 返回取出数量
+        '''
+        head = self.head
+        tail = self.tail
+        if head == tail:
+            return 0
+        buffer = self.buffer
+        mask = self.mask
+        for index in range(head, tail):
+            index &= mask
+            push(buffer[index])
+            buffer[index] = None
+        self.head = tail
+        return tail - head
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    def is_orphaned(self) -> bool:
+        '''
+            生产线程已结束且缓冲为空 线程结束后不会再写入 可以安全回收
+        '''
+        if self.owner is None:
+            return False
+        owner = self.owner()
+        return (owner is None or not owner.is_alive()) and self.head == self.tail
+
+
+class RingEventQueue:
+    '''
+        低延迟事件队列 接口与 PriorityEventQueue 保持一致: put get get_batch qsize empty
+
+        1. 每个生产线程首次 put 时分配一个 SpscRing put 过程不加锁
+        2. 仅有一个消费线程(默认为创建队列的线程 可通过 bind_consumer 更换); 消费线程自身 put 的事件直接进入优先级通道
+        3. 消费线程 get 时一次性取出所有环形缓冲中的事件放入优先级通道 再按优先级返回
+        4. 等待策略 wait_strategy:
+            block: 无事件时立即休眠 等待生产者唤醒 CPU 占用最低
+            spin_block: 先自旋 spin_us 微秒 仍无事件再休眠 兼顾延迟与 CPU
+            busy_poll: 一直自旋(每轮让出 GIL) 延迟最低 占满一个核
+        5. 环形缓冲写满时生产者自旋等待消费者取走(背压) 不会丢弃事件
+        6. 生产线程结束后 其环形缓冲在取空后回收(新生产者注册时 与消费线程等待新事件前) 短生命周期线程不会使缓冲数量持续增长
+
+        note: 深度合并配置(set_conflation / clear_conflation)应在消费线程中或事件循环启动前调用
+    '''
+
+    WAIT_STRATEGIES = ('block', 'spin_block', 'busy_poll')
+
+    def __init__(self, wait_strategy: str = 'spin_block', capacity: int = 65536, spin_us: float = 50):
+        if wait_strategy not in self.WAIT_STRATEGIES:
+            raise ValueError(f"wait_strategy 仅支持 {self.WAIT_STRATEGIES}: {wait_strategy}")
+        self.wait_strategy = wait_strategy
+        self.capacity = capacity
+        self.spin_ns = int(spin_us * 1000)
+
+        self._lanes = EventLanes() # 仅消费线程访问
+        self._rings: Tuple[SpscRing, ...] = () # 所有生产者的环形缓冲 新增时整体替换 消费者无需加锁遍历
+        self._register_lock = threading.Lock()
+        self._local = threading.local()
+        self._consumer_ident: int = threading.get_ident()
+
+        self._sleeping: bool = False # 消费线程是否处于休眠等待
+        self._wakeup = threading.Event()
+
+    def bind_consumer(self):
+        '''
+            将当前线程设置为消费线程
+        '''
+        self._consumer_ident = threading.get_ident()
+
+    def _get_ring(self) -> SpscRing:
+        ring = SpscRing(self.capacity, owner=threading.current_thread())
+        with self._register_lock:
+            self._rings = tuple(r for r in self._rings if not r.is_orphaned()) + (ring,)
+        self._local.ring = ring
+        return ring
+
+    def _reap_rings(self):
+        '''
+            回收生产线程已结束且已取空的环形缓冲
+        '''
+        if not any(ring.is_orphaned() for ring in self._rings):
+            return
+        with self._register_lock:
+            self._rings = tuple(ring for ring in self._rings if not ring.is_orphaned())
+
+    def put(self, event: Event, block: bool = True, timeout: float = None):
+        '''
+            事件入队 block timeout 仅为兼容 queue.Queue
+        '''
+        if threading.get_ident() == self._consumer_ident:
+            self._lanes.push(event)
+            return
+        ring = getattr(self._local, 'ring', None)
+        if ring is None:
+            ring = self._get_ring()
+        while not ring.push(event):
+            # 缓冲已满 唤醒消费者并让出 GIL
+            self._wakeup.set()
+            time.sleep(0)
+        if self._sleeping:
+            self._wakeup.set()
+
+    def _drain(self) -> int:
+        count = 0
+        push = self._lanes.push
+        for ring in self._rings:
+            if ring.head != ring.tail:
+                count += ring.drain(push)
+        return count
+
+    def _wait(self, endtime: float = None):
+        '''
+            等待新事件 按等待策略自旋或休眠 返回时不保证有事件
+        '''
+        self._reap_rings() # 无事件时回收已结束生产线程的缓冲
+        ready_in = self._lanes.ready_in() # 邮箱中限频的深度
+        if endtime is not None:
+            remaining = endtime - time.monotonic()
+            if remaining <= 0:
+                raise Empty
+            ready_in = remaining if ready_in is None else min(ready_in, remaining)
+
+        if self.wait_strategy != 'block':
+            spin_end = time.perf_counter_ns() + (self.spin_ns if self.wait_strategy == 'spin_block' else int((ready_in if ready_in is not None else 0.001) * 1e9))
+            while time.perf_counter_ns() < spin_end:
+                if self._drain():
+                    return
+                time.sleep(0) # 让出 GIL 以便生产线程写入
+            if self.wait_strategy == 'busy_poll':
+                return
+
+        self._wakeup.clear()
+        self._sleeping = True
+        try:
+            if self._drain(): # 设置休眠标记后再检查一次 避免丢失唤醒
+                return
+            self._wakeup.wait(ready_in)
+        finally:
+            self._sleeping = False
+
+    def get(self, block: bool = True, timeout: float = None) -> Event:
+        '''
+            取出优先级最高的事件 仅消费线程可调用 无可处理事件时:
+                block=False 立即抛出 queue.Empty
+                block=True timeout=None 一直等待
+                block=True timeout>0 最多等待 timeout 秒 超时抛出 queue.Empty
+        '''
+        self._drain()
+        endtime = time.monotonic() + timeout if (block and timeout is not None) else None
+        while True:
+            event = self._lanes.pop()
+            if event is not None:
+                return event
+            if not block:
+                raise Empty
+            self._wait(endtime)
+            self._drain()
+
+    def get_batch(self, max_size: int = 64, block: bool = True, timeout: float = None) -> List[Event]:
+        '''
+            按优先级取出最多 max_size 个事件 等待规则同 get
+        '''
+        events = [self.get(block=block, timeout=timeout)]
+        pop = self._lanes.pop
+        while len(events) < max_size:
+            event = pop()
+            if event is None:
+                break
+            events.append(event)
+        return events
+
+    def set_conflation(self, gateway_name: str, symbol: str, max_rate: float = 0):
+        '''
+            开启合约深度合并 max_rate: 每秒最多推送次数 0为不限频
+        '''
+        self._lanes.set_conflation(gateway_name, symbol, max_rate)
+
+    def set_clock(self, clock: Callable[[], float]):
+        '''
+            设置深度限频使用的时钟 返回秒 默认 time.monotonic
+        '''
+        self._lanes.set_clock(clock)
+
+    def clear_conflation(self):
+        self._lanes.clear_conflation()
+
+    def get_coalesced_count(self) -> Dict[Tuple[str, str], int]:
+        '''
+            各合约被合并的深度数量 {(gateway_name, symbol): count}
+        '''
+        return self._lanes.get_coalesced_count()
+
+    def ready_in(self) -> float or None:
+        '''
+            限频深度最早可取出还需等待的秒数 无限频深度返回 None 仅消费线程可调用
+        '''
+        return self._lanes.ready_in()
+
+    def qsize(self) -> int:
+        return self._lanes.size + sum(len(ring) for ring in self._rings)
+
+    def empty(self) -> bool:
+        return not self.qsize()
+
+    def get_backlog(self) -> Dict[str, int]:
+        '''
+            各事件类型积压数量 {event_type.value: count} 可在任意线程调用
+            环形缓冲中尚未取出的事件尚未区分类型 计入 'ring'
+        '''
+        backlog = self._lanes.get_backlog()
+        backlog['ring'] = sum(len(ring) for ring in self._rings)
+        return backlog
+
+    def get_metrics(self) -> Dict[str, dict]:
+        '''
+            各通道排队耗时统计 {lane_name: {'count', 'avg_wait_ms', 'max_wait_ms', 'qsize'}}
+            环形缓冲中尚未取出的事件计入 'RING' 的 qsize
+        '''
+        metrics = self._lanes.get_metrics()
+        metrics['RING'] = {'qsize': sum(len(ring) for ring in self._rings)}
+        return metrics
+
+    def reset_metrics(self):
+        self._lanes.reset_metrics()
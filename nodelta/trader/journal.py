@@ -0,0 +1,168 @@
+'''
+    事件日志 记录 MainEngine.put_event 的所有外部事件 用于回放复现与基准测试
+
+    文件格式:
+        文件头 4字节 b'NDJ1'
+        每条记录 = 头部 struct '<IQ' (数据长度, 入队时间 time.time_ns()) + pickle 数据 (event_type, exchange, gateway_name, symbol, data)
+        进程异常退出时最后一条记录可能不完整 读取时丢弃
+
+    JournalRecorder: 调用线程只将 (时间, Event) 放入队列 序列化与写文件在后台线程中完成 文件超过 max_bytes 后滚动
+    read_journal: 按文件名顺序读取目录中的日志文件 返回 (入队时间ns, Event)
+
+    note: 与延迟格式化日志相同 data 在后台线程中才序列化 入队后被修改的对象记录的是修改后的内容
+          TIMER 与 TASK 为引擎内部事件 不记录 回放时由引擎按日志时间重新生成
+'''
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+import traceback
+from datetime import datetime
+from queue import SimpleQueue
+from typing import Iterator, List, Tuple
+
+from .constant import EventType, Exchange
+from .object import Event
+
+JOURNAL_MAGIC = b'NDJ1'
+JOURNAL_SUFFIX = '.ndj'
+RECORD_HEADER = struct.Struct('<IQ')
+SKIP_EVENT_TYPES = (EventType.TIMER, EventType.TASK)
+
+
+class JournalRecorder:
+    '''
+        事件日志写入 record 线程安全 不阻塞调用方
+    '''
+
+    def __init__(self, dir_path: str, prefix: str = 'journal', max_bytes: int = 256 * 1024 * 1024, max_pending: int = 1000000, flush_interval: float = 0.2):
+        '''
+            Params:
+                dir_path: 日志目录 不存在时创建
+                prefix: 文件名前缀 文件名为 {prefix}_{启动时间}_{序号}.ndj
+                max_bytes: 单个文件最大字节数 超过后滚动
+                max_pending: 待写入事件上限 超出时丢弃新事件并计数
+                flush_interval: 写入缓冲刷新到磁盘的间隔 秒
+        '''
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        self.dir_path = dir_path
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+
+        self.queue = SimpleQueue()
+        self.file = None
+        self.file_bytes: int = 0
+        self.file_index: int = 0
+        self.file_paths: List[str] = []
+        self.start_time = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        self.recorded_count: int = 0
+        self.dropped_count: int = 0
+        self.active: bool = True
+        self.thread = threading.Thread(target=self.run, name='nd_journal', daemon=True)
+        self.thread.start()
+
+    def record(self, event: Event):
+        if event.event_type in SKIP_EVENT_TYPES:
+            return
+        if self.queue.qsize() >= self.max_pending:
+            self.dropped_count += 1
+            return
+        self.queue.put((time.time_ns(), event))
+
+    def close(self, timeout: float = 5):
+        '''
+            写完队列中的事件后关闭文件
+        '''
+        if not self.active:
+            return
+        self.active = False
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def get_stats(self) -> dict:
+        return {
+            'recorded': self.recorded_count,
+            'dropped': self.dropped_count,
+            'pending': self.queue.qsize(),
+            'files': list(self.file_paths),
+        }
+
+    def _open_file(self):
+        if self.file is not None:
+            self.file.close()
+        self.file_index += 1
+        path = os.path.join(self.dir_path, f"{self.prefix}_{self.start_time}_{self.file_index:04d}{JOURNAL_SUFFIX}")
+        self.file = open(path, 'wb', buffering=1024 * 1024)
+        self.file.write(JOURNAL_MAGIC)
+        self.file_bytes = len(JOURNAL_MAGIC)
+        self.file_paths.append(path)
+
+    def _write(self, ts_ns: int, event: Event):
+        exchange = event.exchange.value if isinstance(event.exchange, Exchange) else event.exchange
+        payload = pickle.dumps((event.event_type.value, exchange, event.gateway_name, event.symbol, event.data), protocol=pickle.HIGHEST_PROTOCOL)
+        if self.file is None or self.file_bytes + RECORD_HEADER.size + len(payload) > self.max_bytes:
+            self._open_file()
+        self.file.write(RECORD_HEADER.pack(len(payload), ts_ns))
+        self.file.write(payload)
+        self.file_bytes += RECORD_HEADER.size + len(payload)
+        self.recorded_count += 1
+
+    def run(self):
+        last_flush = time.monotonic()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+                if self.queue.empty() or time.monotonic() - last_flush > self.flush_interval:
+                    self.file.flush()
+                    last_flush = time.monotonic()
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                print(f"事件日志写入异常: {e} 报错信息:\n{error_msg}")
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def list_journal_files(path: str) -> List[str]:
+    '''
+        path 为文件时返回该文件 为目录时返回目录中的日志文件 按文件名排序
+    '''
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(os.path.join(path, f"*{JOURNAL_SUFFIX}")))
+
+
+def read_journal(path: str) -> Iterator[Tuple[int, Event]]:
+    '''
+        读取日志 返回 (入队时间ns, Event) 不完整的末尾记录丢弃
+    '''
+    header_size = RECORD_HEADER.size
+    for file_path in list_journal_files(path):
+        with open(file_path, 'rb') as f:
+            if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+                raise ValueError(f"不是事件日志文件: {file_path}")
+            while True:
+                header = f.read(header_size)
+                if len(header) < header_size:
+                    break
+                size, ts_ns = RECORD_HEADER.unpack(header)
+                payload = f.read(size)
+                if len(payload) < size:
+                    break
+                event_type, exchange, gateway_name, symbol, data = pickle.loads(payload)
+                yield ts_ns, Event(
+                    event_type=EventType(event_type),
+                    exchange=Exchange(exchange) if exchange is not None else None,
+                    gateway_name=gateway_name,
+                    symbol=symbol,
+                    data=data,
+                )
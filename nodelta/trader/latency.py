@@ -0,0 +1,188 @@
+'''
+    事件处理耗时统计
+
+    LatencyHistogram: HDR 风格对数-线性直方图 单位纳秒
+        小于 2^sub_bucket_bits 的值精确计数; 更大的值每个2的幂区间再等分为 2^(sub_bucket_bits-1) 个子桶
+        相对误差不超过 1/2^(sub_bucket_bits-1) 记录一次仅需一次位运算与一次列表自增
+    LatencyRecorder: 按 (event_type, gateway_name, symbol) 统计 排队耗时(put_event -> 开始处理) 与 处理耗时(回调执行时间)
+        另按 event_type 统计端到端耗时(put_event -> 处理结束)
+'''
+from typing import Dict, List, Tuple
+
+from .constant import EventType
+
+
+class LatencyHistogram:
+    '''
+        对数-线性直方图 非线程安全 仅由事件处理线程写入; 读取时复制计数列表
+    '''
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.counts: List[int] = [] # 按需扩展
+        self.count: int = 0
+        self.total: int = 0
+        self.min: int = 0
+        self.max: int = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_count + (value >> shift) - self.half_count
+
+    def _bucket_range(self, index: int) -> Tuple[int, int]:
+        '''
+            子桶对应的数值区间 [low, high)
+        '''
+        if index < self.sub_bucket_count:
+            return index, index + 1
+        offset = index - self.sub_bucket_count
+        shift = offset // self.half_count + 1
+        low = (offset % self.half_count + self.half_count) << shift
+        return low, low + (1 << shift)
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        index = self._index(value)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float, counts: List[int] = None) -> int:
+        '''
+            分位数 q 取值 0~1 返回所在子桶的中间值
+        '''
+        counts = list(self.counts) if counts is None else counts
+        total = sum(counts)
+        if not total:
+            return 0
+        target = max(int(total * q + 0.5), 1)
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= target:
+                low, high = self._bucket_range(index)
+                return min((low + high - 1) >> 1, self.max)
+        return self.max
+
+    def merge(self, other: 'LatencyHistogram'):
+        '''
+            累加另一个相同 sub_bucket_bits 的直方图
+        '''
+        if not other.count:
+            return
+        counts = list(other.counts)
+        if len(counts) > len(self.counts):
+            self.counts.extend([0] * (len(counts) - len(self.counts)))
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        if not self.count or other.min < self.min:
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        self.count += other.count
+        self.total += other.total
+
+    def reset(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def get_summary(self) -> Dict[str, float]:
+        '''
+            统计摘要 单位微秒
+        '''
+        counts = list(self.counts)
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count / 1e3 if self.count else 0,
+            'min_us': self.min / 1e3,
+            'p50_us': self.percentile(0.5, counts) / 1e3,
+            'p99_us': self.percentile(0.99, counts) / 1e3,
+            'p999_us': self.percentile(0.999, counts) / 1e3,
+            'max_us': self.max / 1e3,
+        }
+
+
+class LatencyRecorder:
+    '''
+        按 (event_type, gateway_name, symbol) 记录排队耗时与处理耗时
+    '''
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.enabled: bool = True
+        self.queue_wait: Dict[Tuple[EventType, str, str], LatencyHistogram] = {}
+        self.handler: Dict[Tuple[EventType, str, str], LatencyHistogram] = {}
+        self.total: Dict[EventType, LatencyHistogram] = {} # event_type: 端到端耗时
+
+    def record(self, event_type: EventType, gateway_name: str, symbol: str, wait_ns: int, handler_ns: int):
+        '''
+            Params:
+                wait_ns: 排队耗时 小于0表示事件未打时间戳 不记录
+                handler_ns: 处理耗时
+        '''
+        key = (event_type, gateway_name, symbol)
+        histogram = self.handler.get(key)
+        if histogram is None:
+            histogram = self.handler[key] = LatencyHistogram(self.sub_bucket_bits)
+            self.queue_wait[key] = LatencyHistogram(self.sub_bucket_bits)
+        histogram.record(handler_ns)
+        if wait_ns >= 0:
+            self.queue_wait[key].record(wait_ns)
+            total = self.total.get(event_type)
+            if total is None:
+                total = self.total[event_type] = LatencyHistogram(self.sub_bucket_bits)
+            total.record(wait_ns + handler_ns)
+
+    def get_stats(self) -> Dict[Tuple[EventType, str, str], Dict[str, dict]]:
+        '''
+            return: {(event_type, gateway_name, symbol): {'queue_wait': summary, 'handler': summary}}
+        '''
+        stats = {}
+        for key, histogram in list(self.handler.items()):
+            stats[key] = {
+                'queue_wait': self.queue_wait[key].get_summary(),
+                'handler': histogram.get_summary(),
+            }
+        return stats
+
+    def get_total_stats(self) -> Dict[EventType, Dict[str, float]]:
+        '''
+            return: {event_type: summary} 端到端耗时 put_event -> 处理结束
+        '''
+        return {event_type: histogram.get_summary() for event_type, histogram in list(self.total.items())}
+
+    def reset(self):
+        self.queue_wait = {}
+        self.handler = {}
+        self.total = {}
+
+    def format_report(self) -> str:
+        '''
+            文本报表 每行一个 (event_type, gateway_name, symbol)
+        '''
+        lines = [f"{'event':<8}{'gateway':<16}{'symbol':<24}{'count':>10}"
+                 f"{'wait_p50':>10}{'wait_p99':>10}{'wait_max':>10}"
+                 f"{'hdl_p50':>10}{'hdl_p99':>10}{'hdl_max':>10}  (us)"]
+        for (event_type, gateway_name, symbol), stat in sorted(self.get_stats().items(), key=lambda item: (item[0][0].value, item[0][1], item[0][2])):
+            wait, handler = stat['queue_wait'], stat['handler']
+            lines.append(
+                f"{event_type.value:<8}{gateway_name:<16}{symbol:<24}{handler['count']:>10}"
+                f"{wait['p50_us']:>10.1f}{wait['p99_us']:>10.1f}{wait['max_us']:>10.1f}"
+                f"{handler['p50_us']:>10.1f}{handler['p99_us']:>10.1f}{handler['max_us']:>10.1f}"
+            )
+        return '\n'.join(lines)
@@ -1,6 +1,7 @@
 from enum import Enum
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
 from typing import Any, Dict, List, Tuple
 import logging
 
@@ -8,6 +9,37 @@ from .constant import (
     LogLevel, Direction, Offset, Status, Exchange, Product, GatewayName, EventType, Interval
 )
 
+UTC8 = timezone(timedelta(hours=8)) # 所有 datetime 共用的时区对象
+
+
+def _setstate_slots(self, state):
+    '''
+        pickle 恢复 兼容添加 __slots__ 之前保存的对象(state 为 __dict__) 例如旧的事件日志与快照
+    '''
+    if isinstance(state, tuple): # (__dict__, slots)
+        state = {**(state[0] or {}), **(state[1] or {})}
+    for name, value in state.items():
+        setattr(self, name, value)
+
+
+def add_slots(cls):
+    '''
+        为 dataclass 添加 __slots__ 实例没有 __dict__ 占用内存更少 属性访问更快 (python3.10 起等同于 dataclass(slots=True))
+        note: 不能再给实例添加字段以外的属性
+    '''
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict['__slots__'] = field_names
+    for name in field_names:
+        cls_dict.pop(name, None) # 默认值已保存在 __init__ 中
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+    cls_dict['__setstate__'] = _setstate_slots
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted_cls.__qualname__ = cls.__qualname__
+    return slotted_cls
+
+
 @dataclass
 class ContractData:
     """
@@ -34,7 +66,14 @@ class ContractData:
     delivery_ts: int = 0 # 交割时间戳 永续为-1
     delivery_date: str = "" # 交割日期 230929 永续为 ""
 
-    @property
+    def __setattr__(self, name: str, value: Any):
+        # symbol min_base_trade 等由 cached_property 缓存在 __dict__ 中 修改字段后清除
+        object.__setattr__(self, name, value)
+        cache = self.__dict__
+        for cached_name in CONTRACT_CACHED_PROPERTIES:
+            cache.pop(cached_name, None)
+
+    @cached_property
     def symbol(self):
         if self.product == Product.SPOT:
             return f"{self.base.upper()}-{self.quote.upper()}-SPOT"
@@ -49,14 +88,14 @@ class ContractData:
         else:
             return ""
 
-    @property
+    @cached_property
     def min_base_trade(self):
         '''
             计算最小下单base数
         '''
         return self.size * self.min_qty
 
-    @property
+    @cached_property
     def min_base_trade_precision(self):
         '''
             计算最小下单base数精度
@@ -65,7 +104,10 @@ class ContractData:
             return 0
         else:
             return len(str(self.min_base_trade).split('.')[1])
+
+CONTRACT_CACHED_PROPERTIES = ('symbol', 'min_base_trade', 'min_base_trade_precision')
         
+@add_slots
 @dataclass
 class OrderData:
     """
@@ -85,6 +127,7 @@ class OrderData:
     status: Status = Status.SUBMITTING
     ts : int = 0
 
+@add_slots
 @dataclass
 class TradeData:
     """
@@ -144,6 +187,7 @@ class AccountData:
     positions: Dict[str, PositionData]
 
 
+@add_slots
 @dataclass
 class DepthData:
     """
@@ -173,26 +217,110 @@ class DepthData:
         else:
             return None
 
-@dataclass
 class BarData:
     """
     Candlestick bar data of a certain trading period.
+
+    datetime 未传入时在首次访问时由 open_ts 计算(utc + 8)并缓存 行情推送时无需为每根K线创建 datetime
     """
 
-    symbol: str # nd_symbol
-    exchange: Exchange
-    gateway_name : str
-    datetime: datetime # utc + 8
-    open_ts: int = 0 # 开盘时间戳13位
+    __slots__ = (
+        'symbol', 'exchange', 'gateway_name', '_datetime', 'open_ts', 'interval',
+        'volume', 'turnover', 'open_price', 'high_price', 'low_price', 'close_price',
+    )
+    FIELD_NAMES = (
+        'symbol', 'exchange', 'gateway_name', 'datetime', 'open_ts', 'interval',
+        'volume', 'turnover', 'open_price', 'high_price', 'low_price', 'close_price',
+    )
+
+    def __init__(
+        self,
+        symbol: str, # nd_symbol
+        exchange: Exchange,
+        gateway_name: str,
+        datetime: datetime = None, # utc + 8 为空时由 open_ts 计算
+        open_ts: int = 0, # 开盘时间戳13位
+        interval: Interval = None,
+        volume: float = 0,
+        turnover: float = 0,
+        open_price: float = 0,
+        high_price: float = 0,
+        low_price: float = 0,
+        close_price: float = 0,
+    ):
+        self.symbol = symbol
+        self.exchange = exchange
+        self.gateway_name = gateway_name
+        self._datetime = datetime
+        self.open_ts = open_ts
+        self.interval = interval
+        self.volume = volume
+        self.turnover = turnover
+        self.open_price = open_price
+        self.high_price = high_price
+        self.low_price = low_price
+        self.close_price = close_price
+
+    def __repr__(self) -> str:
+        return f"BarData({', '.join(f'{name}={getattr(self, name)!r}' for name in self.FIELD_NAMES)})"
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELD_NAMES)
+
+    __hash__ = None # 与 dataclass 相同 可变对象不可哈希
+
+    __setstate__ = _setstate_slots
+
+    @property
+    def datetime(self) -> datetime:
+        if self._datetime is None:
+            self._datetime = datetime.fromtimestamp(self.open_ts / 1000, tz=UTC8)
+        return self._datetime
+
+    @datetime.setter
+    def datetime(self, value):
+        self._datetime = value
+
+@dataclass
+class OrderRequest:
+    """
+    批量下单请求 send_orders 使用 kwargs 与 send_order 的额外参数相同 例如 timeInForce ordType
+    """
+
+    symbol: str
+    direction: Direction
+    offset: Offset
+    price: float
+    amount: float
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class CancelRequest:
+    """
+    批量撤单请求 cancel_orders 使用
+    """
+
+    symbol: str
+    orderid: str
+
+@dataclass
+class TimerData:
+    """
+    定时器 由 StrategyTemplate.set_timer 创建 到期后通过 EventType.TIMER 事件推送至所属策略
+    """
 
-    interval: Interval = None
-    volume: float = 0
-    turnover: float = 0
-    open_price: float = 0
-    high_price: float = 0
-    low_price: float = 0
-    close_price: float = 0
+    timer_id: str
+    strategy_name: str
+    interval_ms: int # 定时间隔 毫秒
+    periodic: bool = False # 是否周期触发
+    data: Any = None # 自定义数据 例如订单号
+    deadline_ts: int = 0 # 下次到期时间戳13位
+    fire_count: int = 0 # 已触发次数
+    cancelled: bool = False
 
+@add_slots
 @dataclass
 class Event:
     
@@ -200,4 +328,5 @@ class Event:
     exchange: Exchange
     gateway_name : str
     symbol : str
-    data : Any = None
\ No newline at end of file
+    data : Any = None
+    put_ns : int = 0 # 入队时间 time.perf_counter_ns() 由 MainEngine.put_event 写入
\ No newline at end of file
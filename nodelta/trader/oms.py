@@ -0,0 +1,364 @@
+'''
+    本地订单管理 OMS
+
+    OrderManager 由 MainEngine 在事件处理线程中更新:
+        1. send_order 成功后记录 SUBMITTING 订单 I/O 线程池中的下单 改单结果通过 TASK 事件写入
+        2. ORDER 事件更新订单状态 TRADE 事件累计成交量
+        3. 定期 REST 对账结果通过 TASK 事件在事件处理线程中修正
+    策略通过 get_order / get_active_orders / get_outstanding_notional 读取 无网络请求
+
+    PositionManager 本地持仓与资产:
+        1. 首次读取或对账时以 REST query_account 结果为准
+        2. TRADE 事件增量更新: 现货更新 base/quote 资产余额 衍生品更新净持仓与开仓均价
+        3. 定期 REST 对账 记录不一致项后以 REST 结果覆盖
+            REST 查询期间有新成交的持仓与资产本轮不对账 保留本地值 见 touched_since
+'''
+
+import copy
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+from .constant import Direction, Product, Status
+from .object import AccountData, AssetData, ContractData, OrderData, PositionData, TradeData
+
+ACTIVE_STATUS = (Status.SUBMITTING, Status.NOTTRADED, Status.PARTTRADED)
+
+
+class OrderManager:
+    '''
+        本地订单簿 按 (gateway_name, orderid) 索引 活跃订单另按 (gateway_name, symbol) 索引
+        非线程安全 仅在事件处理线程中更新
+    '''
+
+    def __init__(self, max_finished_orders: int = 10000):
+        '''
+            Params:
+                max_finished_orders: 保留的已结束订单数量上限 超出后删除最早结束的订单
+        '''
+        self.max_finished_orders = max_finished_orders
+
+        self.orders: Dict[Tuple[str, str], OrderData] = {} # (gateway_name, orderid): OrderData
+        self.active_orders: Dict[Tuple[str, str], Dict[str, OrderData]] = {} # (gateway_name, symbol): {orderid: OrderData}
+        self.traded_volume: Dict[Tuple[str, str], float] = {} # (gateway_name, orderid): 由 TRADE 事件累计的成交量
+        self._trade_keys: set = set() # 已处理的成交 (gateway_name, orderid, tradeid)
+        self._finished_keys = deque() # 已结束订单 (gateway_name, orderid)
+
+    def on_send_order(self, gateway_name: str, order: OrderData):
+        '''
+            下单成功 订单回报可能早于下单返回 已存在的订单不覆盖
+        '''
+        key = (gateway_name, order.orderid)
+        if key in self.orders:
+            return
+        self._update(gateway_name, order)
+
+    def on_order(self, gateway_name: str, order: OrderData):
+        '''
+            订单更新 忽略过期的更新: 已结束订单不会回到活跃状态 成交量不会减少
+        '''
+        old = self.orders.get((gateway_name, order.orderid))
+        if old is not None:
+            if old.status not in ACTIVE_STATUS and order.status in ACTIVE_STATUS:
+                return
+            if order.traded < old.traded and order.status in ACTIVE_STATUS:
+                return
+        self._update(gateway_name, copy.copy(order))
+
+    def on_amend_order(self, gateway_name: str, orderid: str, price: float = None, volume: float = None):
+        '''
+            改单成功 更新本地订单的价格与数量 交易所的订单回报随后照常更新
+        '''
+        order = self.orders.get((gateway_name, orderid))
+        if order is None or order.status not in ACTIVE_STATUS:
+            return
+        order = copy.copy(order)
+        if price is not None:
+            order.price = price
+        if volume is not None:
+            order.volume = volume
+        self._update(gateway_name, order)
+
+    def on_trade(self, gateway_name: str, trade: TradeData):
+        '''
+            成交更新 成交推送可能早于订单推送 先累计成交量 订单到达后合并
+        '''
+        trade_key = (gateway_name, trade.orderid, trade.tradeid)
+        if trade_key in self._trade_keys:
+            return
+        self._trade_keys.add(trade_key)
+        key = (gateway_name, trade.orderid)
+        traded = self.traded_volume.get(key, 0) + trade.volume
+        self.traded_volume[key] = traded
+        order = self.orders.get(key)
+        if order is None or order.status not in ACTIVE_STATUS or traded <= order.traded:
+            return
+        order = copy.copy(order)
+        order.traded = traded
+        order.status = Status.ALLTRADED if order.volume and traded >= order.volume else Status.PARTTRADED
+        self._update(gateway_name, order)
+
+    def _update(self, gateway_name: str, order: OrderData):
+        key = (gateway_name, order.orderid)
+        traded = self.traded_volume.get(key, 0)
+        if traded > order.traded and order.status in ACTIVE_STATUS:
+            order.traded = traded
+            order.status = Status.ALLTRADED if order.volume and traded >= order.volume else Status.PARTTRADED
+        old = self.orders.get(key)
+        self.orders[key] = order
+
+        symbol_key = (gateway_name, order.symbol)
+        if order.status in ACTIVE_STATUS:
+            self.active_orders.setdefault(symbol_key, {})[order.orderid] = order
+            return
+        active = self.active_orders.get(symbol_key)
+        if active is not None and active.pop(order.orderid, None) is not None and not active:
+            del self.active_orders[symbol_key]
+        if old is not None and old.status not in ACTIVE_STATUS: # 重复的结束推送或对账结果 已记录
+            return
+        self._finished_keys.append(key)
+        while len(self._finished_keys) > self.max_finished_orders:
+            finished_key = self._finished_keys.popleft()
+            finished = self.orders.get(finished_key)
+            if finished is not None and finished.status not in ACTIVE_STATUS:
+                del self.orders[finished_key]
+                self.traded_volume.pop(finished_key, None)
+        if len(self._trade_keys) > self.max_finished_orders * 10:
+            self._trade_keys = {k for k in self._trade_keys if (k[0], k[1]) in self.orders}
+
+    def get_order(self, gateway_name: str, orderid: str) -> OrderData or None:
+        return self.orders.get((gateway_name, orderid))
+
+    def get_active_orders(self, gateway_name: str, symbol: str = '') -> List[OrderData]:
+        '''
+            symbol 为空时返回 gateway 所有活跃订单
+        '''
+        if symbol:
+            return list(self.active_orders.get((gateway_name, symbol), {}).values())
+        orders = []
+        for (order_gateway_name, _), active in list(self.active_orders.items()):
+            if order_gateway_name == gateway_name:
+                orders.extend(active.values())
+        return orders
+
+    def get_outstanding_notional(self, gateway_name: str, symbol: str = '') -> float:
+        '''
+            活跃订单未成交部分的名义价值 price * (volume - traded)
+            OrderData.volume 为 gateway 按合约面值换算后的 base 数量
+        '''
+        notional = 0
+        for order in self.get_active_orders(gateway_name, symbol):
+            notional += (order.price or 0) * (order.volume - order.traded)
+        return notional
+
+    def apply_reconcile(self, gateway_name: str, symbol: str, rest_orders: List[OrderData]) -> List[str]:
+        '''
+            应用 REST 对账结果 返回修正描述
+            Params:
+                rest_orders: REST 查询到的活跃订单 以及本地活跃但 REST 未返回的订单的查询结果
+        '''
+        repairs = []
+        for order in rest_orders:
+            old = self.orders.get((gateway_name, order.orderid))
+            if old is not None and old.status == order.status and old.traded == order.traded:
+                continue
+            self.on_order(gateway_name, order)
+            new = self.orders.get((gateway_name, order.orderid))
+            if new is not old:
+                repairs.append(
+                    f"{symbol} {order.orderid} 本地: {old.status.value if old else '无'}/{old.traded if old else 0} "
+                    f"REST: {order.status.value}/{order.traded}"
+                )
+        return repairs
+
+    def dump_state(self) -> dict:
+        '''
+            活跃订单与其累计成交量 用于快照 已结束订单不保存
+        '''
+        orders = [(gateway_name, copy.copy(order)) for (gateway_name, _), active in self.active_orders.items() for order in active.values()]
+        return {
+            'orders': orders,
+            'traded_volume': {(gateway_name, order.orderid): self.traded_volume[(gateway_name, order.orderid)]
+                              for gateway_name, order in orders if (gateway_name, order.orderid) in self.traded_volume},
+        }
+
+    def load_state(self, state: dict):
+        '''
+            从快照恢复活跃订单 之后由 REST 对账修正
+        '''
+        self.traded_volume.update(state.get('traded_volume', {}))
+        for gateway_name, order in state.get('orders', []):
+            self.on_send_order(gateway_name, order)
+
+
+class PositionManager:
+    '''
+        本地持仓与资产 非线程安全 仅在事件处理线程中更新
+        TradeData.volume 为 gateway 按 ContractData.size 换算后的 base 数量 因此增量更新时不再乘以合约面值
+    '''
+
+    def __init__(self, get_contract: Callable[[str, str], ContractData], max_trade_keys: int = 100000):
+        self.get_contract = get_contract
+        self.max_trade_keys = max_trade_keys
+
+        self.positions: Dict[str, Dict[str, PositionData]] = {} # gateway_name: {symbol: PositionData}
+        self.assets: Dict[str, Dict[str, AssetData]] = {} # gateway_name: {asset_name: AssetData}
+        self.exchanges: Dict[str, object] = {} # gateway_name: Exchange
+        self.trade_seq: Dict[str, int] = {} # gateway_name: 已处理成交数量 对账时判断期间是否有新成交
+        self.touched_seq: Dict[str, Dict[Tuple[str, str], int]] = {} # gateway_name: {('position', symbol) / ('asset', name): 最近一次成交的 trade_seq}
+        self._trade_keys = deque()
+        self._trade_key_set: set = set()
+
+    def is_loaded(self, gateway_name: str) -> bool:
+        return gateway_name in self.positions
+
+    def load_account(self, account: AccountData):
+        '''
+            以 REST 查询结果覆盖本地持仓与资产
+        '''
+        self.exchanges[account.gateway_name] = account.exchange
+        self.positions[account.gateway_name] = {
+            symbol: PositionData(symbol=position.symbol, netQty=position.netQty, avgPrice=position.avgPrice)
+            for symbol, position in account.positions.items()
+        }
+        self.assets[account.gateway_name] = {
+            name: AssetData(name=asset.name, total=asset.total, available=asset.available)
+            for name, asset in account.assets.items()
+        }
+
+    def on_trade(self, gateway_name: str, trade: TradeData):
+        '''
+            成交增量更新 本地尚未加载该 gateway 时忽略(加载时以 REST 为准)
+        '''
+        if gateway_name not in self.positions or not trade.volume:
+            return
+        trade_key = (gateway_name, trade.orderid, trade.tradeid)
+        if trade_key in self._trade_key_set:
+            return
+        self._trade_key_set.add(trade_key)
+        self._trade_keys.append(trade_key)
+        if len(self._trade_keys) > self.max_trade_keys:
+            self._trade_key_set.discard(self._trade_keys.popleft())
+        seq = self.trade_seq[gateway_name] = self.trade_seq.get(gateway_name, 0) + 1
+        touched = self.touched_seq.setdefault(gateway_name, {})
+
+        contract = self.get_contract(gateway_name, trade.symbol)
+        volume = trade.volume if trade.direction == Direction.LONG else -trade.volume
+        if contract is not None and contract.product == Product.SPOT:
+            touched[('asset', contract.base.upper())] = seq
+            touched[('asset', contract.quote.upper())] = seq
+            assets = self.assets[gateway_name]
+            self._add_asset(assets, contract.base.upper(), volume)
+            self._add_asset(assets, contract.quote.upper(), -volume * trade.price)
+            return
+
+        touched[('position', trade.symbol)] = seq
+        positions = self.positions[gateway_name]
+        position = positions.get(trade.symbol)
+        if position is None:
+            position = positions[trade.symbol] = PositionData(symbol=trade.symbol, netQty=0, avgPrice=None)
+        old_qty = position.netQty
+        new_qty = old_qty + volume
+        if abs(new_qty) < 1e-12:
+            position.netQty = 0
+            position.avgPrice = None
+            return
+        if not old_qty or not position.avgPrice or (old_qty > 0) == (volume > 0):
+            # 开仓或加仓 加权平均
+            position.avgPrice = (abs(old_qty) * (position.avgPrice or 0) + abs(volume) * trade.price) / abs(new_qty)
+        elif (old_qty > 0) != (new_qty > 0):
+            # 反手 剩余部分以成交价开仓
+            position.avgPrice = trade.price
+        position.netQty = new_qty
+
+    @staticmethod
+    def _add_asset(assets: Dict[str, AssetData], name: str, amount: float):
+        asset = assets.get(name)
+        if asset is None:
+            asset = assets[name] = AssetData(name=name, total=0, available=0)
+        asset.total += amount
+        asset.available += amount
+
+    def get_position(self, gateway_name: str, symbol: str) -> PositionData or None:
+        '''
+            本地未加载该 gateway 返回 None; 无持仓返回 netQty=0 的 PositionData
+        '''
+        positions = self.positions.get(gateway_name)
+        if positions is None:
+            return None
+        position = positions.get(symbol)
+        if position is None:
+            return PositionData(symbol=symbol, netQty=0, avgPrice=None)
+        return PositionData(symbol=position.symbol, netQty=position.netQty, avgPrice=position.avgPrice)
+
+    def get_account(self, gateway_name: str) -> AccountData or None:
+        '''
+            返回本地持仓与资产的副本 本地未加载该 gateway 返回 None
+        '''
+        if gateway_name not in self.positions:
+            return None
+        return AccountData(
+            exchange=self.exchanges.get(gateway_name),
+            gateway_name=gateway_name,
+            assets={name: AssetData(name=a.name, total=a.total, available=a.available) for name, a in self.assets[gateway_name].items()},
+            positions={symbol: PositionData(symbol=p.symbol, netQty=p.netQty, avgPrice=p.avgPrice) for symbol, p in self.positions[gateway_name].items()},
+        )
+
+    def dump_state(self) -> dict:
+        '''
+            所有已加载 gateway 的持仓与资产 用于快照
+        '''
+        return {gateway_name: self.get_account(gateway_name) for gateway_name in list(self.positions)}
+
+    def load_state(self, state: dict):
+        '''
+            从快照恢复持仓与资产 已通过 REST 加载的 gateway 不覆盖 之后由 REST 对账修正
+        '''
+        for gateway_name, account in state.items():
+            if not self.is_loaded(gateway_name):
+                self.load_account(account)
+
+    def touched_since(self, gateway_name: str, trade_seq: int) -> set:
+        '''
+            trade_seq 之后有成交的持仓与资产 {('position', symbol), ('asset', name)}
+        '''
+        return {key for key, seq in self.touched_seq.get(gateway_name, {}).items() if seq > trade_seq}
+
+    def reconcile(self, account: AccountData, rel_tol: float = 1e-6, skip: set = frozenset()) -> List[str]:
+        '''
+            与 REST 查询结果比较 返回不一致项 并以 REST 结果覆盖本地
+            skip: 不比较且保留本地值的持仓与资产 {('position', symbol), ('asset', name)} 例如 REST 查询期间有新成交的项目
+        '''
+        mismatches = []
+        gateway_name = account.gateway_name
+
+        def differs(a: float, b: float) -> bool:
+            return abs((a or 0) - (b or 0)) > rel_tol * max(1, abs(a or 0), abs(b or 0))
+
+        local_positions = self.positions.get(gateway_name, {})
+        for symbol in set(local_positions) | set(account.positions):
+            if ('position', symbol) in skip:
+                continue
+            local = local_positions.get(symbol)
+            rest = account.positions.get(symbol)
+            local_qty = local.netQty if local else 0
+            rest_qty = rest.netQty if rest else 0
+            if differs(local_qty, rest_qty):
+                mismatches.append(f"持仓 {symbol} 本地: {local_qty} REST: {rest_qty}")
+        local_assets = self.assets.get(gateway_name, {})
+        for name in set(local_assets) | set(account.assets):
+            if ('asset', name) in skip:
+                continue
+            local = local_assets.get(name)
+            rest = account.assets.get(name)
+            local_total = local.total if local else 0
+            rest_total = rest.total if rest else 0
+            if differs(local_total, rest_total):
+                mismatches.append(f"资产 {name} 本地: {local_total} REST: {rest_total}")
+        self.load_account(account)
+        for kind, name in skip:
+            local, target = (local_positions, self.positions[gateway_name]) if kind == 'position' else (local_assets, self.assets[gateway_name])
+            if name in local:
+                target[name] = local[name]
+            else:
+                target.pop(name, None)
+        return mismatches
@@ -0,0 +1,238 @@
+'''
+    本地订单簿 LocalOrderBook
+
+    由交易所增量深度维护完整订单簿 按需推送前 N 档 DepthData:
+        Binance: <symbol>@depth@100ms 增量 + REST /fapi/v1/depth 快照
+            1. 先缓存增量 再获取快照 lastUpdateId
+            2. 丢弃 u < lastUpdateId 的增量 第一条增量需满足 U <= lastUpdateId <= u
+            3. 之后每条增量的 pu 等于上一条的 u 否则丢包 重新获取快照
+        OKX: books / books-l2-tbt 频道 首条为 snapshot 之后为 update
+            1. update 的 prevSeqId 等于上一条的 seqId 否则丢包 (seqId == prevSeqId 为无变化的心跳)
+            2. 每条推送带 checksum: 前25档 bid:ask 交错的 price:size 字符串 crc32 不一致时丢包
+            丢包后由 gateway 重新订阅该合约 服务端重新推送 snapshot
+
+    价格档位: dict 价格 -> 档位 + 有序价格 list 买单以负价格排序 两边都从最优价开始
+        修改已有档位数量 O(1); 新增与删除档位 bisect 查找 O(log n) 但 list 插入删除需移动元素 最坏 O(n)
+        n 为单边档位数 (数百至数千) 元素移动为连续内存拷贝 实际开销小于平衡树等结构的 Python 层开销
+    数量保存交易所原始单位 推送时乘以合约面值 size
+    增量与快照可能来自不同线程 (ws 线程 / 快照线程) 通过 lock 保护
+'''
+import threading
+import zlib
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+from .array_depth import ArrayDepthData
+from .constant import Exchange
+from .object import DepthData
+
+OKX_CHECKSUM_LEVELS = 25
+
+
+class BookSide:
+    '''
+        单边价格档位 price -> (size, price_str, size_str) 字符串用于 OKX checksum
+    '''
+
+    __slots__ = ('descending', 'keys', 'levels')
+
+    def __init__(self, descending: bool):
+        self.descending = descending # 买单
+        self.keys: List[float] = [] # 升序 买单为负价格 keys[0] 为最优价
+        self.levels: Dict[float, Tuple[float, str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self):
+        self.keys = []
+        self.levels = {}
+
+    def update(self, price_str: str, size_str: str):
+        '''
+            数量为0删除档位
+            已有档位 O(1); 新增或删除档位 查找 O(log n) list 插入删除 O(n)
+        '''
+        price = float(price_str)
+        size = float(size_str)
+        key = -price if self.descending else price
+        if size == 0:
+            if self.levels.pop(price, None) is not None:
+                del self.keys[bisect_left(self.keys, key)]
+            return
+        if price not in self.levels:
+            insort(self.keys, key)
+        self.levels[price] = (size, price_str, size_str)
+
+    def update_levels(self, levels: Sequence[Sequence[str]]):
+        for level in levels:
+            self.update(level[0], level[1])
+
+    def top(self, n: int, size: float = 1) -> Tuple[Tuple[float, float], ...]:
+        '''
+            前 n 档 (price, volume) volume 乘以合约面值 size
+        '''
+        sign = -1 if self.descending else 1
+        levels = self.levels
+        result = []
+        for key in self.keys[:n]:
+            price = sign * key
+            result.append((price, levels[price][0] * size))
+        return tuple(result)
+
+    def top_raw(self, n: int) -> List[Tuple[str, str]]:
+        sign = -1 if self.descending else 1
+        levels = self.levels
+        return [levels[sign * key][1:] for key in self.keys[:n]]
+
+
+class LocalOrderBook:
+    '''
+        单个合约的本地订单簿
+    '''
+
+    def __init__(self, symbol: str, exchange: Exchange, size: float = 1, tick_size: float = 0, buffer_size: int = 1000):
+        '''
+            Params:
+                symbol: nd 合约
+                size: 合约面值 推送的数量 = 交易所数量 * size
+                tick_size: 传给 ArrayDepthData
+                buffer_size: Binance 等待快照时最多缓存的增量数量
+        '''
+        self.symbol = symbol
+        self.exchange = exchange
+        self.size = size
+        self.tick_size = tick_size
+        self.asks = BookSide(descending=False)
+        self.bids = BookSide(descending=True)
+        self.lock = threading.Lock()
+
+        self.ready: bool = False # 已由快照同步
+        self.resyncing: bool = False # gateway 正在重新同步 避免重复请求快照
+        self.ts: int = 0 # 最后一次更新的交易所时间戳
+        self.gap_count: int = 0
+        self.gap_reason: str = ''
+
+        # Binance
+        self.last_update_id: int = 0
+        self.first_pending: bool = False # 快照后尚未应用第一条增量
+        self.buffer: deque = deque(maxlen=buffer_size)
+
+        # OKX
+        self.seq_id: int = 0
+
+    def clear(self):
+        self.asks.clear()
+        self.bids.clear()
+        self.ready = False
+
+    def get_depth(self, levels: int = 20, use_array: bool = False) -> DepthData:
+        '''
+            前 levels 档深度 use_array 为 True 时返回 ArrayDepthData
+        '''
+        with self.lock:
+            asks = self.asks.top(levels, self.size)
+            bids = self.bids.top(levels, self.size)
+            ts = self.ts
+        if use_array:
+            return ArrayDepthData.from_levels(self.symbol, self.exchange, ts, asks, bids, tick_size=self.tick_size)
+        return DepthData(symbol=self.symbol, exchange=self.exchange, ts=ts, asks=asks, bids=bids)
+
+    def _set_gap(self, reason: str):
+        self.ready = False
+        self.gap_count += 1
+        self.gap_reason = reason
+
+    # === Binance ===
+    def on_binance_snapshot(self, snapshot: dict) -> bool:
+        '''
+            REST depth 快照 {'lastUpdateId', 'E', 'T', 'bids', 'asks'} 应用后回放缓存的增量
+            return: 是否同步成功 False 时需重新获取快照 原因见 gap_reason
+        '''
+        with self.lock:
+            self.clear()
+            self.asks.update_levels(snapshot['asks'])
+            self.bids.update_levels(snapshot['bids'])
+            self.last_update_id = snapshot['lastUpdateId']
+            self.ts = snapshot.get('E', 0)
+            self.first_pending = True
+            self.ready = True
+            buffer = list(self.buffer)
+            self.buffer.clear()
+            for index, data in enumerate(buffer):
+                self._apply_binance_diff(data)
+                if not self.ready: # 保留其余增量 等待下一次快照
+                    self.buffer.extend(buffer[index + 1:])
+                    return False
+            return True
+
+    def on_binance_diff(self, data: dict) -> bool:
+        '''
+            depthUpdate 增量 {'E', 'U', 'u', 'pu', 'b', 'a'}
+            return: 订单簿是否更新 未同步时缓存增量返回 False 丢包时 ready 变为 False
+        '''
+        with self.lock:
+            if not self.ready:
+                self.buffer.append(data)
+                return False
+            return self._apply_binance_diff(data)
+
+    def _apply_binance_diff(self, data: dict) -> bool:
+        if self.first_pending:
+            if data['u'] < self.last_update_id: # 快照之前的增量
+                return False
+            if data['U'] > self.last_update_id:
+                self._set_gap(f"快照 lastUpdateId {self.last_update_id} 早于第一条增量 U {data['U']}")
+                self.buffer.append(data)
+                return False
+            self.first_pending = False
+        elif data['pu'] != self.last_update_id:
+            self._set_gap(f"增量不连续 pu {data['pu']} != 上一条 u {self.last_update_id}")
+            self.buffer.append(data)
+            return False
+        self.asks.update_levels(data['a'])
+        self.bids.update_levels(data['b'])
+        self.last_update_id = data['u']
+        self.ts = data['E']
+        return True
+
+    # === OKX ===
+    def on_okx_books(self, action: str, data: dict) -> bool:
+        '''
+            books 频道推送 action: 'snapshot' / 'update'
+            data: {'asks', 'bids', 'ts', 'checksum', 'seqId', 'prevSeqId'}
+            return: 订单簿是否更新 丢包或 checksum 不一致时 ready 变为 False
+        '''
+        with self.lock:
+            if action == 'snapshot':
+                self.clear()
+                self.ready = True
+            elif not self.ready:
+                return False
+            elif data['prevSeqId'] != self.seq_id:
+                self._set_gap(f"增量不连续 prevSeqId {data['prevSeqId']} != 上一条 seqId {self.seq_id}")
+                return False
+            self.asks.update_levels(data['asks'])
+            self.bids.update_levels(data['bids'])
+            self.seq_id = data['seqId']
+            self.ts = int(data['ts'])
+            if 'checksum' in data and self.okx_checksum() != int(data['checksum']):
+                self._set_gap(f"checksum 不一致 seqId {self.seq_id}")
+                return False
+            return True
+
+    def okx_checksum(self) -> int:
+        '''
+            前25档 bid_price:bid_size:ask_price:ask_size:... 一边不足25档时只取另一边 crc32 转为有符号32位整数
+        '''
+        bids = self.bids.top_raw(OKX_CHECKSUM_LEVELS)
+        asks = self.asks.top_raw(OKX_CHECKSUM_LEVELS)
+        parts = []
+        for index in range(OKX_CHECKSUM_LEVELS):
+            if index < len(bids):
+                parts.extend(bids[index])
+            if index < len(asks):
+                parts.extend(asks[index])
+        crc = zlib.crc32(':'.join(parts).encode())
+        return crc - (1 << 32) if crc >= (1 << 31) else crc
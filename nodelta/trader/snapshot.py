@@ -0,0 +1,209 @@
+'''
+    引擎快照 用于快速重启
+
+    快照内容:
+        gateways: 各 gateway 的 dump_state() 合约信息 账户配置等 启动时通过 gateway 的 warm_state 参数恢复 跳过 REST 初始化
+        oms: 活跃订单与订单归属策略
+        positions: 本地持仓与资产
+        strategies: 策略 variables_name 中的变量 与 register_array_manager 注册的 ArrayManager
+
+    保存: 定时线程通过 TASK 事件在事件处理线程中复制状态 序列化与写文件在定时线程中完成 先写临时文件再替换 不会产生不完整的快照
+    恢复: OMS 与持仓在策略 on_start 之前恢复 策略状态在 on_start 之后恢复(覆盖 on_start 中的初始化)
+    校验: 恢复的数据均在后台校验 gateway 重新查询合约信息 OMS 与持仓由 REST 对账线程修正
+
+    用法:
+        snapshot = load_snapshot(path)
+        gateway = OkxGateway(api, warm_state=get_gateway_state(snapshot, GatewayName.OKX.value))
+        main_engine.add_gateways([gateway])
+        main_engine.add_strategy(strategy)
+        main_engine.enable_snapshot(path, interval=60)
+        main_engine.start()
+'''
+import copy
+import os
+import pickle
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import List
+
+from .constant import LogLevel, EventType
+
+SNAPSHOT_VERSION = 1
+
+
+def load_snapshot(path: str) -> dict or None:
+    '''
+        读取快照 文件不存在或无法读取返回 None
+    '''
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+    except Exception:
+        return None
+
+
+def get_gateway_state(snapshot: dict or None, gateway_name: str) -> dict or None:
+    if not snapshot:
+        return None
+    return snapshot.get('gateways', {}).get(gateway_name)
+
+
+def diff_contracts(old: dict, new: dict) -> List[str]:
+    '''
+        比较快照中的合约信息与 REST 查询结果 返回变化描述
+    '''
+    changes = []
+    for symbol in old.keys() - new.keys():
+        changes.append(f"下架 {symbol}")
+    for symbol in new.keys() - old.keys():
+        changes.append(f"新增 {symbol}")
+    for symbol in old.keys() & new.keys():
+        if old[symbol] != new[symbol]:
+            changes.append(f"变更 {symbol}: {old[symbol]} -> {new[symbol]}")
+    return changes
+
+
+def save_snapshot(path: str, snapshot: dict):
+    '''
+        先写临时文件再替换
+    '''
+    dir_path = os.path.dirname(path)
+    if dir_path and not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotManager:
+    '''
+        MainEngine 快照的保存与恢复
+    '''
+
+    def __init__(self, main_engine, path: str, interval: float = 60, max_age: float = 300):
+        '''
+            Params:
+                path: 快照文件路径
+                interval: 保存间隔 秒
+                max_age: 策略状态的最长有效时间 秒 快照更旧时不恢复策略变量与 ArrayManager 0为不限
+        '''
+        self.main_engine = main_engine
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.snapshot: dict = load_snapshot(path) # 启动时读取的快照
+        self.saved_count: int = 0
+
+    def is_strategy_state_valid(self) -> bool:
+        if not self.snapshot:
+            return False
+        return not self.max_age or time.time() * 1000 - self.snapshot['ts'] <= self.max_age * 1000
+
+    def has_strategy_state(self, strategy_name: str) -> bool:
+        return self.is_strategy_state_valid() and strategy_name in self.snapshot.get('strategies', {})
+
+    def capture(self) -> dict:
+        '''
+            复制当前状态 在事件处理线程中调用
+        '''
+        main_engine = self.main_engine
+        strategies = {}
+        for strategy_name, strategy in main_engine.strategies.items():
+            strategies[strategy_name] = {
+                'variables': {name: copy.deepcopy(getattr(strategy, name)) for name in strategy.variables_name if hasattr(strategy, name)},
+                'array_managers': {name: copy.deepcopy(am.__dict__) for name, am in strategy.array_managers.items()},
+            }
+        oms_state = main_engine.oms.dump_state()
+        active_keys = {(gateway_name, order.orderid) for gateway_name, order in oms_state['orders']}
+        return {
+            'version': SNAPSHOT_VERSION,
+            'ts': int(time.time() * 1000),
+            'gateways': {gateway_name: gateway.dump_state() for gateway_name, gateway in main_engine.gateways.items()},
+            'oms': oms_state,
+            'order_owners': {key: strategy.strategy_name for key, strategy in main_engine.order_strategy_map.items() if key in active_keys},
+            'positions': main_engine.positions.dump_state(),
+            'strategies': strategies,
+        }
+
+    def save(self, snapshot: dict = None):
+        '''
+            snapshot 为空时在当前线程复制状态 需在事件处理线程中调用
+        '''
+        save_snapshot(self.path, snapshot if snapshot is not None else self.capture())
+        self.saved_count += 1
+
+    def restore_engine(self):
+        '''
+            恢复 OMS 订单归属 与持仓 策略 on_start 之前调用
+        '''
+        if not self.snapshot:
+            return
+        main_engine = self.main_engine
+        main_engine.oms.load_state(self.snapshot.get('oms', {}))
+        for key, strategy_name in self.snapshot.get('order_owners', {}).items():
+            strategy = main_engine.strategies.get(strategy_name)
+            if strategy is not None:
+                main_engine.order_strategy_map.setdefault(key, strategy)
+        main_engine.positions.load_state(self.snapshot.get('positions', {}))
+        msg = f"已从快照恢复订单与持仓: {self.path} 快照时间: {self.snapshot['ts']}"
+        main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=main_engine.engine_name)
+
+    def restore_strategy(self, strategy):
+        '''
+            恢复策略变量与 ArrayManager 策略 on_start 之后调用
+            ArrayManager 需在 on_start 中以相同名称与 size 注册
+        '''
+        if not self.has_strategy_state(strategy.strategy_name):
+            return
+        state = self.snapshot['strategies'][strategy.strategy_name]
+        for name, value in state['variables'].items():
+            if name in strategy.variables_name:
+                setattr(strategy, name, value)
+        for name, am_state in state['array_managers'].items():
+            am = strategy.array_managers.get(name)
+            if am is None or am.size != am_state.get('size'):
+                msg = f"{strategy.strategy_name} ArrayManager {name} 未注册或 size 不一致 不恢复"
+                self.main_engine.write_log(msg=msg, level=LogLevel.WARNING.value, source=self.main_engine.engine_name)
+                continue
+            am.__dict__.update(am_state)
+        msg = f"{strategy.strategy_name} 已从快照恢复 变量: {list(state['variables'])} ArrayManager: {list(state['array_managers'])}"
+        self.main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.main_engine.engine_name)
+
+    def start(self):
+        '''
+            启动定时保存线程
+        '''
+        if not self.interval:
+            return
+
+        def run_snapshot():
+            main_engine = self.main_engine
+            while main_engine.is_event_processing:
+                time.sleep(self.interval)
+                future = Future()
+
+                def capture_task():
+                    try:
+                        future.set_result(self.capture())
+                    except Exception as e:
+                        future.set_exception(e)
+
+                try:
+                    main_engine.put_event(event_type=EventType.TASK, exchange=None, gateway_name='', symbol='', data=capture_task)
+                    self.save(future.result(timeout=self.interval))
+                except Exception as e:
+                    error_msg = traceback.format_exc()
+                    msg = f"保存快照异常: {e} 报错信息:\n{error_msg}"
+                    main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=main_engine.engine_name)
+
+        threading.Thread(target=run_snapshot, name='nd_snapshot', daemon=True).start()
@@ -1,19 +1,23 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
+import asyncio
+import functools
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
+from concurrent.futures import Future
 import signal
 
 from .constant import (
     LogLevel, Direction, Offset, Status, Exchange, Product, GatewayName, EventType
 )
-from .object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event
+from .object import ContractData, OrderData, TradeData, PositionData, AssetData, AccountData, DepthData, BarData, Event, TimerData, OrderRequest, CancelRequest
 
 
 '''
     策略模板原则:
 
     1. 回调函数 例如 on_depth on_trade on_order on_account 参数位置固定 exchange gateway_name symbol EventData
+        使用 MainEngine.start_async 启动时 回调可以定义为 async def
     2. 交易函数 例如 buy sell short cover 参数位置固定 gateway_name symbol price amount
     3. 接受到 trade 事件后 引擎会自动记录 trade log
 
@@ -34,7 +38,11 @@ class StrategyTemplate(ABC):
 
         # 参数与变量
         self.params_name: List[str] = [] # 参数名称
-        self.variables_name: List[str] = [] # 变量名称 会保存至bt_data中
+        self.variables_name: List[str] = [] # 变量名称 会保存至bt_data中 以及快照中
+
+        # 快照 见 MainEngine.enable_snapshot
+        self.array_managers: Dict[str, Any] = {} # name: ArrayManager 由 register_array_manager 注册
+        self.warm_started: bool = False # 是否从快照恢复 on_start 之前设置 为 True 时 on_start 可跳过历史数据加载
 
     def add_main_engine(self, main_engine): #: MainEngine
         self.main_engine = main_engine
@@ -44,7 +52,7 @@ class StrategyTemplate(ABC):
             如果是单向持仓那么就是买 与 cover功能相同
             如果是双向持仓那么就是开多
         '''
-        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.LONG, offset=Offset.OPEN, price=price, amount=amount, **kwargs)
+        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.LONG, offset=Offset.OPEN, price=price, amount=amount, strategy_name=self.strategy_name, **kwargs)
         
         return orderId
     
@@ -53,7 +61,7 @@ class StrategyTemplate(ABC):
             如果是单向持仓那么就是卖 与 short功能相同
             如果是双向持仓那么就是平多
         '''
-        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.SHORT, offset=Offset.CLOSE, price=price, amount=amount, **kwargs)
+        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.SHORT, offset=Offset.CLOSE, price=price, amount=amount, strategy_name=self.strategy_name, **kwargs)
         
         return orderId
     
@@ -62,7 +70,7 @@ class StrategyTemplate(ABC):
             如果是单向持仓那么就是卖 与 sell功能相同
             如果是双向持仓那么就是开空
         '''
-        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.SHORT, offset=Offset.OPEN, price=price, amount=amount, **kwargs)
+        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.SHORT, offset=Offset.OPEN, price=price, amount=amount, strategy_name=self.strategy_name, **kwargs)
         
         return orderId
     
@@ -71,7 +79,7 @@ class StrategyTemplate(ABC):
             如果是单向持仓那么就是买 与 buy功能相同
             如果是双向持仓那么就是平空
         '''
-        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.LONG, offset=Offset.CLOSE, price=price, amount=amount, **kwargs)
+        orderId = self.main_engine.send_order(gateway_name=gateway_name, symbol=symbol, direction=Direction.LONG, offset=Offset.CLOSE, price=price, amount=amount, strategy_name=self.strategy_name, **kwargs)
         
         return orderId
     
@@ -83,6 +91,84 @@ class StrategyTemplate(ABC):
 
         return info
 
+    def amend_order(self, gateway_name: str, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, **kwargs) -> bool:
+        '''
+            改单 订单号不变 new_price / new_amount 为空时不修改 new_amount 为包含已成交的订单总量
+            比 cancel_order + send_order 少一次请求 且改单期间订单仍在订单簿中
+        '''
+        return self.main_engine.amend_order(gateway_name=gateway_name, symbol=symbol, orderid=orderid, new_price=new_price, new_amount=new_amount, **kwargs)
+
+    def send_orders(self, gateway_name: str, requests: List[OrderRequest]) -> List[str]:
+        '''
+            批量下单 按交易所批量接口上限自动分批 一次报价更新只需一两次请求
+            requests: [OrderRequest(symbol, direction, offset, price, amount, kwargs)]
+            return: 与 requests 顺序一致的 orderid 列表 失败为空字符串
+        '''
+        return self.main_engine.send_orders(gateway_name=gateway_name, requests=requests, strategy_name=self.strategy_name)
+
+    def cancel_orders(self, gateway_name: str, requests: List[CancelRequest]) -> List[bool]:
+        '''
+            批量撤单 requests: [CancelRequest(symbol, orderid)]
+            return: 与 requests 顺序一致的撤单结果
+        '''
+        return self.main_engine.cancel_orders(gateway_name=gateway_name, requests=requests)
+
+    def buy_async(self, gateway_name: str, symbol: str, price: float, amount: float, callback: Callable[[str], Any] = None, **kwargs) -> Future:
+        '''
+            异步 buy 不阻塞事件处理 callback(orderid) 在事件处理线程中执行
+            return: Future 结果为 orderid
+        '''
+        return self.main_engine.send_order_async(gateway_name=gateway_name, symbol=symbol, direction=Direction.LONG, offset=Offset.OPEN, price=price, amount=amount, strategy_name=self.strategy_name, callback=callback, **kwargs)
+
+    def sell_async(self, gateway_name: str, symbol: str, price: float, amount: float, callback: Callable[[str], Any] = None, **kwargs) -> Future:
+        '''
+            异步 sell 不阻塞事件处理 callback(orderid) 在事件处理线程中执行
+            return: Future 结果为 orderid
+        '''
+        return self.main_engine.send_order_async(gateway_name=gateway_name, symbol=symbol, direction=Direction.SHORT, offset=Offset.CLOSE, price=price, amount=amount, strategy_name=self.strategy_name, callback=callback, **kwargs)
+
+    def short_async(self, gateway_name: str, symbol: str, price: float, amount: float, callback: Callable[[str], Any] = None, **kwargs) -> Future:
+        '''
+            异步 short 不阻塞事件处理 callback(orderid) 在事件处理线程中执行
+            return: Future 结果为 orderid
+        '''
+        return self.main_engine.send_order_async(gateway_name=gateway_name, symbol=symbol, direction=Direction.SHORT, offset=Offset.OPEN, price=price, amount=amount, strategy_name=self.strategy_name, callback=callback, **kwargs)
+
+    def cover_async(self, gateway_name: str, symbol: str, price: float, amount: float, callback: Callable[[str], Any] = None, **kwargs) -> Future:
+        '''
+            异步 cover 不阻塞事件处理 callback(orderid) 在事件处理线程中执行
+            return: Future 结果为 orderid
+        '''
+        return self.main_engine.send_order_async(gateway_name=gateway_name, symbol=symbol, direction=Direction.LONG, offset=Offset.CLOSE, price=price, amount=amount, strategy_name=self.strategy_name, callback=callback, **kwargs)
+
+    def cancel_order_async(self, gateway_name: str, symbol: str, orderid: str, callback: Callable[[bool], Any] = None) -> Future:
+        '''
+            异步撤单 不阻塞事件处理 callback(cancel_bool) 在事件处理线程中执行
+            return: Future 结果为 cancel_bool
+        '''
+        return self.main_engine.cancel_order_async(gateway_name=gateway_name, symbol=symbol, orderid=orderid, callback=callback)
+
+    def amend_order_async(self, gateway_name: str, symbol: str, orderid: str, new_price: float = None, new_amount: float = None, callback: Callable[[bool], Any] = None, **kwargs) -> Future:
+        '''
+            异步改单 不阻塞事件处理 callback(amend_bool) 在事件处理线程中执行
+            return: Future 结果为 amend_bool
+        '''
+        return self.main_engine.amend_order_async(gateway_name=gateway_name, symbol=symbol, orderid=orderid, new_price=new_price, new_amount=new_amount, callback=callback, **kwargs)
+
+    def send_orders_async(self, gateway_name: str, requests: List[OrderRequest], callback: Callable[[List[str]], Any] = None) -> Future:
+        '''
+            异步批量下单 不阻塞事件处理 callback(orderids) 在事件处理线程中执行
+            return: Future 结果为 orderid 列表
+        '''
+        return self.main_engine.send_orders_async(gateway_name=gateway_name, requests=requests, strategy_name=self.strategy_name, callback=callback)
+
+    def cancel_orders_async(self, gateway_name: str, requests: List[CancelRequest], callback: Callable[[List[bool]], Any] = None) -> Future:
+        '''
+            异步批量撤单 不阻塞事件处理 callback(cancel_bools) 在事件处理线程中执行
+            return: Future 结果为撤单结果列表
+        '''
+        return self.main_engine.cancel_orders_async(gateway_name=gateway_name, requests=requests, callback=callback)
+
     def query_order(self, gateway_name: str, symbol: str, orderid: str)-> OrderData or None:
         '''
             查询订单
@@ -99,6 +185,36 @@ class StrategyTemplate(ABC):
 
         return info
     
+    def get_order(self, gateway_name: str, orderid: str) -> OrderData or None:
+        '''
+            从本地订单簿获取订单 无网络请求
+        '''
+        return self.main_engine.get_order(gateway_name=gateway_name, orderid=orderid)
+
+    def get_active_orders(self, gateway_name: str, symbol: str = '') -> List[OrderData]:
+        '''
+            从本地订单簿获取活跃订单(含部分成交) 无网络请求
+        '''
+        return self.main_engine.get_active_orders(gateway_name=gateway_name, symbol=symbol)
+
+    def get_outstanding_notional(self, gateway_name: str, symbol: str = '') -> float:
+        '''
+            活跃订单未成交部分的名义价值
+        '''
+        return self.main_engine.get_outstanding_notional(gateway_name=gateway_name, symbol=symbol)
+
+    def get_account(self, gateway_name: str) -> AccountData or None:
+        '''
+            从本地获取账户持仓与资产 由成交增量更新并定期与 REST 对账 无网络请求(首次调用除外)
+        '''
+        return self.main_engine.get_account(gateway_name=gateway_name)
+
+    def get_position(self, gateway_name: str, symbol: str) -> PositionData or None:
+        '''
+            从本地获取持仓 由成交增量更新并定期与 REST 对账 无网络请求(首次调用除外)
+        '''
+        return self.main_engine.get_position(gateway_name=gateway_name, symbol=symbol)
+
     def query_account(self, gateway_name: str)-> AccountData or None:
         '''
             查询账户 账户级别的查询会返回资产与所有币对的持仓信息
@@ -115,11 +231,37 @@ class StrategyTemplate(ABC):
 
         return info
     
-    def write_log(self, msg: str, level=LogLevel.INFO, lark_url=None):
+    def set_timer(self, interval_ms: int, periodic: bool = True, data: Any = None, timer_id: str = '') -> str:
         '''
-            记录日志
+            添加定时器 到期后回调 on_timer 回测中使用回测时间
+            Params:
+                interval_ms: 定时间隔 毫秒
+                periodic: True 周期触发 False 仅触发一次(例如订单超时)
+                data: 自定义数据 例如 orderid
+            return: timer_id
         '''
-        self.main_engine.write_log(msg=msg, level=level.value, source=f"{self.strategy_name}", lark_url=lark_url)
+        return self.main_engine.set_timer(strategy_name=self.strategy_name, interval_ms=interval_ms, periodic=periodic, data=data, timer_id=timer_id)
+
+    def cancel_timer(self, timer_id: str) -> bool:
+        '''
+            撤销定时器
+        '''
+        return self.main_engine.cancel_timer(timer_id=timer_id)
+
+    async def run_blocking(self, func, *args, **kwargs):
+        '''
+            在线程池中执行阻塞函数(如 REST 请求) 仅用于 async 回调中 不阻塞其他事件的分发
+            example: order = await self.run_blocking(self.query_order, gateway_name, symbol, orderid)
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    def write_log(self, msg: str, level=LogLevel.INFO, lark_url=None, args: tuple = ()):
+        '''
+            记录日志 仅入队 不阻塞策略
+            args: msg 中 %s 占位符的参数 延迟到后台线程格式化 例如 self.write_log("深度: %s", args=(depth,))
+        '''
+        self.main_engine.write_log(msg=msg, level=level.value, source=f"{self.strategy_name}", lark_url=lark_url, args=args)
 
     def get_ts(self):
         '''
@@ -133,6 +275,13 @@ class StrategyTemplate(ABC):
         '''
         return self.main_engine.gateways[gateway_name].symbol_contract_map.get(symbol, None)
 
+    def register_array_manager(self, name: str, am):
+        '''
+            注册 ArrayManager 保存至快照 重启时在 on_start 之后恢复 需以相同 name 与 size 注册
+        '''
+        self.array_managers[name] = am
+        return am
+
     def set_gateway_param(self, gateway_name: str, params: dict):
         '''
             设置gateway参数
@@ -142,6 +291,13 @@ class StrategyTemplate(ABC):
     def set_topic(self, gateway_name: str, event_type: EventType, params: dict):
         '''
             设置共有数据订阅
+            EventType.DEPTH 额外支持参数:
+                conflate: bool 开启深度合并 策略处理不及时, 同一合约仅保留最新一条未处理的深度
+                max_rate: float | Dict[str, float] 每秒最多推送的深度数量 0为不限 传入字典时按合约设置 设置后自动开启合并
+                array: bool 推送 ArrayDepthData numpy 数组深度 兼容 DepthData 额外提供 mid microprice vwap 等指标 对该 gateway 的所有策略生效
+                book: bool 由增量深度维护本地订单簿 检测丢包并自动重新同步 推送前 level 档 对该 gateway 的所有策略生效
+                    Binance: diff_book_depth + REST 快照; OKX: book_channel 'books'(默认) / 'books-l2-tbt'
+                level: int 深度档位数量 Binance 快照深度支持 5/10/20 本地订单簿不限 默认20
         '''
         if gateway_name not in self.topic:
             self.topic[gateway_name] = {}
@@ -181,6 +337,12 @@ class StrategyTemplate(ABC):
         '''
         pass
 
+    def on_timer(self, timer: TimerData):
+        '''
+            定时器到期事件 由 set_timer 添加
+        '''
+        pass
+
     @abstractmethod
     def on_finish(self):
         '''
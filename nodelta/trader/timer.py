@@ -0,0 +1,154 @@
+'''
+    分层时间轮 为 EventType.TIMER 提供定时器
+
+    levels 层轮子 每层 2^wheel_bits 个槽:
+        第0层每个槽代表 tick_ms 毫秒 第 l 层每个槽代表 tick_ms * 2^(wheel_bits * l) 毫秒
+        添加定时器时放入能容纳其到期时间的最低层; 时间推进到高层槽的边界时 该槽的定时器下沉到低层
+        添加 撤销 均为 O(1) 推进一个 tick 的代价与到期定时器数量成正比
+
+    时间由调用方通过 advance(now_ts) 推进: 实盘由 MainEngine 定时线程使用系统时间推进 回测由 BacktestCtaGateway 使用回测时间推进
+    首次 advance 之前添加的定时器 在首次 advance 时以当时时间开始计时
+'''
+import threading
+from typing import Dict, List
+
+from .object import TimerData
+
+
+class TimerWheel:
+    '''
+        分层时间轮 线程安全
+    '''
+
+    def __init__(self, tick_ms: int = 10, wheel_bits: int = 8, levels: int = 4):
+        self.tick_ms = tick_ms
+        self.wheel_bits = wheel_bits
+        self.wheel_size = 1 << wheel_bits
+        self.wheel_mask = self.wheel_size - 1
+        self.levels = levels
+
+        self.wheels: List[List[List[TimerData]]] = [[[] for _ in range(self.wheel_size)] for _ in range(levels)]
+        self.level_counts: List[int] = [0] * levels # 各层定时器数量 包含已撤销但尚未清理的定时器
+        self.timers: Dict[str, TimerData] = {} # 有效定时器 timer_id: TimerData
+        self.pending: List[TimerData] = [] # 首次 advance 之前添加的定时器
+
+        self.current_tick: int = None # 当前 tick 首次 advance 时初始化
+        self.now_ts: int = 0 # 最近一次 advance 的时间戳13位
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def add(self, timer: TimerData):
+        '''
+            添加定时器 到期时间 = 当前时间 + interval_ms
+        '''
+        if timer.periodic and timer.interval_ms <= 0:
+            raise ValueError(f"周期定时器 interval_ms 必须大于0: {timer.interval_ms}")
+        with self.lock:
+            if timer.timer_id in self.timers:
+                raise ValueError(f"定时器ID重复: {timer.timer_id}")
+            self.timers[timer.timer_id] = timer
+            if self.current_tick is None:
+                self.pending.append(timer)
+                return
+            timer.deadline_ts = self.now_ts + timer.interval_ms
+            self._insert(timer)
+
+    def cancel(self, timer_id: str) -> bool:
+        '''
+            撤销定时器 定时器不存在或一次性定时器已触发返回 False
+            已撤销的定时器留在槽中 到期时丢弃
+        '''
+        with self.lock:
+            timer = self.timers.pop(timer_id, None)
+        if timer is None:
+            return False
+        timer.cancelled = True
+        return True
+
+    def _insert(self, timer: TimerData, cascading: bool = False):
+        '''
+            cascading: 下沉时调用 当前 tick 的第0层槽尚未处理 到期 tick 等于当前 tick 的定时器仍可放入
+        '''
+        expire_tick = -(-timer.deadline_ts // self.tick_ms) # 向上取整
+        if expire_tick < self.current_tick or (expire_tick == self.current_tick and not cascading):
+            expire_tick = self.current_tick + 1 # 已到期 下一个 tick 触发
+        bits = self.wheel_bits
+        for level in range(self.levels):
+            # 到期 tick 与当前 tick 在更高层的位相同时 放入本层
+            if (expire_tick >> (bits * (level + 1))) == (self.current_tick >> (bits * (level + 1))):
+                slot = (expire_tick >> (bits * level)) & self.wheel_mask
+                break
+        else:
+            # 超出时间轮范围 放入最高层最后处理的槽 下沉时重新计算
+            level = self.levels - 1
+            slot = ((self.current_tick >> (bits * level)) - 1) & self.wheel_mask
+        self.wheels[level][slot].append(timer)
+        self.level_counts[level] += 1
+
+    def _cascade(self, level: int, tick: int):
+        slot = (tick >> (self.wheel_bits * level)) & self.wheel_mask
+        timers = self.wheels[level][slot]
+        if not timers:
+            return
+        self.wheels[level][slot] = []
+        self.level_counts[level] -= len(timers)
+        for timer in timers:
+            if not timer.cancelled:
+                self._insert(timer, cascading=True)
+
+    def advance(self, now_ts: int) -> List[TimerData]:
+        '''
+            推进时间至 now_ts 返回到期的定时器(按到期顺序)
+            周期定时器重新计时 错过的周期不补发; 一次性定时器触发后移除
+        '''
+        fired: List[TimerData] = []
+        with self.lock:
+            target_tick = now_ts // self.tick_ms
+            self.now_ts = now_ts
+            if self.current_tick is None:
+                self.current_tick = target_tick
+                for timer in self.pending:
+                    if not timer.cancelled:
+                        timer.deadline_ts = now_ts + timer.interval_ms
+                        self._insert(timer)
+                self.pending = []
+                return fired
+
+            bits = self.wheel_bits
+            while self.current_tick < target_tick:
+                if not any(self.level_counts):
+                    self.current_tick = target_tick
+                    break
+                if not self.level_counts[0]:
+                    # 第0层为空 直接跳到下一个第1层边界的前一个 tick
+                    boundary = ((self.current_tick >> bits) + 1) << bits
+                    self.current_tick = min(target_tick, boundary - 1)
+                    if self.current_tick == target_tick:
+                        break
+                tick = self.current_tick + 1
+                self.current_tick = tick
+                # 高层到达边界 先下沉高层
+                for level in range(self.levels - 1, 0, -1):
+                    if not tick & ((1 << (bits * level)) - 1):
+                        self._cascade(level, tick)
+                slot = tick & self.wheel_mask
+                timers = self.wheels[0][slot]
+                if not timers:
+                    continue
+                self.wheels[0][slot] = []
+                self.level_counts[0] -= len(timers)
+                for timer in timers:
+                    if timer.cancelled:
+                        continue
+                    timer.fire_count += 1
+                    fired.append(timer)
+                    if timer.periodic:
+                        timer.deadline_ts += timer.interval_ms
+                        if timer.deadline_ts <= now_ts:
+                            timer.deadline_ts = now_ts + timer.interval_ms
+                        self._insert(timer)
+                    else:
+                        self.timers.pop(timer.timer_id, None)
+        return fired
@@ -0,0 +1,176 @@
+'''
+    引擎监控 EngineWatchdog
+
+    后台线程每 interval 秒检查一次:
+        1. 正在执行的回调: MainEngine.process_event 开始处理时写入 current_event 结束后清空
+            执行时间超过 slow_callback_ms 时通过 sys._current_frames 获取事件处理线程的调用栈 记录日志并告警 回调结束后记录总耗时
+        2. 事件队列积压: 各事件类型积压数量作为 gauge 超过 backlog_threshold 时记录日志并告警 降至一半以下时记录恢复
+
+    告警通过 write_log(lark_url=...) 由 AlertDispatcher 后台线程发送 同类告警 alert_interval 秒内只记录一次 计数不受影响
+    gauge 通过 get_gauges() 读取 也包含在 dump_status 中
+
+    note: asyncio 模式下 async 回调返回的协程作为 task 运行 只监控回调的同步部分
+'''
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Tuple
+
+from .constant import LogLevel
+
+
+class EngineWatchdog:
+    '''
+        事件队列积压与慢回调监控
+    '''
+
+    def __init__(self, main_engine, slow_callback_ms: float = 100, backlog_threshold: int = 1000, interval: float = 0.05, alert_interval: float = 60, lark_url: str = None):
+        '''
+            Params:
+                slow_callback_ms: 单个事件处理超过该耗时记录调用栈 毫秒
+                backlog_threshold: 事件队列积压超过该数量告警
+                interval: 检查间隔 秒 慢回调的检测精度
+                alert_interval: 同类告警的最小间隔 秒
+                lark_url: 告警发送的 lark 机器人 为空时只写日志
+        '''
+        self.main_engine = main_engine
+        self.slow_callback_ns = int(slow_callback_ms * 1e6)
+        self.backlog_threshold = backlog_threshold
+        self.interval = interval
+        self.alert_interval = alert_interval
+        self.lark_url = lark_url
+        self.source = 'Watchdog'
+
+        self.last_alert_ts: Dict[Tuple, float] = {} # 告警类型: 上次记录时间
+        self._slow_event: tuple = None # 已记录的慢回调 (event, start_ns)
+        self._backlog_alerting: bool = False
+
+        # === gauge ===
+        self.qsize: int = 0
+        self.backlog: Dict[str, int] = {}
+        self.max_qsize: int = 0
+        self.slow_callback_count: int = 0
+        self.max_callback_ms: float = 0 # 慢回调中的最长耗时
+        self.backlog_alert_count: int = 0
+
+        self.active: bool = False
+
+    def start(self):
+        if self.active:
+            return
+        self.active = True
+        threading.Thread(target=self.run, name='nd_watchdog', daemon=True).start()
+        msg = f"监控线程启动 慢回调阈值: {self.slow_callback_ns / 1e6}ms 积压阈值: {self.backlog_threshold}"
+        self.main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.source)
+
+    def stop(self):
+        self.active = False
+
+    def run(self):
+        main_engine = self.main_engine
+        while self.active and main_engine.is_event_processing:
+            try:
+                self.check_callback()
+                self.check_backlog()
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                msg = f"监控检查异常: {e} 报错信息:\n{error_msg}"
+                main_engine.write_log(msg=msg, level=LogLevel.ERROR.value, source=self.source)
+            time.sleep(self.interval)
+        self.active = False
+
+    def get_gauges(self) -> dict:
+        '''
+            return: {'qsize', 'max_qsize', 'backlog': {event_type.value: count}, 'current': 正在处理的事件, 'current_ms': 已执行时间,
+                     'slow_callback_count', 'max_callback_ms', 'backlog_alert_count'}
+        '''
+        current = self.main_engine.current_event
+        return {
+            'qsize': self.qsize,
+            'max_qsize': self.max_qsize,
+            'backlog': dict(self.backlog),
+            'current': self._describe(current[0]) if current else None,
+            'current_ms': (time.perf_counter_ns() - current[1]) / 1e6 if current else 0,
+            'slow_callback_count': self.slow_callback_count,
+            'max_callback_ms': self.max_callback_ms,
+            'backlog_alert_count': self.backlog_alert_count,
+        }
+
+    def check_callback(self):
+        '''
+            检查正在执行的回调 超时记录一次调用栈 结束后记录总耗时
+        '''
+        current = self.main_engine.current_event
+        now_ns = time.perf_counter_ns()
+        slow = self._slow_event
+        if slow is not None and current is not slow: # 已记录的慢回调结束
+            self._slow_event = None
+            elapsed_ms = (now_ns - slow[1]) / 1e6
+            self.max_callback_ms = max(self.max_callback_ms, elapsed_ms)
+            if self._should_alert(('slow_done', slow[0].event_type, slow[0].gateway_name, slow[0].symbol)):
+                msg = f"慢回调结束 {self._describe(slow[0])} 耗时约 {elapsed_ms:.1f}ms 当前积压: {self.qsize}"
+                self.main_engine.write_log(msg=msg, level=LogLevel.WARNING.value, source=self.source)
+        if current is None or current is self._slow_event:
+            return
+        event, start_ns = current
+        if now_ns - start_ns < self.slow_callback_ns:
+            return
+        self._slow_event = current
+        self.slow_callback_count += 1
+        if not self._should_alert(('slow', event.event_type, event.gateway_name, event.symbol)):
+            return
+        stack = self._format_event_thread_stack()
+        msg = (f"慢回调 {self._describe(event)} 已执行 {(now_ns - start_ns) / 1e6:.1f}ms 当前积压: {self.qsize} "
+               f"(累计慢回调: {self.slow_callback_count})\n调用栈:\n{stack}")
+        self.main_engine.write_log(msg=msg, level=LogLevel.WARNING.value, source=self.source, lark_url=self.lark_url)
+
+    def check_backlog(self):
+        '''
+            更新积压 gauge 超过阈值告警 降至阈值一半以下时记录恢复
+        '''
+        backlog = self.main_engine.get_queue_backlog()
+        qsize = sum(backlog.values())
+        self.backlog = backlog
+        self.qsize = qsize
+        if qsize > self.max_qsize:
+            self.max_qsize = qsize
+
+        if qsize >= self.backlog_threshold:
+            if not self._backlog_alerting:
+                self._backlog_alerting = True
+                self.backlog_alert_count += 1
+            if self._should_alert(('backlog',)):
+                current = self.main_engine.current_event
+                current_text = f"{self._describe(current[0])} 已执行 {(time.perf_counter_ns() - current[1]) / 1e6:.1f}ms" if current else '无'
+                msg = f"事件队列积压: {qsize} 阈值: {self.backlog_threshold} 各事件类型: { {k: v for k, v in backlog.items() if v} } 正在处理: {current_text}"
+                self.main_engine.write_log(msg=msg, level=LogLevel.WARNING.value, source=self.source, lark_url=self.lark_url)
+        elif self._backlog_alerting and qsize < self.backlog_threshold / 2:
+            self._backlog_alerting = False
+            msg = f"事件队列积压恢复: {qsize} 期间最大积压: {self.max_qsize}"
+            self.main_engine.write_log(msg=msg, level=LogLevel.INFO.value, source=self.source)
+
+    def _should_alert(self, key: tuple) -> bool:
+        now = time.monotonic()
+        last = self.last_alert_ts.get(key)
+        if last is not None and now - last < self.alert_interval:
+            return False
+        self.last_alert_ts[key] = now
+        return True
+
+    def _describe(self, event) -> str:
+        return f"{event.event_type.value} {event.gateway_name} {event.symbol}"
+
+    def _format_event_thread_stack(self) -> str:
+        '''
+            事件处理线程的调用栈 从 process_event 开始
+        '''
+        frame = sys._current_frames().get(self.main_engine.event_thread_ident)
+        if frame is None:
+            return '(无法获取事件处理线程调用栈)'
+        stack = traceback.extract_stack(frame)
+        for index, frame_summary in enumerate(stack):
+            if frame_summary.name == 'process_event':
+                stack = stack[index:]
+                break
+        return ''.join(traceback.format_list(stack))
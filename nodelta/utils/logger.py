@@ -0,0 +1,138 @@
+'''
+    非阻塞日志
+
+    调用线程只创建 LogRecord 并放入队列 格式化与写入(终端/文件)由 QueueListener 后台线程完成
+        LazyQueueHandler: 不在调用线程中格式化消息 msg % args 延迟到后台线程
+        LogSampler: 按 (source, level) 采样 每 N 条只记录 1 条 被丢弃的日志不创建 LogRecord
+        setup_queue_logging: 配置 logger 使用队列 后台线程写入终端 以及可选的按大小或按时间滚动的日志文件
+            每个 logger 只保留一个 QueueListener 重新配置时停止被替换的 listener
+
+    note: 延迟格式化时 args 中的对象在后台线程中才转为字符串 若对象在此之前被修改 日志中为修改后的内容
+'''
+import logging
+import os
+import sys
+import threading
+from logging import StreamHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from queue import SimpleQueue
+from typing import Dict, List, Tuple
+
+LOG_FORMAT = '%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s'
+
+_listeners: Dict[str, QueueListener] = {} # logger name: 正在运行的 QueueListener
+_listeners_lock = threading.Lock()
+
+
+class LazyQueueHandler(QueueHandler):
+    '''
+        QueueHandler 默认在入队前调用 format 本类直接入队 由后台线程的 handler 格式化
+    '''
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogSampler:
+    '''
+        日志采样 规则为 (source, level) -> every_n 每 every_n 条记录 1 条 并在记录中注明跳过的数量
+        source 为空字符串时对所有来源生效 ERROR 及以上级别默认不采样
+    '''
+
+    def __init__(self):
+        self.rules: Dict[Tuple[str, int], int] = {}
+        self.counts: Dict[Tuple[str, int], int] = {}
+        self.lock = threading.Lock()
+
+    def set_rule(self, source: str, level: int, every_n: int):
+        '''
+            every_n <= 1 时删除规则
+        '''
+        with self.lock:
+            if every_n <= 1:
+                self.rules.pop((source, level), None)
+            else:
+                self.rules[(source, level)] = every_n
+
+    def sample(self, source: str, level: int) -> int:
+        '''
+            return: -1 丢弃; >=0 记录 数值为上次记录后被丢弃的数量
+        '''
+        key = (source, level)
+        every_n = self.rules.get(key)
+        if every_n is None:
+            key = ('', level)
+            every_n = self.rules.get(key)
+            if every_n is None:
+                return 0
+        with self.lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+            if count % every_n:
+                return -1
+            return every_n - 1 if count else 0
+
+
+def setup_queue_logging(
+    logger: logging.Logger,
+    level: int = logging.DEBUG,
+    stream: bool = True,
+    file_path: str = '',
+    max_bytes: int = 0,
+    backup_count: int = 10,
+    when: str = '',
+) -> QueueListener:
+    '''
+        配置 logger 的日志写入在后台线程中完成 返回已启动的 QueueListener 进程退出前需调用 stop_queue_logging 写完队列中的日志
+        logger 已配置过时 新的 handler 生效后停止旧的 listener 旧队列中的日志写完后其线程退出
+        Params:
+            stream: 是否输出到 stderr
+            file_path: 日志文件路径 为空不写文件
+            max_bytes: 按大小滚动 单个文件最大字节数
+            when: 按时间滚动 TimedRotatingFileHandler 的 when 参数 例如 'midnight' 'H'; 与 max_bytes 同时设置时按时间滚动
+            backup_count: 保留的历史文件数量
+    '''
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: List[logging.Handler] = []
+    if stream:
+        stream_handler = StreamHandler(sys.stderr)
+        stream_handler.setLevel(level)
+        handlers.append(stream_handler)
+    if file_path:
+        dir_path = os.path.dirname(file_path)
+        if dir_path and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        if when:
+            file_handler = TimedRotatingFileHandler(file_path, when=when, backupCount=backup_count, encoding='utf-8')
+        else:
+            file_handler = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setLevel(level)
+        handlers.append(file_handler)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    with _listeners_lock:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(LazyQueueHandler(log_queue))
+        logger.setLevel(level)
+        logger.propagate = False
+        old_listener = _listeners.get(logger.name)
+        _listeners[logger.name] = listener
+    if old_listener is not None:
+        old_listener.stop()
+    return listener
+
+
+def stop_queue_logging(logger: logging.Logger):
+    '''
+        停止 logger 的 QueueListener 写完队列中的日志 未配置或已停止时忽略
+    '''
+    with _listeners_lock:
+        listener = _listeners.pop(logger.name, None)
+    if listener is not None:
+        listener.stop()
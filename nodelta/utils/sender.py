@@ -1,75 +1,329 @@
 import json
 import logging
+import threading
+import time
+import traceback
+from collections import deque
+from queue import Full, Queue, Empty
+from typing import Dict, List, Tuple
+
 import requests
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-def __get_content_from_internet(url, method='GET', headers=None, params=None, data=None):
-    req = requests.request(method=method, url=url, headers=headers, params=params, data=data)
+def __get_content_from_internet(url, method='GET', headers=None, params=None, data=None, timeout=None):
+    req = requests.request(method=method, url=url, headers=headers, params=params, data=data, timeout=timeout)
     return req
 
 
-def get_content_from_internet(url, method='GET', headers=None, params=None, data=None):
+def get_content_from_internet(url, method='GET', headers=None, params=None, data=None, timeout=None):
     params = {
         "url": url,
         "method": method,
         "headers": headers,
         "params": params,
-        "data": data
+        "data": data,
+        "timeout": timeout
     }
     _req = __get_content_from_internet(**params)
     return _req
 
+
+def lark_payload(title: str, text: str) -> dict:
+    return {
+        "msg_type": "text",
+        "content": {
+            "text": f"{title}\n{text}"
+        }
+    }
+
+
+def wechat_payload(msg: str, title: str, mentioned_all: bool = False, mentioned_mobile_list: list = None) -> dict:
+    data = {
+            "msgtype": "text",
+            "text": {
+                # 让群机器人发送的消息
+                "content": title + '\n' + msg,
+                "mentioned_list":[],  # @全体成员，只有自己的话可以不要
+            }
+        }
+    if mentioned_all:
+        data["text"]["mentioned_list"].append("@all")
+    if mentioned_mobile_list:
+        data["text"]["mentioned_mobile_list"] = [str(i) for i in mentioned_mobile_list]
+    return data
+
+
 class Sender:
+    '''
+        同步发送 调用线程等待 HTTP 请求完成; 交易进程中应使用 AlertDispatcher 仅入队
+    '''
     
     def __init__():
         pass
 
     @staticmethod
-    def lark(title, text, bot_url) -> None:
+    def lark(title, text, bot_url, timeout: float = 10) -> None:
         '''
             Params:
                 title: str
                 text: str
                 bot_url: str lark群组机器人的url
+                timeout: 请求超时 秒
         '''
-        content = f"{title}\n{text}"
-        data = json.dumps({
-            "msg_type": "text",
-            "content": {
-                "text": content
-            }
-        })
+        data = json.dumps(lark_payload(title, text))
         headers = {
             'Content-Type': 'application/json'
         }
         try:
             target_url = bot_url
-            req = get_content_from_internet(url=target_url, method="POST", headers=headers, data=data)
+            req = get_content_from_internet(url=target_url, method="POST", headers=headers, data=data, timeout=timeout)
             logging.info(f"lark message sent, status_code:{req.status_code}, content:{req.content}")
         except Exception as e:
             logging.error(f"lark message sent failed, error:{e}")
 
     @staticmethod
-    def wechat(msg, title, url, mentioned_all=False, mentioned_mobile_list=[]):
+    def wechat(msg, title, url, mentioned_all=False, mentioned_mobile_list=[], timeout: float = 10):
         headers = {"Content-Type":"application/json"}
-        data = {
-                "msgtype": "text",
-                "text": {
-                    # 让群机器人发送的消息
-                    "content": title + '\n' + msg,
-                    "mentioned_list":[],  # @全体成员，只有自己的话可以不要
-                }
-            }
-        if mentioned_all:
-            data["text"]["mentioned_list"].append("@all")
-        if mentioned_mobile_list:
-            data["text"]["mentioned_mobile_list"] = [str(i) for i in mentioned_mobile_list] 
+        data = wechat_payload(msg, title, mentioned_all, mentioned_mobile_list)
         try:
-            r = requests.post(url,headers=headers,json=data)
+            r = requests.post(url,headers=headers,json=data,timeout=timeout)
             logging.info(f"wechat message sent, status_code:{r.status_code}, content:{r.content}")
         except Exception as e:
             logging.error(f"wechat message sent failed, error:{e}")
-        
+
+
+class AlertDispatcher:
+    '''
+        后台告警发送 调用方只入队 HTTP 请求在后台线程中完成
+
+        有界队列: 队列满时丢弃新告警并计数 不阻塞调用方
+        去重聚合: 同一渠道 title 与 text 相同的告警 在 dedup_window 秒内只发送第一条 窗口结束时发送一条 "重复 N 次" 汇总
+        渠道限频: 每个 url 在 rate_period 秒内最多发送 rate_limit 次 超出的告警暂存 额度恢复后合并为一条发送
+        重试: 复用 requests.Session 请求超时 timeout 秒; 网络异常 429 5xx 按 retry_backoff 指数退避重试 max_retries 次
+            重试告警记录 next_retry_ts 到期后由后台线程重发 等待期间继续处理队列与其他渠道
+
+        后台线程在第一次入队时启动; 进程退出前调用 flush 发送队列中的告警
+    '''
+
+    def __init__(
+        self,
+        max_queue: int = 1000,
+        dedup_window: float = 60,
+        rate_limit: int = 5,
+        rate_period: float = 60,
+        max_batch: int = 20,
+        max_retries: int = 3,
+        retry_backoff: float = 1,
+        timeout: float = 5,
+    ):
+        self.queue: Queue = Queue(maxsize=max_queue)
+        self.dedup_window = dedup_window
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.channel_rate_limits: Dict[str, Tuple[int, float]] = {} # url: (rate_limit, rate_period) 单独设置的渠道限频
+        self.max_batch = max_batch # 合并发送的最大告警数量
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        # 以下仅由后台线程访问
+        self.dedup: Dict[Tuple[str, str, str], list] = {} # (url, title, text): [窗口开始时间, 重复次数, alert]
+        self.sent_ts: Dict[str, deque] = {} # url: 窗口内的发送时间
+        self.backlog: Dict[str, deque] = {} # url: 超出限频暂存的告警
+        self.retrying: List[dict] = [] # 等待重试的告警 按 next_retry_ts 重发
+
+        self.stats: Dict[str, int] = {'enqueued': 0, 'dropped': 0, 'deduplicated': 0, 'sent': 0, 'failed': 0, 'retried': 0}
+        self.worker: threading.Thread = None
+        self.idle = threading.Event() # 队列与暂存均为空
+        self.idle.set()
+        self.lock = threading.Lock()
+
+    def set_rate_limit(self, url: str, rate_limit: int, rate_period: float):
+        '''
+            单独设置渠道限频 rate_period 秒内最多发送 rate_limit 次
+        '''
+        self.channel_rate_limits[url] = (rate_limit, rate_period)
+
+    def lark(self, title: str, text: str, bot_url: str) -> bool:
+        '''
+            lark 告警入队 与 Sender.lark 参数相同
+            return: 是否入队成功 队列满时返回 False
+        '''
+        return self.put({'channel': 'lark', 'url': bot_url, 'title': str(title), 'text': str(text)})
+
+    def wechat(self, msg: str, title: str, url: str, mentioned_all: bool = False, mentioned_mobile_list: list = None) -> bool:
+        '''
+            企业微信告警入队 与 Sender.wechat 参数相同
+        '''
+        return self.put({
+            'channel': 'wechat', 'url': url, 'title': str(title), 'text': str(msg),
+            'mentioned_all': mentioned_all, 'mentioned_mobile_list': list(mentioned_mobile_list or []),
+        })
+
+    def put(self, alert: dict) -> bool:
+        if not alert['url']:
+            return False
+        if self.worker is None:
+            self.start()
+        self.idle.clear()
+        try:
+            self.queue.put_nowait(alert)
+        except Full:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def start(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, name='nd_alert', daemon=True)
+                self.worker.start()
+
+    def flush(self, timeout: float = 5) -> bool:
+        '''
+            等待队列中与限频暂存的告警发送完成 最多等待 timeout 秒 进程退出前调用
+            flush 期间暂存告警不再等待限频额度 去重窗口中的汇总立即发送
+            return: 是否全部发送
+        '''
+        if self.worker is None:
+            return True
+        self.idle.clear()
+        try:
+            self.queue.put({'channel': 'flush'}, timeout=timeout)
+        except Full:
+            return False
+        return self.idle.wait(timeout)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    def run(self):
+        flushing = False
+        while True:
+            try:
+                try:
+                    alert = self.queue.get(timeout=0.5)
+                except Empty:
+                    alert = None
+                now = time.time()
+                if alert is not None:
+                    if alert['channel'] == 'flush':
+                        flushing = True
+                    else:
+                        self._on_alert(alert, now)
+                self._expire_dedup(now, force=flushing)
+                self._send_backlog(now, force=flushing)
+                self._send_retries(now)
+                if self.queue.empty() and not self.retrying and not any(self.backlog.values()) and not any(entry[1] for entry in self.dedup.values()):
+                    flushing = False
+                    self.idle.set()
+            except Exception as e:
+                error_msg = traceback.format_exc()
+                logging.error(f"告警发送线程异常: {e} 报错信息:\n{error_msg}")
+
+    def _on_alert(self, alert: dict, now: float):
+        key = (alert['url'], alert['title'], alert['text'])
+        entry = self.dedup.get(key)
+        if entry is not None and now - entry[0] < self.dedup_window:
+            entry[1] += 1
+            self.stats['deduplicated'] += 1
+            return
+        self.dedup[key] = [now, 0, alert]
+        self.backlog.setdefault(alert['url'], deque()).append(alert)
+
+    def _expire_dedup(self, now: float, force: bool = False):
+        '''
+            去重窗口结束 有重复的告警生成汇总放入暂存
+        '''
+        for key, (start_ts, count, alert) in list(self.dedup.items()):
+            if not force and now - start_ts < self.dedup_window:
+                continue
+            del self.dedup[key]
+            if count:
+                summary = dict(alert)
+                summary['text'] = f"{alert['text']}\n(过去 {int(now - start_ts)} 秒内重复 {count} 次)"
+                self.backlog.setdefault(alert['url'], deque()).append(summary)
+
+    def _send_backlog(self, now: float, force: bool = False):
+        for url, alerts in self.backlog.items():
+            if not alerts:
+                continue
+            rate_limit, rate_period = self.channel_rate_limits.get(url, (self.rate_limit, self.rate_period))
+            sent_ts = self.sent_ts.setdefault(url, deque())
+            while sent_ts and now - sent_ts[0] >= rate_period:
+                sent_ts.popleft()
+            while alerts and (force or len(sent_ts) < rate_limit):
+                batch = [alerts.popleft() for _ in range(min(len(alerts), self.max_batch))]
+                sent_ts.append(now)
+                self._send(self._merge(batch), now)
+
+    def _send_retries(self, now: float):
+        '''
+            重发 next_retry_ts 已到期的告警
+        '''
+        if not self.retrying:
+            return
+        due = [alert for alert in self.retrying if alert['next_retry_ts'] <= now]
+        if not due:
+            return
+        self.retrying = [alert for alert in self.retrying if alert['next_retry_ts'] > now]
+        for alert in due:
+            self.stats['retried'] += 1
+            self._send(alert, now)
+
+    def _merge(self, batch: List[dict]) -> dict:
+        '''
+            同一渠道的多条告警合并为一条
+        '''
+        if len(batch) == 1:
+            return batch[0]
+        merged = dict(batch[0])
+        merged['title'] = f"告警汇总 {len(batch)} 条"
+        merged['text'] = '\n\n'.join(f"【{alert['title']}】\n{alert['text']}" for alert in batch)
+        if merged['channel'] == 'wechat':
+            merged['mentioned_all'] = any(alert['mentioned_all'] for alert in batch)
+            merged['mentioned_mobile_list'] = list(dict.fromkeys(mobile for alert in batch for mobile in alert['mentioned_mobile_list']))
+        return merged
+
+    def _send(self, alert: dict, now: float) -> bool:
+        '''
+            发送一次 不阻塞等待重试; 网络异常 429 5xx 且未超过 max_retries 时放入 retrying 按指数退避设置 next_retry_ts
+        '''
+        if alert['channel'] == 'lark':
+            payload = lark_payload(alert['title'], alert['text'])
+        else:
+            payload = wechat_payload(alert['text'], alert['title'], alert['mentioned_all'], alert['mentioned_mobile_list'])
+        attempt = alert.get('attempt', 0)
+        try:
+            response = self.session.post(alert['url'], data=json.dumps(payload), timeout=self.timeout)
+        except Exception as e:
+            logging.error(f"{alert['channel']} message sent failed, attempt:{attempt + 1}, error:{e}")
+            return self._retry_later(alert, attempt, now)
+        if response.status_code == 429 or response.status_code >= 500:
+            logging.error(f"{alert['channel']} message sent failed, attempt:{attempt + 1}, status_code:{response.status_code}")
+            return self._retry_later(alert, attempt, now)
+        if response.status_code == 200:
+            self.stats['sent'] += 1
+            logging.info(f"{alert['channel']} message sent, status_code:{response.status_code}, content:{response.content}")
+            return True
+        logging.error(f"{alert['channel']} message sent failed, status_code:{response.status_code}, content:{response.content}")
+        self.stats['failed'] += 1
+        return False
+
+    def _retry_later(self, alert: dict, attempt: int, now: float) -> bool:
+        if attempt >= self.max_retries:
+            self.stats['failed'] += 1
+            return False
+        retry = dict(alert)
+        retry['attempt'] = attempt + 1
+        retry['next_retry_ts'] = now + self.retry_backoff * (2 ** attempt)
+        self.retrying.append(retry)
+        return False
+
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -15,7 +15,7 @@ print(f"ndSys_PATH: {ndSys_PATH}")
 if ndSys_PATH not in sys.path:
     sys.path.append(ndSys_PATH)
 
-from nodelta.utils.sender import Sender
+from nodelta.utils.sender import AlertDispatcher
 
 class ServerMonitor:
     def __init__(self, lark_url):
@@ -23,6 +23,7 @@ class ServerMonitor:
         self.mem_usage = []
         self.disk_io = []
         self.lark_url = lark_url
+        self.alert_dispatcher = AlertDispatcher() # 告警仅入队 后台线程发送
 
         # 过高资源使用率报警阈值
         self.cpu_usage_warn = 85
@@ -67,13 +68,13 @@ class ServerMonitor:
             msg = f"CPU 使用率过高: {self.cpu_usage[-1]}%"
             logging.warning(msg)
             if now_ts - self.last_cpu_usage_warn_ts > self.lark_warn_cool_ts:
-                Sender.lark(title=f"服务器报警: {self.host_ip}", text=msg + f"\n报送将冷却{int(self.lark_warn_cool_ts / (1000 * 60))}分钟", bot_url=self.lark_url)
+                self.alert_dispatcher.lark(title=f"服务器报警: {self.host_ip}", text=msg + f"\n报送将冷却{int(self.lark_warn_cool_ts / (1000 * 60))}分钟", bot_url=self.lark_url)
                 self.last_cpu_usage_warn_ts = now_ts
         if self.mem_usage[-1] > self.mem_usage_warn:
             msg = f"内存 使用率过高: {self.mem_usage[-1]}%"
             logging.warning(msg)
             if now_ts - self.last_mem_usage_warn_ts > self.lark_warn_cool_ts:
-                Sender.lark(title=f"服务器报警: {self.host_ip}", text=msg + f"\n报送将冷却{int(self.lark_warn_cool_ts / (1000 * 60))}分钟", bot_url=self.lark_url)
+                self.alert_dispatcher.lark(title=f"服务器报警: {self.host_ip}", text=msg + f"\n报送将冷却{int(self.lark_warn_cool_ts / (1000 * 60))}分钟", bot_url=self.lark_url)
                 self.last_mem_usage_warn_ts = now_ts
 
         # 打印日志记录当前资源使用情况
@@ -95,7 +96,7 @@ class ServerMonitor:
         msg += f"Memory usage(%):\n min@{mem_stats[0]}; 25%@{mem_stats[1]}; median@{mem_stats[2]}; 75%@{mem_stats[3]}; max@{mem_stats[4]}\n"
         msg += f"Disk IO(kb/s):\n min@{disk_stats[0]}; 25%@{disk_stats[1]}; median@{disk_stats[2]}; 75%@{disk_stats[3]}; max@{disk_stats[4]}\n"
 
-        Sender.lark(title=f"服务器定时报送: {self.host_ip}", text=msg, bot_url=self.lark_url)
+        self.alert_dispatcher.lark(title=f"服务器定时报送: {self.host_ip}", text=msg, bot_url=self.lark_url)
 
         self.cpu_usage = []
         self.mem_usage = []
@@ -103,12 +104,13 @@ class ServerMonitor:
 
     def on_exit(self, signum, frame):
         logging.info(f"服务器【监控停止】: {self.host_ip}")
-        Sender.lark(title=f"服务器【监控停止】: {self.host_ip}", text='', bot_url=self.lark_url)
+        self.alert_dispatcher.lark(title=f"服务器【监控停止】: {self.host_ip}", text='', bot_url=self.lark_url)
+        self.alert_dispatcher.flush(timeout=10)
         os._exit(0)
 
     def run(self):
         
-        Sender.lark(title=f"服务器【监控启动】: {self.host_ip}", text='', bot_url=self.lark_url)
+        self.alert_dispatcher.lark(title=f"服务器【监控启动】: {self.host_ip}", text='', bot_url=self.lark_url)
         last_send_report_ts = 0
 
         while True: